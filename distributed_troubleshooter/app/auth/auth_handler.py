@@ -3,16 +3,86 @@ from fastapi import Request
 from dotenv import load_dotenv
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from collections import OrderedDict
+import hashlib
 import os
+import threading
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
+# Optional faster JWT backend (PyJWT); python-jose stays the default
+try:
+    import jwt as _pyjwt
+    if not hasattr(_pyjwt, "PyJWT"):
+        _pyjwt = None
+except ImportError:
+    _pyjwt = None
+
 # Load environment variables from .env
 load_dotenv()
 
+# ✅ Secret and algorithm are read once at startup, not per request
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))  # short-lived; renewed via /refresh
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+def _decode(token: str) -> dict:
+    if JWT_BACKEND == "pyjwt" and _pyjwt is not None:
+        try:
+            return _pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except _pyjwt.PyJWTError as exc:
+            raise JWTError(str(exc))
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+# -------------------------------
+# 🔐 Verified-token cache
+# -------------------------------
+class TokenCache:
+    """Bounded LRU of already-verified token claims, keyed by token hash."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, exp = entry
+            if exp is not None and exp <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, token: str, claims: dict):
+        exp = claims.get("exp")
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, float(exp) if exp is not None else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_cache = TokenCache()
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -21,10 +91,15 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str):
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        claims = _decode(token)
     except JWTError:
         return None
+    token_cache.put(token, claims)
+    return claims
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")  # used in route protection
 
@@ -39,19 +114,16 @@ def get_current_user(request: Request):
     if token == "admin-token":
         return {"role": "admin", "user_id": "admin"}
 
-    SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret")
-    ALGORITHM = "HS256"
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return {
-            "user_id": payload.get("sub"),
-            "role": payload.get("role"),
-            "region": payload.get("region")
-        }
-    except JWTError:
+    # ✅ Cache hit skips the HS256 verification entirely
+    payload = decode_token(token)
+    if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    raise HTTPException(status_code=401, detail="Invalid token")
+    return {
+        "user_id": payload.get("sub"),
+        "role": payload.get("role"),
+        "region": payload.get("region")
+    }
@@ -1,19 +1,25 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from app.config import MONGO_URI, MONGO_DB
+from pymongo.errors import DuplicateKeyError
 from app.auth.auth_handler import create_access_token
-from datetime import timedelta
-import bcrypt
+from app.auth.passwords import hash_password, check_password
+from app.auth.sessions import session_store
+from app.services.ratelimit import admission, limit_by_client
+import asyncio
 import uuid
 
 router = APIRouter()
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 users_collection = db["users"]
 experts_collection = db["experts"]
+identities_collection = db["identities"]  # ✅ email -> role/id/password for both roles
 
 ADMIN_EMAILS = ["admin@example.com"]  # Add more as needed
+IDENTITY_BACKFILL_BATCH = 1000
 
 # ---------------------
 # SCHEMAS
@@ -34,17 +40,83 @@ class LoginRequest(BaseModel):
     email: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+# ---------------------
+# IDENTITY INDEX
+# ---------------------
+def ensure_identities():
+    """Create the unique email index and backfill identities for older accounts.
+
+    Skipped when every account already has an identity (the usual startup).
+    """
+    identities_collection.create_index([("email", ASCENDING)], unique=True)
+    has_email = {"email": {"$nin": [None, ""]}}
+    accounts = users_collection.count_documents(has_email) + experts_collection.count_documents(has_email)
+    if identities_collection.count_documents({}) == accounts:
+        return
+    for collection, role, id_field in (
+        (users_collection, "user", "user_id"),
+        (experts_collection, "expert", "expert_id"),
+    ):
+        batch = []
+        for doc in collection.find(has_email, {"_id": 0, "email": 1, "password": 1, "region": 1, id_field: 1}):
+            batch.append(UpdateOne(
+                {"email": doc["email"]},
+                {"$setOnInsert": {
+                    "email": doc["email"],
+                    "role": role,
+                    "subject_id": doc.get(id_field),
+                    "password": doc.get("password"),
+                    "region": doc.get("region"),
+                }},
+                upsert=True
+            ))
+            if len(batch) >= IDENTITY_BACKFILL_BATCH:
+                identities_collection.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            identities_collection.bulk_write(batch, ordered=False)
+
 # ---------------------
 # REGISTER
 # ---------------------
 @router.post("/register")
-def register(data: RegisterRequest):
-    if users_collection.find_one({"email": data.email}) or experts_collection.find_one({"email": data.email}):
+async def register(data: RegisterRequest):
+    if data.role not in ("user", "expert"):
+        raise HTTPException(status_code=400, detail="Invalid role.")
+
+    # ✅ Single indexed lookup; the unique index still guards concurrent registrations.
+    # Mongo calls run in threads: this handler is async for the bcrypt await
+    if await asyncio.to_thread(identities_collection.find_one, {"email": data.email}, {"_id": 1}):
         raise HTTPException(status_code=400, detail="Email already registered.")
 
-    hashed_pw = bcrypt.hashpw(data.password.encode('utf-8'), bcrypt.gensalt())
+    hashed_pw = await hash_password(data.password)
     user_id = str(uuid.uuid4())
 
+    try:
+        await asyncio.to_thread(identities_collection.insert_one, {
+            "email": data.email,
+            "role": data.role,
+            "subject_id": user_id,
+            "password": hashed_pw,
+            "region": data.region,
+        })
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered.")
+
+    try:
+        await asyncio.to_thread(_insert_account, data, user_id, hashed_pw)
+    except Exception:
+        # No account behind it: drop the identity so the email can register again
+        await asyncio.to_thread(identities_collection.delete_one, {"email": data.email, "subject_id": user_id})
+        raise
+
+    return {"message": f"{data.role.capitalize()} registered successfully."}
+
+def _insert_account(data: RegisterRequest, user_id: str, hashed_pw: str):
+    """The role's own account document, after its identity is in place."""
     if data.role == "expert":
         expert = {
             "expert_id": user_id,
@@ -80,52 +152,73 @@ def register(data: RegisterRequest):
         }
         users_collection.insert_one(user)
 
-    else:
-        raise HTTPException(status_code=400, detail="Invalid role.")
-
-    return {"message": f"{data.role.capitalize()} registered successfully."}
-
 # ---------------------
 # LOGIN
 # ---------------------
-@router.post("/login")
-def login(data: LoginRequest):
-    user = users_collection.find_one({"email": data.email})
-    role = "user"
-    user_id = None
-
-    if not user:
-        user = experts_collection.find_one({"email": data.email})
-        role = "expert"
-
+@router.post("/login", dependencies=[Depends(limit_by_client("login"))])
+async def login(data: LoginRequest):
+    # Per account too, so guessing one password from many addresses is slowed as well.
+    # Only failed attempts spend from it: a user logging in on several devices is never refused
+    account = data.email.lower()
+    await asyncio.to_thread(admission.admit, "login_account", account, 0)
+
+    # ✅ One indexed query covers both users and experts
+    user = await asyncio.to_thread(identities_collection.find_one, {"email": data.email})
     if not user:
+        await asyncio.to_thread(admission.charge, "login_account", account)
         raise HTTPException(status_code=401, detail="Email not found.")
 
+    role = user["role"]
+
     stored_pw = user.get("password")
     if stored_pw is None:
         raise HTTPException(status_code=500, detail="Corrupted user entry: password missing.")
-    if isinstance(stored_pw, str):
-        stored_pw = stored_pw.encode('utf-8')
-    elif hasattr(stored_pw, 'decode'):
-        stored_pw = stored_pw.decode('utf-8').encode('utf-8')  # For Mongo Binary object
 
-    if not bcrypt.checkpw(data.password.encode('utf-8'), stored_pw):
+    if not await check_password(data.password, stored_pw):
+        await asyncio.to_thread(admission.charge, "login_account", account)
         raise HTTPException(status_code=401, detail="Incorrect password.")
 
     if user["email"] in ADMIN_EMAILS:
         role = "admin"
 
-    user_id = user.get("user_id") or user.get("expert_id")
+    user_id = user["subject_id"]
 
     token = create_access_token({
         "sub": user_id,
         "role": role,
         "email": user["email"],
         "region": user.get("region")
-    }, expires_delta=timedelta(hours=1))
+    })
+    refresh_token = await asyncio.to_thread(session_store.create, user_id, role, user["email"], user.get("region"))
 
     return {
         "access_token": token,
+        "refresh_token": refresh_token,
         "user_id": user_id,
         "role": role
     }
+
+# ---------------------
+# REFRESH / LOGOUT
+# ---------------------
+@router.post("/refresh")
+def refresh(data: RefreshRequest):
+    # ✅ Session lookup only — no bcrypt on renewal. The refresh token is
+    # single use: a stolen copy stops working once either party refreshes
+    rotated = session_store.rotate(data.refresh_token)
+    if not rotated:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token.")
+    session, refresh_token = rotated
+
+    token = create_access_token(session)
+    return {
+        "access_token": token,
+        "refresh_token": refresh_token,
+        "user_id": session["sub"],
+        "role": session["role"]
+    }
+
+@router.post("/logout")
+def logout(data: RefreshRequest):
+    session_store.revoke(data.refresh_token)
+    return {"message": "Logged out."}
@@ -0,0 +1,67 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from fastapi import HTTPException
+
+# Dedicated pool so bcrypt never runs on the event loop or the shared threadpool
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+
+_executor = None
+_pending = 0
+_rejected = 0
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+    return _executor
+
+def _hash(password: bytes) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt())
+
+def _check(password: bytes, stored: bytes) -> bool:
+    return bcrypt.checkpw(password, stored)
+
+async def _submit(fn, *args):
+    global _pending, _rejected
+    if _pending >= PASSWORD_MAX_PENDING:
+        _rejected += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Authentication is busy, please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+async def hash_password(password: str) -> bytes:
+    return await _submit(_hash, password.encode("utf-8"))
+
+async def check_password(password: str, stored) -> bool:
+    if isinstance(stored, str):
+        stored = stored.encode("utf-8")
+    elif not isinstance(stored, bytes) and hasattr(stored, "decode"):
+        stored = stored.decode("utf-8").encode("utf-8")  # For Mongo Binary object
+    return await _submit(_check, password.encode("utf-8"), bytes(stored))
+
+def pool_stats() -> dict:
+    # Queue depth = hashes submitted but not yet finished (running + waiting)
+    return {
+        "workers": PASSWORD_WORKERS,
+        "queue_depth": _pending,
+        "max_pending": PASSWORD_MAX_PENDING,
+        "rejected": _rejected,
+    }
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
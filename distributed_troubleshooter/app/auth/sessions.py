@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, ASCENDING
+from app.config import MONGO_URI, MONGO_DB
+
+REFRESH_TOKEN_EXPIRE_DAYS = 7
+SESSION_PURGE_INTERVAL = 300  # seconds between batched expiry sweeps
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+sessions_collection = db["sessions"]
+
+# -------------------------------
+# 🔁 Refresh-token session store
+# -------------------------------
+class SessionStore:
+    """Refresh sessions in Mongo, one small document per token.
+
+    Only the SHA-256 of a refresh token is ever stored. Tokens are single
+    use: rotate() consumes one with an atomic find_one_and_delete and issues
+    its replacement, so every worker sees a revoke or a refresh at once and
+    there is nothing to cache in process.
+    """
+
+    def __init__(self, collection, ttl: timedelta = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)):
+        self.collection = collection
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def create(self, sub: str, role: str, email: str, region: str = None) -> str:
+        token = secrets.token_urlsafe(32)
+        self.collection.insert_one({
+            "_id": self._key(token),
+            "sub": sub,
+            "role": role,
+            "email": email,
+            "region": region,
+            "expires_at": datetime.utcnow() + self.ttl,
+        })
+        return token
+
+    def rotate(self, token: str):
+        """Consume a refresh token; (session, new token), or None if it was already used, revoked or expired."""
+        # Atomic across workers: of two concurrent refreshes with one token, only one gets it
+        doc = self.collection.find_one_and_delete({"_id": self._key(token)})
+        if not doc or doc["expires_at"] <= datetime.utcnow():
+            return None
+        session = {"sub": doc["sub"], "role": doc["role"], "email": doc.get("email"), "region": doc.get("region")}
+        return session, self.create(session["sub"], session["role"], session["email"], session["region"])
+
+    def revoke(self, token: str):
+        self.collection.delete_one({"_id": self._key(token)})
+
+    def purge_expired(self) -> int:
+        # One delete_many per sweep instead of a write per session
+        result = self.collection.delete_many({"expires_at": {"$lte": datetime.utcnow()}})
+        return result.deleted_count
+
+    async def purge_loop(self, interval: int = SESSION_PURGE_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.purge_expired)
+
+    def ensure_indexes(self):
+        self.collection.create_index([("expires_at", ASCENDING)])
+
+session_store = SessionStore(sessions_collection)
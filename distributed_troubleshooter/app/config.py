@@ -0,0 +1,33 @@
+import os
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env
+load_dotenv()
+
+# -------------------------------
+# 🌐 Node / shard settings
+# -------------------------------
+# Each regional node (see docker-compose.yml) owns its region's shard.
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "distributed_system")
+NODE_NAME = os.getenv("NODE_NAME", "")  # empty = single-node mode, all regions local
+
+REGIONS = ["north", "south", "east", "west"]
+DEFAULT_MAX_CONCURRENT = 3  # matches what /register writes for new experts
+
+def _parse_peers(raw: str) -> dict:
+    # "south=http://south_app:8000,east=http://east_app:8000"
+    peers = {}
+    for item in raw.split(","):
+        if "=" in item:
+            region, url = item.split("=", 1)
+            if region.strip() and region.strip() != NODE_NAME:
+                peers[region.strip()] = url.strip().rstrip("/")
+    return peers
+
+PEER_NODES = _parse_peers(os.getenv("PEER_NODES", ""))
+GOSSIP_INTERVAL = float(os.getenv("GOSSIP_INTERVAL", "5"))
+PEER_TIMEOUT = float(os.getenv("PEER_TIMEOUT", "2"))
+# Shared by all nodes; node-to-node endpoints refuse every call while it is unset
+NODE_SECRET = os.getenv("NODE_SECRET", "")
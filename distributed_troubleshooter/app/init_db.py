@@ -1,8 +1,9 @@
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from datetime import datetime
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 
 # Collections to initialize
 messages_collection = db["messages"]
@@ -1,15 +1,42 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import asyncio
+import logging
+import os
+import time
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from app.routes import user, expert
 from app.auth import auth_router
+from app.auth import passwords
+from app.auth.sessions import session_store
+from app.services.nodes import node_registry
+from app.services.roster import expert_roster
+from app.services.outbox import outbox
+from app.services.scheduler import assignment_scheduler
+from app.services.weights import weight_store
+from app.services.rollups import region_rollups
+from app.services.archive import issue_archive
+from app.services.resolutions import resolution_index
+from app.services.duplicates import duplicate_index
+from app.services.ratelimit import admission
+from app.services.profiler import continuous_profiler, PROFILER_CONTINUOUS
 from app.routes import admin
 from app.routes import profile
 from app.routes import ratings
 from app.routes import chat
 from app.routes import status
+from app.routes import node
+from app.routes import events
+from app.routes import match
+from app.routes import metrics
+from app.services.metrics import http_request_seconds, http_requests_total
+from app.responses import FastJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.websocket_manager import ws_manager  # ✅ Import the singleton
 
-app = FastAPI()
+# Set LOG_LEVEL=DEBUG to see sampled per-expert scoring (SCORING_LOG_SAMPLE)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+# ✅ orjson for every response; list endpoints also return FastJSONResponse directly
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # ✅ Enable CORS for all origins (for dev)
 app.add_middleware(
@@ -29,11 +56,72 @@ app.include_router(profile.router)
 app.include_router(ratings.router)
 app.include_router(status.router)
 app.include_router(chat.router)
+app.include_router(node.router)
+app.include_router(events.router)
+app.include_router(match.router)
+app.include_router(metrics.router)
+
+# ✅ Per-route latency, labelled by route template so ids don't explode cardinality
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        http_request_seconds.observe(time.perf_counter() - start, method=request.method, route=path)
+        http_requests_total.inc(method=request.method, route=path, status=status_code)
+
+# ✅ Lifecycle hooks
+@app.on_event("startup")
+async def startup():
+    auth_router.ensure_identities()
+    session_store.ensure_indexes()
+    expert_roster.load()
+    weight_store.ensure_indexes()
+    weight_store.reload()
+    asyncio.create_task(weight_store.poll_loop())
+    asyncio.create_task(expert_roster.sync_loop())
+    outbox.ensure_indexes()
+    if node_registry.enabled:
+        node_registry.load_remote_users()
+        outbox.relay = node_registry
+    asyncio.create_task(outbox.dispatch_loop())
+    assignment_scheduler.start()
+    asyncio.create_task(assignment_scheduler.run())
+    region_rollups.ensure_indexes()
+    region_rollups.backfill()
+    region_rollups.refresh()
+    asyncio.create_task(region_rollups.run())
+    issue_archive.ensure_collections()
+    asyncio.create_task(issue_archive.run())
+    resolution_index.ensure_indexes()
+    resolution_index.load()
+    asyncio.create_task(asyncio.to_thread(resolution_index.backfill))  # only encodes what load() lacked
+    asyncio.create_task(resolution_index.sync_loop())
+    asyncio.create_task(duplicate_index.sync_loop())
+    asyncio.create_task(session_store.purge_loop())
+    asyncio.create_task(admission.monitor())
+    if PROFILER_CONTINUOUS:
+        continuous_profiler.start()
+    if node_registry.enabled:
+        asyncio.create_task(node_registry.gossip_loop())
+
+@app.on_event("shutdown")
+async def shutdown():
+    passwords.shutdown()
+    region_rollups.flush()
+    await node_registry.close()
 
 # ✅ WebSocket Endpoint
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
     await ws_manager.connect(user_id, websocket)
+    outbox.wake()  # deliver anything queued while this user was offline
     try:
         while True:
             await websocket.receive_text()
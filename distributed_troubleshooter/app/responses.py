@@ -0,0 +1,73 @@
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:  # same output through the stdlib, just slower
+    orjson = None
+
+# -------------------------------
+# ⚡ Fast JSON for Mongo documents
+# -------------------------------
+def _default(value):
+    # orjson already handles datetime; the stdlib fallback needs both
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """Encodes ObjectId and datetime natively, so handlers return documents as read.
+
+    Returned directly from a handler it also skips FastAPI's jsonable_encoder
+    and response_model validation; the response_model then documents the
+    shape and, through projection(), decides which fields are read at all.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+# -------------------------------
+# 🔎 Projections from response models
+# -------------------------------
+def model_fields(model) -> list:
+    fields = getattr(model, "model_fields", None)  # pydantic 2
+    if fields is None:
+        fields = model.__fields__  # pydantic 1
+    return list(fields)
+
+def projection(model, exclude=()) -> dict:
+    """Mongo projection reading only the model's fields (never _id)."""
+    return {"_id": 0, **{name: 1 for name in model_fields(model) if name not in exclude}}
+
+# -------------------------------
+# 🏷️ Conditional GETs
+# -------------------------------
+# Browsers keep the body but revalidate every time, sending If-None-Match on their own
+CACHE_CONTROL = "private, no-cache"
+# The body depends on who is asking, not just the URL
+VARY = "Authorization"
+
+def not_modified(request: Request, etag: str):
+    """A 304 when If-None-Match already names this ETag, else None.
+
+    Compute the ETag before reading: a write racing the read then only
+    costs the client one extra full response.
+    """
+    header = request.headers.get("if-none-match")
+    if header and (header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": VARY})
+    return None
+
+def tagged(content, etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": VARY})
@@ -1,12 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from app.auth.auth_handler import get_current_user
+from app.services.roster import expert_roster
+from app.services.scheduler import assignment_scheduler
+from app.services.rollups import region_rollups
+from app.config import REGIONS
+from app.responses import FastJSONResponse, projection, not_modified, tagged
+from app.services.versions import resource_versions, profile_key
+from app.routes.expert import UnverifiedExpert
+from app.services.archive import issue_archive
+from app.services import profiler
+from fastapi.responses import PlainTextResponse
+import asyncio
+import time
 
 router = APIRouter()
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 issues_collection = db["issues"]
 experts_collection = db["experts"]
 
@@ -17,6 +32,15 @@ class TagUpdateRequest(BaseModel):
     tags: list[str]
     notes: str = ""
 
+class RegionIssue(BaseModel):
+    issue_id: str
+    title: str = ""
+    status: str
+    region: Optional[str] = None
+    urgency: Optional[int] = None
+    assigned_expert: str = "Not Assigned"
+    timestamp: Optional[datetime] = None
+
 # -----------------------
 # POST /admin/login
 # -----------------------
@@ -29,14 +53,12 @@ def admin_login(payload: dict):
 # -----------------------
 # GET /experts_unverified
 # -----------------------
-@router.get("/experts_unverified")
+@router.get("/experts_unverified", response_model=list[UnverifiedExpert])
 def get_unverified_experts(current_user=Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admins can access this.")
-    experts = list(experts_collection.find({"is_verified": False}))
-    for e in experts:
-        e["_id"] = str(e["_id"])  # Convert ObjectId
-    return experts
+    experts = list(experts_collection.find({"is_verified": False}, projection(UnverifiedExpert)))
+    return FastJSONResponse(experts)
 
 # -----------------------
 # POST /admin/verify_expert/{expert_id}
@@ -63,6 +85,9 @@ def verify_expert(expert_id: str, payload: TagUpdateRequest, current_user=Depend
             }
         }
     )
+    expert_roster.refresh_expert(expert_id)
+    resource_versions.bump(profile_key(expert_id))
+    assignment_scheduler.capacity_freed(expert_id)
 
     return {"message": f"Expert {expert_id} verified and tagged."}
 
@@ -70,54 +95,64 @@ def verify_expert(expert_id: str, payload: TagUpdateRequest, current_user=Depend
 # GET /region_stats
 # -----------------------
 @router.get("/region_stats")
-def get_region_stats():
-    regions = ["north", "south", "east", "west"]
+def get_region_stats(request: Request, hours: int = 24):
+    # ✅ Served from the rollup cache and the roster: no collection scans
+    hours = max(1, min(hours, 24 * 7))
+    etag = resource_versions.etag(extra=(hours, expert_roster.version, region_rollups.version))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     stats = {}
 
-    for region in regions:
-        active_issues = issues_collection.count_documents({
-            "region": region,
-            "status": {"$in": ["pending", "assigned", "in_progress"]}
-        })
-
-        available_experts = experts_collection.count_documents({
-            "region": region,
-            "is_available": True,
-            "is_verified": True
-        })
-
+    for region in REGIONS:
         stats[region] = {
-            "active_issues": active_issues,
-            "available_experts": available_experts
+            "active_issues": region_rollups.open_count(region),
+            "available_experts": expert_roster.available_count(region),
+            f"last_{hours}h": region_rollups.summary(region, hours),
         }
 
-    return stats
+    return tagged(stats, etag)
+
+# -----------------------
+# GET /region_rollups (hourly series for charts)
+# -----------------------
+@router.get("/region_rollups")
+def get_region_rollups(hours: int = 24, current_user=Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access this.")
+
+    hours = max(1, min(hours, 24 * 7))
+    return {region: region_rollups.series(region, hours) for region in REGIONS}
 
 # -----------------------
 # GET /all_issues_by_region
 # -----------------------
-@router.get("/all_issues_by_region")
-def get_issues_by_region(current_user=Depends(get_current_user)):
+@router.get("/all_issues_by_region", response_model=dict[str, list[RegionIssue]])
+def get_issues_by_region(limit: int = 500, current_user=Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admins can access this.")
 
-    grouped = {"north": [], "south": [], "east": [], "west": []}
-    issues = list(issues_collection.find())
+    # ✅ Open work only (history lives in the rollups), newest first, bounded
+    limit = max(1, min(limit, 2000))
+    grouped = {region: [] for region in REGIONS}
+    issues = issues_collection.find(
+        {"status": {"$in": ["pending", "assigned", "in_progress", "awaiting_user_confirmation", "linked"]}},
+        projection(RegionIssue)
+    ).sort("timestamp", -1).limit(limit)
 
     for issue in issues:
         region = issue.get("region", "unknown")
-        issue["_id"] = str(issue["_id"])
-        issue["assigned_expert"] = issue.get("assigned_expert", "Not Assigned")
+        issue["assigned_expert"] = issue.get("assigned_expert") or "Not Assigned"
         grouped.setdefault(region, []).append(issue)
 
-    return grouped
+    return FastJSONResponse(grouped)
 
 @router.get("/rerouted_issues")
 def get_rerouted_issues(current_user=Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admins can view this.")
 
-    issues = list(issues_collection.find(
+    issues = issue_archive.find_issues(
         {"reassignment_log.1": {"$exists": True}},
         {
             "_id": 0,
@@ -126,6 +161,59 @@ def get_rerouted_issues(current_user=Depends(get_current_user)):
             "region": 1,
             "reassignment_log": 1
         }
-    ))
+    )
 
     return issues
+
+# -----------------------
+# 🔬 Sampling profiler on this worker
+# -----------------------
+PROFILE_FORMATS = ("collapsed", "speedscope")
+
+def profile_response(counts, fmt: str, interval: float, name: str):
+    if fmt == "speedscope":
+        return FastJSONResponse(
+            profiler.speedscope(counts, interval, name),
+            headers={"Content-Disposition": f'attachment; filename="{name}.speedscope.json"'}
+        )
+    return PlainTextResponse(profiler.collapsed(counts))
+
+@router.get("/admin/profile")
+async def profile_worker(seconds: float = 10, format: str = "collapsed", current_user=Depends(get_current_user)):
+    """Sample every thread for `seconds`; the event loop keeps serving meanwhile."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can profile nodes.")
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}.")
+    if not 0 < seconds <= profiler.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {profiler.PROFILE_MAX_SECONDS}].")
+    if not profiler.profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker.")
+    try:
+        counts, interval = await asyncio.to_thread(profiler.sample_for, seconds)
+    finally:
+        profiler.profile_lock.release()
+    return profile_response(counts, format, interval, f"profile-{int(time.time())}")
+
+@router.get("/admin/profile/continuous")
+def continuous_profile(minutes: int = 5, format: str = "collapsed", current_user=Depends(get_current_user)):
+    """Aggregated stacks of the last `minutes` from the low-rate background sampler."""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can profile nodes.")
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(PROFILE_FORMATS)}.")
+    if not profiler.continuous_profiler.slots:
+        raise HTTPException(status_code=404, detail="Continuous profiling has not collected anything yet.")
+    counts = profiler.continuous_profiler.recent(minutes)
+    return profile_response(counts, format, profiler.continuous_profiler.interval, f"continuous-{int(time.time())}")
+
+@router.post("/admin/profile/continuous")
+def toggle_continuous_profile(enabled: bool, current_user=Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can profile nodes.")
+    if enabled:
+        profiler.continuous_profiler.start()
+    else:
+        profiler.continuous_profiler.stop()
+    return {"continuous": enabled, "interval": profiler.continuous_profiler.interval,
+            "minutes_kept": len(profiler.continuous_profiler.slots)}
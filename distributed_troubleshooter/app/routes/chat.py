@@ -1,20 +1,38 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
+from pydantic import BaseModel
+from typing import Optional
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from datetime import datetime
 from app.auth.auth_handler import get_current_user
-from app.websocket_manager import ws_manager  # ✅ WebSocket handler
+from app.services.outbox import outbox
+from app.responses import FastJSONResponse, projection
+from app.services.archive import issue_archive
+from app.services.ratelimit import limit
+from app.services.nodes import node_registry
+import asyncio
 
 router = APIRouter()
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 messages_collection = db["messages"]
 issues_collection = db["issues"]
 
+# Only the two parties decide access to a chat
+PARTIES = {"_id": 0, "submitted_by": 1, "assigned_expert": 1}
+
+class Message(BaseModel):
+    issue_id: str
+    sender_id: Optional[str] = None
+    sender_role: str
+    content: str
+    timestamp: datetime
+
 # -------------------------------
 # 📨 Send a New Message
 # -------------------------------
-@router.post("/messages/{issue_id}")
+@router.post("/messages/{issue_id}", dependencies=[Depends(limit("chat_send"))])
 async def send_message(issue_id: str, request: Request, current_user=Depends(get_current_user)):
     issue = issues_collection.find_one({"issue_id": issue_id})
     if not issue:
@@ -29,6 +47,12 @@ async def send_message(issue_id: str, request: Request, current_user=Depends(get
         raise HTTPException(status_code=403, detail="You are not part of this issue")
 
     body = await request.json()
+    if issue.get("status") == "forwarded":
+        # The chat lives on the node that took the issue
+        return await asyncio.to_thread(
+            node_registry.proxy, issue["forwarded_to"], "POST", f"/messages/{issue_id}",
+            request.headers.get("Authorization"), body
+        )
     content = body.get("message")
     if not content:
         raise HTTPException(status_code=400, detail="Message content missing")
@@ -44,7 +68,7 @@ async def send_message(issue_id: str, request: Request, current_user=Depends(get
     messages_collection.insert_one(message_doc)
 
     recipient_id = issue["assigned_expert"] if role == "user" else issue["submitted_by"]
-    await ws_manager.send_event(recipient_id, "new_message", {
+    await outbox.publish_async(recipient_id, "new_message", {
         "message": "new message sent",
         "issue_id": issue_id
     })
@@ -55,9 +79,9 @@ async def send_message(issue_id: str, request: Request, current_user=Depends(get
 # -------------------------------
 # 📄 Get Messages (return list even if issue not found)
 # -------------------------------
-@router.get("/messages/{issue_id}")
-def get_messages(issue_id: str, current_user=Depends(get_current_user)):
-    issue = issues_collection.find_one({"issue_id": issue_id})
+@router.get("/messages/{issue_id}", response_model=list[Message], dependencies=[Depends(limit("chat_poll"))])
+def get_messages(issue_id: str, request: Request, current_user=Depends(get_current_user)):
+    issue = issue_archive.find_issue(issue_id, {**PARTIES, "status": 1, "forwarded_to": 1})  # closed chats may be archived
 
     # ✅ Always return an array (empty if issue not found)
     if not issue:
@@ -71,51 +95,7 @@ def get_messages(issue_id: str, current_user=Depends(get_current_user)):
     if role == "expert" and issue.get("assigned_expert") != user_id:
         raise HTTPException(status_code=403, detail="You are not part of this issue")
 
-    messages = list(messages_collection.find({"issue_id": issue_id}).sort("timestamp", 1))
-    for msg in messages:
-        msg["_id"] = str(msg["_id"])
-        msg["timestamp"] = msg["timestamp"].isoformat()
-
-    return messages
-
-# -------------------------------
-# ✅ Mark Issue as Done
-# -------------------------------
-@router.post("/mark_done/{issue_id}")
-async def mark_issue_done(issue_id: str, current_user=Depends(get_current_user)):
-    issue = issues_collection.find_one({"issue_id": issue_id})
-    if not issue:
-        raise HTTPException(status_code=404, detail="Issue not found")
-
-    role = current_user["role"]
-    user_id = current_user["user_id"]
+    if issue.get("status") == "forwarded":
+        return node_registry.proxy(issue["forwarded_to"], "GET", f"/messages/{issue_id}", request.headers.get("Authorization"))
 
-    if role == "user":
-        if issue.get("submitted_by") != user_id:
-            raise HTTPException(status_code=403, detail="You are not part of this issue")
-        issues_collection.update_one({"issue_id": issue_id}, {"$set": {"done_by_user": True}})
-    elif role == "expert":
-        if issue.get("assigned_expert") != user_id:
-            raise HTTPException(status_code=403, detail="You are not part of this issue")
-        issues_collection.update_one({"issue_id": issue_id}, {"$set": {"done_by_expert": True}})
-    else:
-        raise HTTPException(status_code=403, detail="Invalid role")
-
-    updated = issues_collection.find_one({"issue_id": issue_id})
-    if updated.get("done_by_user") and updated.get("done_by_expert"):
-        issues_collection.update_one({"issue_id": issue_id}, {"$set": {"status": "closed"}})
-
-        await ws_manager.send_event(updated["submitted_by"], "issue_closed", {"issue_id": issue_id})
-        await ws_manager.send_event(updated["assigned_expert"], "issue_closed", {"issue_id": issue_id})
-
-        return {
-            "status": "closed",
-            "message": "Issue fully marked as done and closed.",
-            "request_feedback": True
-        }
-
-    return {
-        "status": "pending_other_party",
-        "message": "Marked done. Awaiting other party.",
-        "request_feedback": False
-    }
+    return FastJSONResponse(issue_archive.messages_for(issue_id, projection(Message)))
@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends
+from app.auth.auth_handler import get_current_user
+from app.services.outbox import outbox
+
+router = APIRouter()
+
+# -------------------------------
+# 🔁 Replay missed WebSocket events
+# -------------------------------
+@router.get("/events/replay")
+def replay_events(after_seq: int = 0, limit: int = 100, current_user=Depends(get_current_user)):
+    # Reconnecting clients send the last seq they saw and get everything after it
+    limit = max(1, min(limit, 500))
+    return outbox.replay(current_user["user_id"], after_seq, limit)
@@ -1,42 +1,87 @@
-import asyncio
-
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from datetime import datetime
+from typing import Optional
 from app.auth.auth_handler import get_current_user
-from app.websocket_manager import ws_manager  # ✅ correct if 'websocket_manager.py' is inside the app/ folder
-from app.services.utils import match_best_expert, retry_assignment
-from fastapi import BackgroundTasks
+from app.services.outbox import outbox
+from app.services.utils import reassignment_candidates
+from app.services.scheduler import assignment_scheduler
+from app.services import issue_state
+from app.services.roster import expert_roster
+from app.services.duplicates import duplicate_index
+from app.responses import FastJSONResponse, projection, not_modified, tagged
+from app.services.versions import resource_versions, assignments_key, profile_key
 router = APIRouter()
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 issues_collection = db["issues"]
 experts_collection = db["experts"]
 feedback_collection = db["feedback"]
 user_feedback_collection = db["user_feedback"]
 users_collection = db["users"]
 
+# -----------------------
+# Response models (also the Mongo projections)
+# -----------------------
+class Assignment(BaseModel):
+    issue_id: str
+    title: str = ""
+    description: str = ""
+    category: Optional[str] = None
+    urgency: Optional[int] = None
+    status: str
+    region: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    submitted_by: Optional[str] = None  # user email
+    submitted_by_id: Optional[str] = None
+    resolution_notes: Optional[str] = None
+    linked_count: int = 0  # other users' reports riding on this one
+
+class UnverifiedExpert(BaseModel):
+    expert_id: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+    region: Optional[str] = None
+    qualifications: str = ""
+    experience_years: int = 0
+    quiz_score: int = 0
+    portfolio_url: str = ""
+    proof_resume: str = ""
+    verification_notes: str = ""
+
 # -----------------------
 # GET /expert_assignments
 # -----------------------
-@router.get("/expert_assignments")
-def get_assignments(current_user=Depends(get_current_user)):
+@router.get("/expert_assignments", response_model=list[Assignment])
+def get_assignments(request: Request, current_user=Depends(get_current_user)):
     if current_user["role"] != "expert":
         raise HTTPException(status_code=403, detail="Only experts can view their assignments.")
 
     expert_id = current_user["user_id"]
+    etag = resource_versions.etag([assignments_key(expert_id)])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     assignments = list(issues_collection.find({
         "assigned_expert": expert_id,
         "status": {"$in": ["assigned", "in_progress", "awaiting_user_confirmation"]}
-    }))
+    }, projection(Assignment, exclude=("submitted_by_id",))))
+
+    # One lookup for every submitter's email instead of one per issue
+    user_ids = list({a["submitted_by"] for a in assignments if a.get("submitted_by")})
+    emails = {
+        u["user_id"]: u.get("email")
+        for u in users_collection.find({"user_id": {"$in": user_ids}}, {"_id": 0, "user_id": 1, "email": 1})
+    } if user_ids else {}
+
     for a in assignments:
-        a["_id"] = str(a["_id"])
-        user = users_collection.find_one({"user_id": a["submitted_by"]})
-        a["submitted_by_id"] = a["submitted_by"]  # Add this line
-        a["submitted_by"] = user.get("email", a["submitted_by"]) if user else a["submitted_by"]
-    return assignments
+        a["submitted_by_id"] = a.get("submitted_by")
+        a["submitted_by"] = emails.get(a["submitted_by_id"]) or a["submitted_by_id"]
+    return tagged(assignments, etag)
 
 
 # -----------------------
@@ -51,15 +96,11 @@ async def accept_assignment(data: AcceptRequest, current_user=Depends(get_curren
         raise HTTPException(status_code=403, detail="Only experts can accept assignments.")
 
     expert_id = current_user["user_id"]
-    issue = issues_collection.find_one({"issue_id": data.issue_id, "assigned_expert": expert_id})
+    issue = issue_state.accept(data.issue_id, expert_id)
     if not issue:
         raise HTTPException(status_code=404, detail="Issue not found or not assigned to this expert.")
 
-    issues_collection.update_one(
-        {"issue_id": data.issue_id},
-        {"$set": {"status": "in_progress"}}
-    )
-    await ws_manager.send_event(issue["submitted_by"], "issue_started", {"issue_id": issue["issue_id"]})
+    await outbox.publish_async(issue["submitted_by"], "issue_started", {"issue_id": issue["issue_id"]})
     return {"message": "Assignment accepted."}
 
 # -----------------------
@@ -75,34 +116,29 @@ async def submit_resolution(data: ResolutionRequest, current_user=Depends(get_cu
         raise HTTPException(status_code=403, detail="Only experts can submit resolutions.")
 
     expert_id = current_user["user_id"]
-    issue = issues_collection.find_one({"issue_id": data.issue_id, "assigned_expert": expert_id})
+    # ✅ Conditional transition: a repeated submit can't decrement active_issues twice
+    issue = issue_state.resolve(data.issue_id, expert_id, data.resolution_notes)
     if not issue:
         raise HTTPException(status_code=404, detail="Issue not found or not assigned to expert.")
 
-    issues_collection.update_one(
-        {"issue_id": data.issue_id},
-        {
-            "$set": {
-                "status": "awaiting_user_confirmation",
-                "resolution_notes": data.resolution_notes,
-                "resolved_at": datetime.utcnow(),
-                "done_by_user": False,
-                "done_by_expert": False
-            }
-        }
-    )
+    # ✅ A slot just freed up: pull the best-matching waiting issue for this expert
+    assignment_scheduler.capacity_freed(expert_id)
 
-    experts_collection.update_one(
-        {"expert_id": expert_id},
-        {"$inc": {"active_issues": -1}}
-    )
-
-    await asyncio.sleep(0.1)
-    await ws_manager.send_event(
+    events = [(
         issue["submitted_by"],
         "resolution_submitted",
         {"issue_id": data.issue_id, "resolution_notes": data.resolution_notes}  # ✅ Include resolution_notes
-    )
+    )]
+
+    # ✅ Same resolution to everyone whose report was linked to this one
+    duplicate_index.discard(data.issue_id)
+    for linked in issue_state.resolve_linked(issue):
+        events.append((
+            linked["submitted_by"],
+            "resolution_submitted",
+            {"issue_id": linked["issue_id"], "resolution_notes": data.resolution_notes, "canonical_issue": data.issue_id}
+        ))
+    await outbox.publish_many_async(events)
 
     return {"message": "Resolution submitted. Awaiting user's confirmation."}
 
@@ -141,8 +177,10 @@ async def rate_expert(data: RatingRequest, current_user=Depends(get_current_user
         {"expert_id": data.expert_id},
         {"$set": {"trust_score": new_score}, "$inc": {"trust_votes": 1}}
     )
+    expert_roster.refresh_expert(data.expert_id)
+    resource_versions.bump(profile_key(data.expert_id))
 
-    await ws_manager.send_event(data.expert_id, "expert_rated", {"issue_id": data.issue_id})
+    await outbox.publish_async(data.expert_id, "expert_rated", {"issue_id": data.issue_id})
     return {"message": "Feedback recorded. Trust score updated."}
 
 # -----------------------
@@ -183,19 +221,19 @@ async def rate_user(data: UserRatingRequest, current_user=Depends(get_current_us
         {"user_id": data.user_id},
         {"$set": {"trust_score": new_score}, "$inc": {"trust_votes": 1}}
     )
+    resource_versions.bump(profile_key(data.user_id))
 
-    await ws_manager.send_event(data.user_id, "user_rated", {"issue_id": data.issue_id})
+    await outbox.publish_async(data.user_id, "user_rated", {"issue_id": data.issue_id})
     return {"message": "User feedback recorded. User trust score updated."}
 
-@router.get("/experts_unverified")
+@router.get("/experts_unverified", response_model=list[UnverifiedExpert])
 def get_unverified_experts(current_user=Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Only admins can access this.")
 
-    experts = list(experts_collection.find({"is_verified": False}))
-    for e in experts:
-        e["_id"] = str(e["_id"])
-    return experts
+    # Password hashes and matching fields are never read
+    experts = list(experts_collection.find({"is_verified": False}, projection(UnverifiedExpert)))
+    return FastJSONResponse(experts)
 
 @router.post("/admin/verify_expert/{expert_id}")
 def verify_expert(expert_id: str, notes: str = "", current_user=Depends(get_current_user)):
@@ -218,6 +256,9 @@ def verify_expert(expert_id: str, notes: str = "", current_user=Depends(get_curr
             }
         }
     )
+    resource_versions.bump(profile_key(expert_id))
+    expert_roster.refresh_expert(expert_id)
+    assignment_scheduler.capacity_freed(expert_id)
 
     return {"message": f"Expert {expert_id} verified."}
 
@@ -240,6 +281,7 @@ def submit_quiz_score(data: QuizScoreRequest, current_user=Depends(get_current_u
 
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Expert not found.")
+    resource_versions.bump(profile_key(expert_id))
 
     return {"message": "Quiz score submitted successfully."}
 
@@ -266,39 +308,13 @@ def update_availability(data: AvailabilityRequest, current_user=Depends(get_curr
 
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Expert not found.")
+    expert_roster.refresh_expert(expert_id)
+    resource_versions.bump(profile_key(expert_id))
+    if is_available:
+        assignment_scheduler.capacity_freed(expert_id)
 
     return {"message": f"Availability updated to '{data.availability}'."}
 
-@router.post("/mark_done/{issue_id}")
-async def mark_done(issue_id: str, current_user=Depends(get_current_user)):
-    issue = issues_collection.find_one({"issue_id": issue_id})
-    if not issue:
-        raise HTTPException(status_code=404, detail="Issue not found")
-
-    role = current_user["role"]
-    updates = {}
-
-    if role == "user":
-        updates["done_by_user"] = True
-    elif role == "expert":
-        updates["done_by_expert"] = True
-    else:
-        raise HTTPException(status_code=403, detail="Invalid role")
-
-    issues_collection.update_one({"issue_id": issue_id}, {"$set": updates})
-    updated = issues_collection.find_one({"issue_id": issue_id})
-
-    if updated.get("done_by_user") and updated.get("done_by_expert"):
-        issues_collection.update_one(
-            {"issue_id": issue_id},
-            {"$set": {"status": "closed"}}
-        )
-        await ws_manager.send_event(updated["submitted_by"], "issue_closed", {"issue_id": issue_id})
-        await ws_manager.send_event(updated["assigned_expert"], "issue_closed", {"issue_id": issue_id})
-        return {"status": "closed", "message": "Issue successfully closed."}
-    else:
-        return {"status": "pending", "message": "Marked done. Awaiting confirmation from other party."}
-
 class RejectRequest(BaseModel):
     issue_id: str
 
@@ -307,78 +323,48 @@ async def reject_issue(data: RejectRequest, current_user=Depends(get_current_use
     if current_user["role"] != "expert":
         raise HTTPException(status_code=403, detail="Only experts can reject issues.")
 
-    issue = issues_collection.find_one({"issue_id": data.issue_id})
-    if not issue or issue.get("assigned_expert") != current_user["user_id"]:
+    # Step 1: Unassign and add to rejection list (returns the updated issue)
+    issue = issue_state.unassign(data.issue_id, current_user["user_id"], "rejected_by")
+    if not issue:
         raise HTTPException(status_code=404, detail="Issue not found or not assigned to you.")
+    # The freed slot can take another waiting issue (never this one: it is in rejected_by).
+    # The fill runs on the loop after this handler, so it sees the enqueue below
+    assignment_scheduler.capacity_freed(current_user["user_id"])
+
+    # Step 2: Exclude everyone who already passed on it
+    skip_ids = set(issue.get("rejected_by", []) + issue.get("skipped_by", []))
+
+    # Step 3: Next eligible candidate from the stored ranking (rescored only when
+    # stale), reserving a slot and falling through on conflicts
+    ranked, ranking = reassignment_candidates(issue, exclude_ids=skip_ids)
+    assigned = issue_state.assign_first(data.issue_id, ranked, log=True, ranking=ranking)
+
+    # ✅ Reassign and log it
+    if assigned:
+        new_expert_id = assigned["assigned_expert"]
+        # ✅ Notify expert and user (no user_id is skipped)
+        await outbox.publish_many_async([
+            (new_expert_id, "issue_assigned", {"issue_id": data.issue_id}),
+            (issue.get("submitted_by"), "issue_assigned", {
+                "issue_id": data.issue_id,
+                "message": "Your issue has been reassigned to another expert."
+            }),
+        ])
+
+        return {"message": "Issue rejected and reassigned.", "new_expert": new_expert_id}
 
-    # Step 1: Unassign and add to rejection list
+    # ❌ No other expert found → mark for retry
     issues_collection.update_one(
         {"issue_id": data.issue_id},
-        {
-            "$set": {"assigned_expert": None, "status": "pending"},
-            "$addToSet": {"rejected_by": current_user["user_id"]}
-        }
+        {"$set": {"reassignment_status": "waiting"}}
     )
 
-    # ✅ Decrease active_issues count for rejecting expert
-    experts_collection.update_one(
-        {"expert_id": current_user["user_id"]},
-        {"$inc": {"active_issues": -1}}
-    )
-
-    # Step 2: Fetch updated issue and get all other available experts
-    issue = issues_collection.find_one({"issue_id": data.issue_id})
-    rejected_ids = issue.get("rejected_by", [])
-
-    available_experts = list(experts_collection.find({
-        "is_verified": True,
-        "availability": "available",
-        "expert_id": {"$nin": rejected_ids}
-    }))
-
-    # Step 3: Match best expert
-    new_expert_id = match_best_expert(issue, available_experts)
-
-    if new_expert_id:
-        # ✅ Reassign and log it
-        issues_collection.update_one(
-            {"issue_id": data.issue_id},
-            {
-                "$set": {"assigned_expert": new_expert_id, "status": "assigned"},
-                "$push": {
-                    "reassignment_log": {
-                        "expert_id": new_expert_id,
-                        "timestamp": datetime.utcnow()
-                    }
-                }
-            }
-        )
-        experts_collection.update_one({"expert_id": new_expert_id}, {"$inc": {"active_issues": 1}})
-
-        # ✅ Notify expert and user
-        await ws_manager.send_event(new_expert_id, "issue_assigned", {"issue_id": data.issue_id})
-
-        # ❌ No other expert found → mark for retry
-        issues_collection.update_one(
-            {"issue_id": data.issue_id},
-            {"$set": {"reassignment_status": "waiting"}}
-        )
-
-        if issue.get("submitted_by"):
-            await ws_manager.send_event(issue["submitted_by"], "issue_assigned", {
-                "issue_id": data.issue_id,
-                "message": "Your issue is currently unassigned. We are retrying periodically to find a suitable expert."
-            })
-
-        return {"message": "Issue unassigned. No other expert available currently."}
+    await outbox.publish_async(issue.get("submitted_by"), "issue_assigned", {
+        "issue_id": data.issue_id,
+        "message": "Your issue is currently unassigned. We're trying to find another expert."
+    })
 
-    # ❌ No other expert found
-    if issue.get("submitted_by"):
-        await ws_manager.send_event(issue["submitted_by"], "issue_assigned", {
-            "issue_id": data.issue_id,
-            "message": "Your issue is currently unassigned. We're trying to find another expert."
-        })
+    # Queue by urgency; the next freed slot goes to the best-matching waiting issue
+    assignment_scheduler.enqueue(issue)
 
     return {"message": "Issue unassigned. No other expert available currently."}
-# Background retry assignment
-    asyncio.create_task(retry_assignment(data.issue_id))
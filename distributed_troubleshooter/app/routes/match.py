@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
+from app.auth.auth_handler import get_current_user
+from app.services.utils import explain_fallback, ranking_is_fresh, ranking_record
+
+router = APIRouter()
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+issues_collection = db["issues"]
+
+# -------------------------------
+# 🔎 GET /match/{issue_id} — explainable top-k ranking
+# -------------------------------
+@router.get("/match/{issue_id}")
+def explain_match(issue_id: str, k: int = 5, refresh: bool = False, current_user=Depends(get_current_user)):
+    issue = issues_collection.find_one({"issue_id": issue_id}, {"_id": 0})
+    if not issue:
+        raise HTTPException(status_code=404, detail="Issue not found.")
+
+    user_id = current_user["user_id"]
+    if current_user["role"] != "admin" and user_id not in (issue.get("submitted_by"), issue.get("assigned_expert")):
+        raise HTTPException(status_code=403, detail="You are not part of this issue")
+
+    k = max(1, min(k, 20))
+    ranking = issue.get("match_ranking")
+    source = "stored"
+
+    # ✅ Rescore only when asked to or when the stored order is stale. Read only:
+    # match_ranking is written by the state machine (issue_state.assign_first), never here
+    if refresh or not ranking_is_fresh(ranking):
+        skip_ids = set(issue.get("rejected_by", []) + issue.get("skipped_by", []))
+        ranking = ranking_record(explain_fallback(issue, exclude_ids=skip_ids), k=k)
+        source = "computed"
+
+    return {
+        "issue_id": issue_id,
+        "assigned_expert": issue.get("assigned_expert"),
+        "source": source,
+        "computed_at": ranking["computed_at"],
+        "candidates": ranking["candidates"][:k],
+    }
@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.auth import passwords
+from app.services.metrics import registry
+from app.services.roster import expert_roster
+from app.services.scheduler import assignment_scheduler
+from app.services.ratelimit import admission
+from app.websocket_manager import ws_manager
+
+router = APIRouter()
+
+# -------------------------------
+# 📊 Process gauges, read at scrape time
+# -------------------------------
+registry.gauge("password_pool_queue_depth", "bcrypt jobs submitted and not finished.",
+               lambda: passwords.pool_stats()["queue_depth"])
+registry.gauge("password_pool_rejected", "bcrypt jobs shed with 503 since start.",
+               lambda: passwords.pool_stats()["rejected"])
+registry.gauge("password_pool_workers", "bcrypt worker processes.",
+               lambda: passwords.pool_stats()["workers"])
+registry.gauge("websocket_connections", "Open WebSocket connections on this worker.",
+               lambda: len(ws_manager.active_connections))
+registry.gauge("pending_issues_waiting", "Unassigned issues in the scheduler index.",
+               lambda: len(assignment_scheduler.queue))
+registry.gauge("roster_available_experts", "Available verified experts by region.",
+               lambda: {region: len(ids) for region, ids in expert_roster._available.items()}, label="region")
+registry.gauge("roster_version", "Roster change counter.", lambda: expert_roster.version)
+registry.gauge("event_loop_lag_seconds", "Smoothed event-loop lag driving load shedding.", lambda: round(admission.lag, 4))
+registry.gauge("admission_shed_level", "0 none, 1 chat polling shed, 2 all chat shed.", admission.shed_level)
+
+# -------------------------------
+# 📈 GET /metrics (Prometheus text format)
+# -------------------------------
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
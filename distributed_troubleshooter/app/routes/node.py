@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.services.nodes import node_registry
+from app.services.outbox import outbox
+from app.services.versions import resource_versions, issues_key
+
+router = APIRouter()
+
+def require_peer(request: Request):
+    if not node_registry.is_peer(request.headers):
+        raise HTTPException(status_code=403, detail="Node endpoints need the shared node secret.")
+
+# -------------------------------
+# 🌐 Peer-to-peer node endpoints
+# -------------------------------
+@router.post("/node/gossip", dependencies=[Depends(require_peer)])
+def gossip(summary: dict):
+    # Push-pull: store the peer's load summary, answer with ours
+    if not node_registry.record(summary):
+        raise HTTPException(status_code=400, detail="Summary is not from a configured peer or is dated in the future.")
+    return node_registry.local_summary()
+
+@router.get("/node/summary", dependencies=[Depends(require_peer)])
+def node_summary():
+    return {
+        "node": node_registry.region,
+        "local": node_registry.local_summary(),
+        "peers": node_registry.summaries
+    }
+
+@router.post("/node/relay", dependencies=[Depends(require_peer)])
+def relay(payload: dict):
+    # Events from a peer for users whose issue it handles; their socket is here
+    events = payload.get("events", [])
+    outbox.publish_many((event["user_id"], event["event"], event.get("data")) for event in events)
+    resource_versions.bump(*(issues_key(event["user_id"]) for event in events))
+    return {"relayed": len(events)}
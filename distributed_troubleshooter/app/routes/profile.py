@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from typing import Optional
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from app.auth.auth_handler import get_current_user
+from app.services.roster import expert_roster
+from app.services.versions import resource_versions, profile_key
+from app.responses import not_modified, tagged
 
 router = APIRouter()
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 users_collection = db["users"]
 experts_collection = db["experts"]
 
@@ -15,21 +19,26 @@ experts_collection = db["experts"]
 # GET /profile
 # -----------------------
 @router.get("/profile")
-def get_profile(current_user=Depends(get_current_user)):
+def get_profile(request: Request, current_user=Depends(get_current_user)):
     role = current_user["role"]
     user_id = current_user["user_id"]
 
+    etag = resource_versions.etag([profile_key(user_id)], extra=(role,))
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
     if role == "user":
         user = users_collection.find_one(
             {"user_id": user_id}, {"_id": 0, "password": 0}
         )
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        return {
+        return tagged({
             "role": "user",
             "trust_score": round(user.get("trust_score", 0.5), 2),
             **user
-        }
+        }, etag)
 
     elif role == "expert":
         expert = experts_collection.find_one(
@@ -37,11 +46,11 @@ def get_profile(current_user=Depends(get_current_user)):
         )
         if not expert:
             raise HTTPException(status_code=404, detail="Expert not found")
-        return {
+        return tagged({
             "role": "expert",
             "trust_score": round(expert.get("trust_score", 0.5), 2),
             **expert
-        }
+        }, etag)
 
     else:
         raise HTTPException(status_code=403, detail="Invalid role")
@@ -79,5 +88,7 @@ def update_profile(data: UpdateProfileRequest, current_user=Depends(get_current_
 
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Profile not updated.")
+    expert_roster.refresh_expert(expert_id)
+    resource_versions.bump(profile_key(expert_id))
 
     return {"message": "Profile updated successfully."}
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from datetime import datetime
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from app.auth.auth_handler import get_current_user
+from app.services.roster import expert_roster
+from app.services.versions import resource_versions, profile_key
+from app.services.nodes import node_registry
 
 router = APIRouter()
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 ratings_collection = db["ratings"]
 users_collection = db["users"]
 experts_collection = db["experts"]
@@ -21,10 +25,15 @@ class Rating(BaseModel):
     comment: str
 
 @router.post("/submit_rating")
-def submit_rating(rating: Rating, current_user=Depends(get_current_user)):
+def submit_rating(rating: Rating, request: Request, current_user=Depends(get_current_user)):
     if rating.stars < 1 or rating.stars > 5:
         raise HTTPException(status_code=400, detail="Rating must be between 1 and 5.")
 
+    # The expert of a forwarded issue is on the node that took it
+    peer = node_registry.forwarded_to(rating.issue_id, current_user["user_id"])
+    if peer:
+        return node_registry.proxy(peer, "POST", "/submit_rating", request.headers.get("Authorization"), rating.dict())
+
     # ✅ Prevent duplicate ratings for same issue
     existing = ratings_collection.find_one({
         "issue_id": rating.issue_id,
@@ -62,11 +71,14 @@ def submit_rating(rating: Rating, current_user=Depends(get_current_user)):
             { "expert_id": rating.recipient_id },
             { "$set": { "trust_score": avg_score } }
         )
+        expert_roster.refresh_expert(rating.recipient_id)
+        resource_versions.bump(profile_key(rating.recipient_id))
     elif rating.recipient_role == "user":
         users_collection.update_one(
             { "user_id": rating.recipient_id },
             { "$set": { "trust_score": avg_score } }
         )
+        resource_versions.bump(profile_key(rating.recipient_id))
     else:
         raise HTTPException(status_code=400, detail="Invalid recipient role.")
 
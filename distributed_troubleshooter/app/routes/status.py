@@ -1,51 +1,87 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from app.auth.auth_handler import get_current_user
-from datetime import datetime
+from app.services import issue_state
+from app.services.outbox import outbox
+from app.services.nodes import node_registry
+from app.services.resolutions import resolution_index
+from app.services.duplicates import duplicate_index
+from app.services.scheduler import assignment_scheduler
 
 router = APIRouter()
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 issues_collection = db["issues"]
 
+# -------------------------------
+# ✅ Mark Issue as Done (single handler for users and experts)
+# -------------------------------
 @router.post("/mark_done/{issue_id}")
-async def mark_done(issue_id: str, current_user=Depends(get_current_user)):
-    issue = issues_collection.find_one({"issue_id": issue_id})
-    if not issue:
-        raise HTTPException(status_code=404, detail="Issue not found")
-
+async def mark_done(issue_id: str, request: Request, current_user=Depends(get_current_user)):
     role = current_user["role"]
     user_id = current_user["user_id"]
 
-    updates = {}
-    if role == "expert" and issue.get("assigned_expert") == user_id:
-        updates["done_by_expert"] = True
-    elif role == "user" and issue.get("submitted_by") == user_id:
-        updates["done_by_user"] = True
-    else:
-        raise HTTPException(status_code=403, detail="You are not authorized for this action.")
+    if role not in ("user", "expert"):
+        raise HTTPException(status_code=403, detail="Invalid role")
 
-    issues_collection.update_one({"issue_id": issue_id}, {"$set": updates})
+    updated = issue_state.mark_done(issue_id, user_id, role)
 
-    updated = issues_collection.find_one({"issue_id": issue_id})
-    if updated.get("done_by_user") and updated.get("done_by_expert"):
-        issues_collection.update_one({"issue_id": issue_id}, {"$set": {"status": "closed", "closed_at": datetime.utcnow()}})
+    if not updated:
+        # Slow path only on failure: work out why the transition was refused
+        issue = issues_collection.find_one(
+            {"issue_id": issue_id}, {"_id": 0, "submitted_by": 1, "assigned_expert": 1, "status": 1, "forwarded_to": 1}
+        )
+        if not issue:
+            raise HTTPException(status_code=404, detail="Issue not found")
+        party = issue.get("submitted_by") if role == "user" else issue.get("assigned_expert")
+        if party != user_id:
+            raise HTTPException(status_code=403, detail="You are not part of this issue")
+        if issue.get("status") == "forwarded":
+            return await asyncio.to_thread(
+                node_registry.proxy, issue["forwarded_to"], "POST", f"/mark_done/{issue_id}", request.headers.get("Authorization")
+            )
+        raise HTTPException(status_code=409, detail=f"Issue cannot be marked done while '{issue.get('status')}'.")
 
-        # ✅ Trigger feedback on both sides
-        from app.websocket_manager import ws_manager  # safe to import here
+    if updated["status"] == "closed":
+        if not updated.get("resolved_at"):
+            # Closed before any resolve: the slot issue_state just freed can take a waiting issue
+            assignment_scheduler.capacity_freed(updated["assigned_expert"])
+
+        # Searchable as a suggestion for the next user with the same problem
+        await asyncio.to_thread(resolution_index.add, updated)
 
-        await ws_manager.send_event(updated["submitted_by"], "issue_closed", {
+        # Closed without a resolution step: linked duplicates still get the outcome
+        duplicate_index.discard(issue_id)
+        events = [(linked["submitted_by"], "resolution_submitted", {
+            "issue_id": linked["issue_id"],
+            "resolution_notes": updated.get("resolution_notes"),
+            "canonical_issue": issue_id
+        }) for linked in issue_state.resolve_linked(updated)]
+
+        # ✅ Trigger feedback on both sides
+        events.append((updated["submitted_by"], "issue_closed", {
             "issue_id": issue_id,
             "trigger_rating": True,
             "recipient_id": updated["assigned_expert"]
-        })
+        }))
 
-        await ws_manager.send_event(updated["assigned_expert"], "issue_closed", {
+        events.append((updated["assigned_expert"], "issue_closed", {
             "issue_id": issue_id,
             "trigger_rating": True,
             "recipient_id": updated["submitted_by"]
-        })
+        }))
+        await outbox.publish_many_async(events)
 
-        return {"message": "Issue fully closed.", "status": "closed"}
+        return {
+            "status": "closed",
+            "message": "Issue fully marked as done and closed.",
+            "request_feedback": True
+        }
 
-    return {"message": "Marked as done. Waiting for the other party.", "status": "pending"}
+    return {
+        "status": "pending_other_party",
+        "message": "Marked done. Awaiting other party.",
+        "request_feedback": False
+    }
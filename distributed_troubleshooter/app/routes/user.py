@@ -1,19 +1,31 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB
 from app.auth.auth_handler import get_current_user
-from app.services.utils import match_best_expert, retry_assignment
+from app.services.utils import explain_experts, ranking_record, reassignment_candidates
+from app.services.scheduler import assignment_scheduler
+from app.services.roster import expert_roster
+from app.services.nodes import node_registry, FORWARDED_HEADER
+from app.services import issue_state
 import uuid
-from app.websocket_manager import ws_manager  # ✅ correct if 'websocket_manager.py' is inside the app/ folder
+from app.services.outbox import outbox
+from app.services.rollups import region_rollups
 from app.services.utils import get_best_region
+from app.responses import FastJSONResponse, projection, model_fields, not_modified, tagged
+from app.services.versions import resource_versions, issues_key, assignments_key
+from app.services.archive import issue_archive
+from app.services.resolutions import resolution_index, SUGGESTION_K
+from app.services.duplicates import duplicate_index
+from app.services.ratelimit import limit
 import asyncio
-from fastapi import BackgroundTasks
 
 router = APIRouter()
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 issues_collection = db["issues"]
 experts_collection = db["experts"]
 messages_collection = db["messages"]  # ✅ Needed to insert system message
@@ -24,8 +36,48 @@ class IssueCreate(BaseModel):
     category: str
     urgency: int  # 1 to 5
 
-@router.post("/report_issue")
-async def report_issue(data: IssueCreate, background_tasks: BackgroundTasks, current_user=Depends(get_current_user)):
+# Just what the dashboard shows; logs, rankings and skip lists are never read
+class MyIssue(BaseModel):
+    issue_id: str
+    title: str = ""
+    description: str = ""
+    category: Optional[str] = None
+    urgency: Optional[int] = None
+    status: str = "pending"
+    region: Optional[str] = None
+    timestamp: Optional[datetime] = None
+    assigned_expert: Optional[str] = None  # expert email, or "Not Assigned"
+    assigned_expert_id: Optional[str] = None
+    resolution_notes: Optional[str] = None
+    done_by_user: bool = False
+    done_by_expert: bool = False
+    forwarded_to: Optional[str] = None
+    canonical_issue: Optional[str] = None  # set while linked to an ongoing incident
+
+class IssueDraft(BaseModel):
+    title: str
+    description: str = ""
+
+class PastResolution(BaseModel):
+    issue_id: str
+    title: str = ""
+    category: Optional[str] = None
+    resolution_notes: str
+    closed_at: Optional[datetime] = None
+    score: float
+
+# -------------------------------
+# 💡 Past resolutions for a draft, shown before it is submitted
+# -------------------------------
+@router.post("/suggest_resolutions", response_model=list[PastResolution])
+async def suggest_resolutions(data: IssueDraft, k: int = SUGGESTION_K, current_user=Depends(get_current_user)):
+    if current_user["role"] != "user":
+        raise HTTPException(status_code=403, detail="Only users can report issues.")
+    matches = await asyncio.to_thread(resolution_index.search, data.title + " " + data.description, max(1, min(k, 10)))
+    return [{name: match.get(name) for name in model_fields(PastResolution)} for match in matches]
+
+@router.post("/report_issue", dependencies=[Depends(limit("report"))])
+async def report_issue(data: IssueCreate, request: Request, current_user=Depends(get_current_user)):
     if current_user["role"] != "user":
         raise HTTPException(status_code=403, detail="Only users can report issues.")
 
@@ -33,12 +85,46 @@ async def report_issue(data: IssueCreate, background_tasks: BackgroundTasks, cur
     if not user_region:
         raise HTTPException(status_code=400, detail="User region not set. Please update your profile.")
 
-    # Step 1: Check for available experts in user's region
-    experts_in_user_region = list(experts_collection.find({
-        "region": user_region,
-        "is_verified": True,
-        "is_available": True
-    }))
+    # In multi-node mode this node's shard only holds its own region
+    if node_registry.enabled:
+        user_region = node_registry.region
+
+    # Step 0: Same incident as an issue already open here → link to it, no new slot
+    probe = await asyncio.to_thread(duplicate_index.probe, user_region, data.title + " " + data.description)
+    if probe.canonical_id:
+        linked = await asyncio.to_thread(link_duplicate, data, probe, current_user["user_id"], user_region)
+        if linked:
+            return linked
+
+    # Step 1: Check for available experts with free slots in user's region (in-memory roster)
+    experts_in_user_region = expert_roster.available(user_region)
+
+    # Step 1b: No local capacity → one hop to the peer with the most free slots
+    # (the header only counts from a peer holding the node secret)
+    forwarded_from = request.headers.get(FORWARDED_HEADER) if node_registry.is_peer(request.headers) else None
+    if node_registry.enabled and not forwarded_from and not experts_in_user_region:
+        peer = node_registry.best_peer()
+        if peer:
+            result = await node_registry.forward(
+                peer, "/report_issue", data.dict(), request.headers.get("Authorization")
+            )
+            if result and result.get("issue_id"):
+                # Local pointer so /my_issues on the home node still lists it
+                issues_collection.insert_one({
+                    "issue_id": result["issue_id"],
+                    "title": data.title,
+                    "description": data.description,
+                    "category": data.category,
+                    "urgency": data.urgency,
+                    "status": "forwarded",
+                    "timestamp": datetime.utcnow(),
+                    "assigned_expert": None,
+                    "submitted_by": current_user["user_id"],
+                    "region": peer,
+                    "forwarded_to": peer
+                })
+                resource_versions.bump(issues_key(current_user["user_id"]))
+                return {**result, "forwarded_to": peer}
 
     if experts_in_user_region:
         chosen_region = user_region
@@ -46,11 +132,7 @@ async def report_issue(data: IssueCreate, background_tasks: BackgroundTasks, cur
     else:
         # Step 2: Fallback to least-loaded region
         chosen_region = get_best_region()
-        filtered_experts = list(experts_collection.find({
-            "region": chosen_region,
-            "is_verified": True,
-            "is_available": True
-        }))
+        filtered_experts = expert_roster.available(chosen_region)
 
     issue_id = str(uuid.uuid4())
 
@@ -69,9 +151,16 @@ async def report_issue(data: IssueCreate, background_tasks: BackgroundTasks, cur
         "done_by_user": False,
         "done_by_expert": False
     }
+    if forwarded_from:
+        # The user's socket is on their home node: events for them are relayed there
+        issue["forwarded_from"] = forwarded_from
+        node_registry.adopt(current_user["user_id"], forwarded_from)
 
     if not issues_collection.insert_one(issue).inserted_id:
         raise HTTPException(status_code=500, detail="Issue not saved.")
+    region_rollups.on_opened(issue)
+    duplicate_index.add(issue, probe)
+    resource_versions.bump(issues_key(current_user["user_id"]))
 
     messages_collection.insert_one({
         "issue_id": issue_id,
@@ -81,30 +170,33 @@ async def report_issue(data: IssueCreate, background_tasks: BackgroundTasks, cur
         "timestamp": datetime.utcnow()
     })
 
-    await ws_manager.send_event(current_user["user_id"], "issue_created", {"issue_id": issue_id})
+    await outbox.publish_async(current_user["user_id"], "issue_created", {"issue_id": issue_id})
 
     if not filtered_experts:
+        assignment_scheduler.enqueue(issue)
         return {"message": "Issue submitted, but no available experts in any region.", "issue_id": issue_id}
 
-    best_expert_id = match_best_expert(issue, filtered_experts)
-
-    if not best_expert_id:
-        background_tasks.add_task(retry_assignment, issue_id)
-        await ws_manager.send_event(current_user["user_id"], "no_expert_now", {"issue_id": issue_id})
-        return {"message": "Issue submitted, retrying shortly.", "issue_id": issue_id}
-
-    # Assign the expert
-    issues_collection.update_one(
-        {"issue_id": issue_id},
-        {"$set": {"assigned_expert": best_expert_id, "status": "assigned"}}
+    # ✅ More urgent (or longer-waiting) issues in this region get the free slots first
+    if assignment_scheduler.outranked(issue):
+        assignment_scheduler.enqueue(issue)
+        assignment_scheduler.kick()
+        return {"message": "Issue submitted and queued by urgency.", "issue_id": issue_id}
+
+    # ✅ Reserve a slot on the best-ranked expert, falling through on conflicts;
+    # the ranking is kept on the issue for /match and later reassignments
+    breakdowns = explain_experts(issue, filtered_experts)
+    assigned = issue_state.assign_first(
+        issue_id, [b["expert_id"] for b in breakdowns], ranking=ranking_record(breakdowns)
     )
 
-    experts_collection.update_one(
-        {"expert_id": best_expert_id},
-        {"$inc": {"active_issues": 1}}
-    )
+    if not assigned:
+        assignment_scheduler.enqueue(issue)
+        await outbox.publish_async(current_user["user_id"], "no_expert_now", {"issue_id": issue_id})
+        return {"message": "Issue submitted, queued for the next free expert.", "issue_id": issue_id}
+
+    best_expert_id = assigned["assigned_expert"]
 
-    await ws_manager.send_event(best_expert_id, "issue_assigned", {"message": "A new issue has been assigned to you."})
+    await outbox.publish_async(best_expert_id, "issue_assigned", {"message": "A new issue has been assigned to you."})
 
     return {
         "message": "Issue submitted and expert assigned successfully.",
@@ -113,114 +205,240 @@ async def report_issue(data: IssueCreate, background_tasks: BackgroundTasks, cur
     }
 
 
+def link_duplicate(data: IssueCreate, probe, user_id: str, region: str):
+    """Store the issue as a duplicate of probe.canonical_id; None if that one was deleted meanwhile."""
+    issue_id = str(uuid.uuid4())
+    # Never queued and holds no slot, so it stays out of the region rollups.
+    # Inserted before the canonical counts it, so a racing resolve takes it along
+    issues_collection.insert_one({
+        "issue_id": issue_id,
+        "title": data.title,
+        "description": data.description,
+        "category": data.category,
+        "urgency": data.urgency,
+        "status": "linked",
+        "canonical_issue": probe.canonical_id,
+        "duplicate_score": probe.score,
+        "timestamp": datetime.utcnow(),
+        "assigned_expert": None,
+        "submitted_by": user_id,
+        "reassignment_log": [],
+        "region": region,
+        "done_by_user": False,
+        "done_by_expert": False
+    })
+
+    canonical = issue_state.attach_duplicate(probe.canonical_id)
+    settled = None
+    if not canonical:
+        # The canonical left the open set since the probe: take its outcome, or start over if it is gone
+        duplicate_index.discard(probe.canonical_id)
+        settled = issue_state.settled_canonical(probe.canonical_id)
+        if not settled:
+            if issues_collection.delete_one({"issue_id": issue_id, "status": "linked"}).deleted_count:
+                return None  # reported as a new issue instead
+            # Already promoted to pending in the canonical's place by its deletion
+            resource_versions.bump(issues_key(user_id))
+            outbox.publish(user_id, "issue_created", {"issue_id": issue_id})
+            return {"message": "Issue submitted, queued for the next free expert.", "issue_id": issue_id}
+        canonical = settled
+
+    resource_versions.bump(issues_key(user_id), assignments_key(canonical.get("assigned_expert")))
+
+    messages_collection.insert_one({
+        "issue_id": issue_id,
+        "sender_id": None,
+        "sender_role": "system",
+        "content": f"Linked to an ongoing issue: \"{canonical.get('title', '')}\". You will get its resolution.",
+        "timestamp": datetime.utcnow()
+    })
+
+    events = [
+        (user_id, "issue_created", {"issue_id": issue_id}),
+        (user_id, "issue_linked", {"issue_id": issue_id, "canonical_issue": canonical["issue_id"]}),
+    ]
+    if settled:
+        # A no-op if the resolve already picked this duplicate up
+        for linked in issue_state.resolve_linked(settled):
+            events.append((linked["submitted_by"], "resolution_submitted", {
+                "issue_id": linked["issue_id"],
+                "resolution_notes": settled.get("resolution_notes"),
+                "canonical_issue": settled["issue_id"]
+            }))
+    outbox.publish_many(events)
+    return {
+        "message": "Looks like an ongoing issue others reported; linked to it and you will get its resolution.",
+        "issue_id": issue_id,
+        "canonical_issue": canonical["issue_id"]
+    }
+
+# -------------------------------
+# 🧲 POST /unlink_issue/{issue_id}: "not the same problem"
+# -------------------------------
+@router.post("/unlink_issue/{issue_id}")
+async def unlink_issue(issue_id: str, current_user=Depends(get_current_user)):
+    if current_user["role"] != "user":
+        raise HTTPException(status_code=403, detail="Only users can unlink issues.")
+
+    issue = issue_state.unlink(issue_id, current_user["user_id"])
+    if not issue:
+        raise HTTPException(status_code=404, detail="Issue not found, unauthorized, or not linked.")
+
+    assignment_scheduler.enqueue(issue)
+    assignment_scheduler.kick()
+    return {"message": "Issue unlinked and queued for its own expert.", "issue_id": issue_id}
+
 # -------------------------------
 # ✅ GET /my_issues
 # -------------------------------
-@router.get("/my_issues")
-def get_my_issues(current_user=Depends(get_current_user)):
+@router.get("/my_issues", response_model=list[MyIssue])
+def get_my_issues(request: Request, current_user=Depends(get_current_user)):
     user_id = current_user["user_id"]
-    issues = list(issues_collection.find({"submitted_by": user_id}))
+
+    # Forwarded issues are embedded live from their peer, which our counters
+    # never see change: those responses carry no ETag and are never a 304
+    has_forwarded = node_registry.enabled and issues_collection.count_documents(
+        {"submitted_by": user_id, "status": "forwarded"}, limit=1
+    ) > 0
+
+    # ✅ Unchanged since the dashboard's last poll: 304 without reading the issues
+    etag = None if has_forwarded else resource_versions.etag([issues_key(user_id)])
+    cached = etag and not_modified(request, etag)
+    if cached:
+        return cached
+
+    # Long-closed issues come from the cold tier
+    issues = issue_archive.find_issues(
+        {"submitted_by": user_id}, projection(MyIssue, exclude=("assigned_expert_id",))
+    )
+
+    # ✅ One lookup for every assigned expert's email instead of one per issue
+    expert_ids = list({i["assigned_expert"] for i in issues if i.get("assigned_expert")})
+    emails = {
+        e["expert_id"]: e.get("email")
+        for e in experts_collection.find({"expert_id": {"$in": expert_ids}}, {"_id": 0, "expert_id": 1, "email": 1})
+    } if expert_ids else {}
 
     for issue in issues:
-        issue["_id"] = str(issue["_id"])
         expert_id = issue.get("assigned_expert")
-        issue["assigned_expert_id"] = expert_id  # ✅ ADD THIS LINE
+        issue["assigned_expert_id"] = expert_id
+        issue["assigned_expert"] = (emails.get(expert_id) or expert_id) if expert_id else "Not Assigned"
 
-        # Optional: convert expert_id to email if needed
-        if expert_id:
-            expert = experts_collection.find_one({"expert_id": expert_id})
-            issue["assigned_expert"] = expert.get("email", expert_id) if expert else expert_id
-        else:
-            issue["assigned_expert"] = "Not Assigned"
+    # Forwarded issues: the peer that took each one has its live state
+    for peer in {i["forwarded_to"] for i in issues if i.get("status") == "forwarded" and i.get("forwarded_to")}:
+        remote = node_registry.fetch(peer, "/my_issues", request.headers.get("Authorization"))
+        if remote is None:
+            continue  # peer unreachable: show the stub
+        live = {i["issue_id"]: {**i, "forwarded_to": peer} for i in remote}
+        issues = [live.get(i["issue_id"], i) if i.get("forwarded_to") == peer else i for i in issues]
 
-    return issues
+    return tagged(issues, etag) if etag else FastJSONResponse(issues)
 
 # -------------------------------
 # ✅ DELETE /delete_issue/{issue_id}
 # -------------------------------
 @router.delete("/delete_issue/{issue_id}")
-async def delete_issue(issue_id: str, current_user=Depends(get_current_user)):
+async def delete_issue(issue_id: str, request: Request, current_user=Depends(get_current_user)):
     issue = issues_collection.find_one({"issue_id": issue_id})
-    if not issue or issue["submitted_by"] != current_user["user_id"]:
+    if not issue:
+        # Long-closed: it lives in the cold tier, together with its messages
+        archived = issue_archive.issues.find_one({"issue_id": issue_id}, {"_id": 0, "submitted_by": 1})
+        if not archived or archived.get("submitted_by") != current_user["user_id"]:
+            raise HTTPException(status_code=404, detail="Issue not found or unauthorized.")
+        issue_archive.delete_archived(issue_id)
+        resolution_index.remove(issue_id)
+        resource_versions.bump(issues_key(current_user["user_id"]))
+        await outbox.publish_async(current_user["user_id"], "issue_deleted", {"message": "Your issue was deleted."})
+        return {"message": "Issue deleted successfully."}
+    if issue["submitted_by"] != current_user["user_id"]:
         raise HTTPException(status_code=404, detail="Issue not found or unauthorized.")
+    if issue.get("status") == "forwarded":
+        response = await asyncio.to_thread(
+            node_registry.proxy, issue["forwarded_to"], "DELETE", f"/delete_issue/{issue_id}", request.headers.get("Authorization")
+        )
+        if response.status_code in (200, 404):  # gone there too: drop the stub
+            issues_collection.delete_one({"issue_id": issue_id, "status": "forwarded"})
+            resource_versions.bump(issues_key(issue["submitted_by"]))
+        return response
 
     #if issue["status"] != "pending":
         #raise HTTPException(status_code=400, detail="Only pending issues can be deleted.")
 
     issues_collection.delete_one({"issue_id": issue_id})
+    resolution_index.remove(issue_id)
+    duplicate_index.discard(issue_id)
+    assignment_scheduler.discard(issue_id)
+    region_rollups.on_deleted(issue)
+
+    events = []
+    if issue.get("status") == "linked":
+        issues_collection.update_one(
+            {"issue_id": issue.get("canonical_issue"), "linked_count": {"$gt": 0}}, {"$inc": {"linked_count": -1}}
+        )
+    elif issue.get("linked_count") and issue.get("status") in issue_state.OPEN_STATUSES:
+        # Others are still waiting on this incident: the oldest duplicate carries it on
+        promoted = issue_state.promote_linked(issue_id)
+        if promoted:
+            assignment_scheduler.enqueue(promoted)
+            assignment_scheduler.kick()
+            events.append((promoted["submitted_by"], "issue_unlinked", {"issue_id": promoted["issue_id"]}))
+    resource_versions.bump(issues_key(issue["submitted_by"]), assignments_key(issue.get("assigned_expert")))
 
     # ✅ Notify user via WebSocket
-    await ws_manager.send_event(current_user["user_id"], "issue_deleted", {"message": "Your issue was deleted."})
+    events.append((current_user["user_id"], "issue_deleted", {"message": "Your issue was deleted."}))
+    await outbox.publish_many_async(events)
 
     return {"message": "Issue deleted successfully."}
 
 @router.post("/escalate_issue/{issue_id}")
-async def escalate_issue(issue_id: str, current_user=Depends(get_current_user)):
+async def escalate_issue(issue_id: str, request: Request, current_user=Depends(get_current_user)):
     if current_user["role"] != "user":
         raise HTTPException(status_code=403, detail="Only users can escalate issues.")
 
-    issue = issues_collection.find_one({"issue_id": issue_id})
+    issue = issues_collection.find_one(
+        {"issue_id": issue_id}, {"_id": 0, "submitted_by": 1, "assigned_expert": 1, "status": 1, "forwarded_to": 1}
+    )
     if not issue or issue.get("submitted_by") != current_user["user_id"]:
         raise HTTPException(status_code=404, detail="Issue not found or unauthorized.")
+    if issue.get("status") == "forwarded":
+        return await asyncio.to_thread(
+            node_registry.proxy, issue["forwarded_to"], "POST", f"/escalate_issue/{issue_id}", request.headers.get("Authorization")
+        )
 
     old_expert_id = issue.get("assigned_expert")
     if not old_expert_id:
         return {"message": "No expert currently assigned to escalate from."}
 
-    # ✅ Add old expert to skipped_by
-    issues_collection.update_one(
-        {"issue_id": issue_id},
-        {
-            "$addToSet": {"skipped_by": old_expert_id},
-            "$set": {"assigned_expert": None, "status": "pending"}
-        }
-    )
-
-    # ✅ Decrease load of skipped expert
-    experts_collection.update_one(
-        {"expert_id": old_expert_id},
-        {"$inc": {"active_issues": -1}}
-    )
-
-    # ✅ Fetch updated issue and all valid fallback experts
-    updated_issue = issues_collection.find_one({"issue_id": issue_id})
-    skip_list = list(set(updated_issue.get("rejected_by", []) + updated_issue.get("skipped_by", [])))
+    # ✅ Add old expert to skipped_by and free their slot (only if still assigned to them)
+    updated_issue = issue_state.unassign(issue_id, old_expert_id, "skipped_by", submitted_by=current_user["user_id"])
+    if not updated_issue:
+        raise HTTPException(status_code=409, detail="Issue changed state, please refresh.")
 
-    fallback_experts = list(experts_collection.find({
-        "is_available": True,
-        "is_verified": True,
-        "expert_id": {"$nin": skip_list}
-    }))
+    # ✅ Next eligible expert from the stored ranking; rescored only if it went stale
+    skip_list = set(updated_issue.get("rejected_by", []) + updated_issue.get("skipped_by", []))
+    ranked, ranking = reassignment_candidates(updated_issue, exclude_ids=skip_list)
+    assigned = issue_state.assign_first(issue_id, ranked, log=True, ranking=ranking)
 
-    new_expert_id = match_best_expert(updated_issue, fallback_experts)
-
-    if new_expert_id:
-        issues_collection.update_one(
-            {"issue_id": issue_id},
-            {
-                "$set": {"assigned_expert": new_expert_id, "status": "assigned"},
-                "$push": {
-                    "reassignment_log": {
-                        "expert_id": new_expert_id,
-                        "timestamp": datetime.utcnow()
-                    }
-                }
-            }
-        )
-        experts_collection.update_one({"expert_id": new_expert_id}, {"$inc": {"active_issues": 1}})
+    # The skipped expert's slot may suit someone already waiting
+    assignment_scheduler.capacity_freed(old_expert_id)
 
+    if assigned:
+        new_expert_id = assigned["assigned_expert"]
         # ✅ Notify both experts and user
-        await ws_manager.send_event(new_expert_id, "issue_assigned", {"issue_id": issue_id})
-        await ws_manager.send_event(current_user["user_id"], "issue_assigned", {
-            "issue_id": issue_id,
-            "message": "Your issue has been reassigned to another expert."
-        })
-        await ws_manager.send_event(old_expert_id, "issue_unassigned", {
-            "issue_id": issue_id,
-            "message": "You have been removed from an escalated issue."
-        })
+        await outbox.publish_many_async([
+            (new_expert_id, "issue_assigned", {"issue_id": issue_id}),
+            (current_user["user_id"], "issue_assigned", {
+                "issue_id": issue_id,
+                "message": "Your issue has been reassigned to another expert."
+            }),
+            (old_expert_id, "issue_unassigned", {
+                "issue_id": issue_id,
+                "message": "You have been removed from an escalated issue."
+            }),
+        ])
 
         return {"message": "Issue escalated and reassigned.", "new_expert": new_expert_id}
 
-    await ws_manager.send_event(current_user["user_id"], "no_expert_now", {"issue_id": issue_id})
+    assignment_scheduler.enqueue(updated_issue)
+    await outbox.publish_async(current_user["user_id"], "no_expert_now", {"issue_id": issue_id})
     return {"message": "No fallback expert available currently."}
\ No newline at end of file
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure, PyMongoError
+from app.config import MONGO_URI, MONGO_DB
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+issues_collection = db["issues"]
+messages_collection = db["messages"]
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))  # closed this long ago -> cold tier
+ARCHIVE_BATCH = 500          # issues moved per bulk batch
+ARCHIVE_INTERVAL = 3600      # seconds between background passes
+# Cold collections trade CPU for disk and cache: zstd blocks, written once, rarely read
+COLD_STORAGE = {"wiredTiger": {"configString": "block_compressor=zstd"}}
+
+DUPLICATE_KEY = 11000
+
+# -------------------------------
+# 🧊 Hot/cold tiering of closed issues
+# -------------------------------
+class IssueArchive:
+    """Moves long-closed issues and their chat into compressed cold collections.
+
+    Each batch copies first and deletes second, and copies ignore duplicate
+    keys, so an interrupted pass is simply finished by the next one. Reads
+    that can reach history (my_issues, messages, delete, rerouted issues)
+    fall through to the cold tier, so clients never see the move.
+    """
+
+    def __init__(self, database, after_days: int = ARCHIVE_AFTER_DAYS):
+        self.db = database
+        self.after_days = after_days
+        self.issues = database["issues_archive"]
+        self.messages = database["messages_archive"]
+
+    def ensure_collections(self):
+        for name in ("issues_archive", "messages_archive"):
+            try:
+                self.db.create_collection(name, storageEngine=COLD_STORAGE)
+            except CollectionInvalid:
+                pass  # already there
+            except OperationFailure:
+                self.db.create_collection(name)  # engine without zstd: plain collection
+        self.issues.create_index([("issue_id", ASCENDING)], unique=True)
+        self.issues.create_index([("submitted_by", ASCENDING)])
+        self.issues.create_index([("assigned_expert", ASCENDING)])
+        self.messages.create_index([("issue_id", ASCENDING), ("timestamp", ASCENDING)])
+        # What each pass scans in the hot tier
+        issues_collection.create_index([("status", ASCENDING), ("closed_at", ASCENDING)])
+
+    # ---- moving ----
+    def _cutoff_query(self, cutoff: datetime) -> dict:
+        return {"status": "closed", "$or": [
+            {"closed_at": {"$lt": cutoff}},
+            {"closed_at": {"$exists": False}, "timestamp": {"$lt": cutoff}},  # closed before closed_at existed
+        ]}
+
+    @staticmethod
+    def _copy(collection, docs):
+        if not docs:
+            return
+        try:
+            collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Left over from an interrupted pass; anything else is a real failure
+            if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                raise
+
+    def _move_messages(self, issue_ids: list):
+        # Deleted by the copied _ids: a message posted after the read stays for the next pass
+        messages = list(messages_collection.find({"issue_id": {"$in": issue_ids}}))
+        self._copy(self.messages, messages)
+        if messages:
+            messages_collection.delete_many({"_id": {"$in": [m["_id"] for m in messages]}})
+
+    def archive_batch(self, cutoff: datetime, batch: int = ARCHIVE_BATCH) -> int:
+        """Move up to `batch` issues closed before cutoff; returns how many moved."""
+        issues = list(issues_collection.find(self._cutoff_query(cutoff)).limit(batch))
+        if not issues:
+            return 0
+        issue_ids = [issue["issue_id"] for issue in issues]
+
+        # Same _ids in the cold tier, so a rerun dedupes instead of duplicating
+        self._move_messages(issue_ids)
+        self._copy(self.issues, issues)
+        issues_collection.delete_many({"_id": {"$in": [issue["_id"] for issue in issues]}, "status": "closed"})
+        # send_message reads the hot issue: anything posted before the issue left is moved now
+        self._move_messages(issue_ids)
+        return len(issues)
+
+    def archive(self, days: int = None, batch: int = ARCHIVE_BATCH, limit: int = None) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=self.after_days if days is None else days)
+        moved = 0
+        while limit is None or moved < limit:
+            n = self.archive_batch(cutoff, batch if limit is None else min(batch, limit - moved))
+            if not n:
+                break
+            moved += n
+        return moved
+
+    def pending(self, days: int = None) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=self.after_days if days is None else days)
+        return issues_collection.count_documents(self._cutoff_query(cutoff))
+
+    async def run(self):
+        while True:
+            try:
+                moved = await asyncio.to_thread(self.archive)
+                if moved:
+                    logger.info("archived %s closed issues", moved)
+            except PyMongoError:
+                logger.exception("archive pass failed")
+            await asyncio.sleep(ARCHIVE_INTERVAL)
+
+    # ---- reads that fall through to the cold tier ----
+    def find_issue(self, issue_id: str, projection: dict = None):
+        issue = issues_collection.find_one({"issue_id": issue_id}, projection)
+        if issue is None:
+            issue = self.issues.find_one({"issue_id": issue_id}, projection)
+        return issue
+
+    def find_issues(self, query: dict, projection: dict = None) -> list:
+        """Hot and cold matches; an issue caught mid-move is returned once."""
+        hot = list(issues_collection.find(query, projection))
+        seen = {issue.get("issue_id") for issue in hot}
+        return hot + [issue for issue in self.issues.find(query, projection) if issue.get("issue_id") not in seen]
+
+    def messages_for(self, issue_id: str, projection: dict = None) -> list:
+        messages = list(messages_collection.find({"issue_id": issue_id}, projection).sort("timestamp", ASCENDING))
+        if messages:
+            return messages
+        return list(self.messages.find({"issue_id": issue_id}, projection).sort("timestamp", ASCENDING))
+
+    def delete_archived(self, issue_id: str) -> bool:
+        if not self.issues.delete_one({"issue_id": issue_id}).deleted_count:
+            return False
+        self.messages.delete_many({"issue_id": issue_id})
+        return True
+
+issue_archive = IssueArchive(db)
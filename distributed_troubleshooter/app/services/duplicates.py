@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import namedtuple, deque
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from app.config import MONGO_URI, MONGO_DB
+from app.services.metrics import span
+from app.services.utils import MODEL, clean_text, jaccard_similarity
+from app.services.issue_state import OPEN_STATUSES
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+issues_collection = db["issues"]
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_WINDOW = 2 * 3600    # seconds an open issue can absorb look-alikes
+DUPLICATE_SIMILARITY = 0.85    # embedding cosine, both texts normalised
+SHINGLE_OVERLAP = 0.25         # Jaccard over word bigrams; guards against same-topic, different-fault
+SHINGLE_SIZE = 2
+DUPLICATE_SYNC_INTERVAL = 30   # seconds; picks up canonicals other workers created or closed
+
+Probe = namedtuple("Probe", "vector shingles canonical_id score")
+
+def _epoch(ts: datetime) -> float:
+    # Issue timestamps are naive utcnow(); .timestamp() would read them as local time
+    return (ts - datetime(1970, 1, 1)).total_seconds()
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    words = clean_text(text).split()
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+# -------------------------------
+# 🧲 Near-duplicate open issues (incident storms)
+# -------------------------------
+class DuplicateIndex:
+    """Recent open, canonical issues per region, for submission-time matching.
+
+    A new issue is a duplicate only when both its embedding and its keyword
+    shingles are close to one submitted within DUPLICATE_WINDOW in the same
+    region. Entries age out of the window; ones that stopped being open are
+    dropped when linking to them fails (see issue_state.attach_duplicate).
+
+    The index is per process. sync() reconciles it with Mongo every
+    DUPLICATE_SYNC_INTERVAL, so a storm spread over several workers
+    converges on one canonical within that interval.
+    """
+
+    def __init__(self, window: int = DUPLICATE_WINDOW):
+        self.window = window
+        self._regions = {}   # region -> deque of (issue_id, submitted_at, vector, shingles)
+        self._lock = threading.Lock()
+
+    def _prune(self, entries: deque, now: float):
+        while entries and now - entries[0][1] > self.window:
+            entries.popleft()
+
+    def probe(self, region: str, text: str) -> Probe:
+        """Embed once; the vector is reused by add() if the issue becomes canonical."""
+        with span("embed"):
+            vector = MODEL.encode(text, convert_to_tensor=True, normalize_embeddings=True).float().cpu()
+        grams = shingles(text)
+        best_id, best = None, 0.0
+        with span("duplicate.match"), self._lock:
+            entries = self._regions.get(region)
+            if entries:
+                self._prune(entries, time.time())
+                for issue_id, _, other, other_grams in entries:
+                    score = float(vector @ other)
+                    if score >= DUPLICATE_SIMILARITY and score > best and jaccard_similarity(grams, other_grams) >= SHINGLE_OVERLAP:
+                        best_id, best = issue_id, score
+        return Probe(vector, grams, best_id, round(best, 3))
+
+    def add(self, issue: dict, probe: Probe):
+        submitted = _epoch(issue.get("timestamp") or datetime.utcnow())
+        with self._lock:
+            entries = self._regions.setdefault(issue.get("region"), deque())
+            entries.append((issue["issue_id"], submitted, probe.vector, probe.shingles))
+
+    def discard(self, issue_id: str):
+        """Stop matching against an issue once it is resolved, closed or deleted."""
+        with self._lock:
+            for region, entries in self._regions.items():
+                kept = deque(entry for entry in entries if entry[0] != issue_id)
+                if len(kept) != len(entries):
+                    self._regions[region] = kept
+                    return
+
+    def ids(self) -> set:
+        with self._lock:
+            return {entry[0] for entries in self._regions.values() for entry in entries}
+
+    def load(self):
+        """Add open canonical issues inside the window that are not indexed yet, and
+        drop entries that stopped being open. Only the new ones are embedded."""
+        started = time.time()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.window)
+        issues = list(issues_collection.find(
+            {"status": {"$in": OPEN_STATUSES}, "timestamp": {"$gte": cutoff}},
+            {"_id": 0, "issue_id": 1, "title": 1, "description": 1, "region": 1, "timestamp": 1}
+        ).sort("timestamp", 1))
+        open_ids = {i["issue_id"] for i in issues}
+        with self._lock:
+            for region, entries in self._regions.items():
+                # Issues added while the query ran are kept; the next sync judges them
+                self._regions[region] = deque(
+                    entry for entry in entries if entry[0] in open_ids or entry[1] >= started - 1
+                )
+        known = self.ids()
+        issues = [i for i in issues if i["issue_id"] not in known]
+        if not issues:
+            return
+        texts = [i.get("title", "") + " " + i.get("description", "") for i in issues]
+        with span("embed"):
+            vectors = MODEL.encode(texts, convert_to_tensor=True, normalize_embeddings=True).float().cpu()
+        for issue, text, vector in zip(issues, texts, vectors):
+            self.add(issue, Probe(vector, shingles(text), None, 0.0))
+        with self._lock:
+            # add() appends; keep each region ordered by submission for _prune
+            for region, entries in self._regions.items():
+                self._regions[region] = deque(sorted(entries, key=lambda entry: entry[1]))
+
+    async def sync_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.load)
+            except PyMongoError:
+                logger.exception("duplicate index sync failed")
+            await asyncio.sleep(DUPLICATE_SYNC_INTERVAL)
+
+duplicate_index = DuplicateIndex()
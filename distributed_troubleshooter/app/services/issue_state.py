@@ -0,0 +1,275 @@
+from datetime import datetime
+from pymongo import MongoClient, ReturnDocument
+from app.config import MONGO_URI, MONGO_DB, DEFAULT_MAX_CONCURRENT
+from app.services.roster import expert_roster
+from app.services.metrics import span
+from app.services.rollups import region_rollups
+from app.services.versions import resource_versions, issues_key, assignments_key, profile_key
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+issues_collection = db["issues"]
+experts_collection = db["experts"]
+
+# -------------------------------
+# 🔀 Issue lifecycle state machine
+# -------------------------------
+# Every transition is a single conditional find_one_and_update that returns the
+# new document (or None when the issue is not in an allowed source state), so
+# concurrent callers can never both win and expert counters move exactly once.
+TRANSITIONS = {
+    "pending": {"assigned"},
+    "assigned": {"in_progress", "pending", "awaiting_user_confirmation", "closed"},
+    "in_progress": {"pending", "awaiting_user_confirmation", "closed"},
+    "awaiting_user_confirmation": {"closed"},
+    "closed": set(),
+    # Duplicate riding on a canonical issue: gets its resolution, or is split off
+    "linked": {"awaiting_user_confirmation", "pending"},
+}
+
+OPEN_STATUSES = ["pending", "assigned", "in_progress"]
+
+def sources(target: str) -> list:
+    return [state for state, targets in TRANSITIONS.items() if target in targets]
+
+def can_transition(current: str, target: str) -> bool:
+    return target in TRANSITIONS.get(current, set())
+
+def _transition(filter_: dict, target: str, update: dict):
+    filter_ = {**filter_, "status": {"$in": sources(target)}}
+    update = {**update, "$set": {**update.get("$set", {}), "status": target}}
+    with span("mongo.issue_transition"):
+        issue = issues_collection.find_one_and_update(
+            filter_, update, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+    if issue:
+        # The previous expert (unassign) loses it from their list too
+        _changed(issue, filter_.get("assigned_expert"))
+    return issue
+
+def _changed(issue: dict, *expert_ids):
+    """Invalidate the ETags of everyone who lists this issue."""
+    resource_versions.bump(
+        issues_key(issue.get("submitted_by")),
+        assignments_key(issue.get("assigned_expert")),
+        *(assignments_key(e) for e in expert_ids),
+    )
+
+# -------------------------------
+# 🎟️ Expert capacity slots
+# -------------------------------
+def reserve_slot(expert_id: str) -> bool:
+    """Atomically take one slot if active_issues < max_concurrent_issues."""
+    with span("mongo.reserve_slot"):
+        expert = experts_collection.find_one_and_update(
+            {
+                "expert_id": expert_id,
+                "$expr": {"$lt": [
+                    {"$ifNull": ["$active_issues", 0]},
+                    {"$ifNull": ["$max_concurrent_issues", DEFAULT_MAX_CONCURRENT]}
+                ]}
+            },
+            {"$inc": {"active_issues": 1}},
+            projection={"_id": 0, "active_issues": 1},
+            return_document=ReturnDocument.AFTER
+        )
+    if expert:
+        expert_roster.set_load(expert_id, expert["active_issues"])
+        resource_versions.bump(profile_key(expert_id))
+    return expert is not None
+
+def release_slot(expert_id: str):
+    expert = experts_collection.find_one_and_update(
+        {"expert_id": expert_id, "active_issues": {"$gt": 0}},
+        {"$inc": {"active_issues": -1}},
+        projection={"_id": 0, "active_issues": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if expert:
+        expert_roster.set_load(expert_id, expert["active_issues"])
+        resource_versions.bump(profile_key(expert_id))
+
+def _assign_update(expert_id: str, log: bool, ranking: dict = None) -> dict:
+    update = {"$set": {"assigned_expert": expert_id, "assigned_at": datetime.utcnow()}}
+    if ranking is not None:
+        update["$set"]["match_ranking"] = ranking
+    if log:
+        update["$push"] = {"reassignment_log": {"expert_id": expert_id, "timestamp": datetime.utcnow()}}
+    return update
+
+def assign(issue_id: str, expert_id: str, log: bool = False):
+    """pending -> assigned, only if the expert has a free slot."""
+    return assign_first(issue_id, [expert_id], log)
+
+def assign_first(issue_id: str, candidates: list, log: bool = False, ranking: dict = None):
+    """Assign to the first candidate (best-first) whose slot can be reserved.
+
+    Full experts are skipped; if the issue itself is no longer pending the
+    reserved slot is released and we stop. A `ranking` is stored on the issue
+    in the same write.
+    """
+    with span("assign.commit"):
+        return _assign_first(issue_id, candidates, log, ranking)
+
+def _assign_first(issue_id: str, candidates: list, log: bool, ranking: dict = None):
+    for expert_id in candidates:
+        if not reserve_slot(expert_id):
+            continue
+        issue = _transition(
+            {"issue_id": issue_id, "assigned_expert": None}, "assigned", _assign_update(expert_id, log, ranking)
+        )
+        if issue:
+            region_rollups.on_assigned(issue)
+            return issue
+        release_slot(expert_id)
+        return None
+    return None
+
+def accept(issue_id: str, expert_id: str):
+    """assigned -> in_progress, only for the assigned expert."""
+    return _transition({"issue_id": issue_id, "assigned_expert": expert_id}, "in_progress", {})
+
+def resolve(issue_id: str, expert_id: str, resolution_notes: str):
+    """assigned/in_progress -> awaiting_user_confirmation; frees the expert's slot."""
+    issue = _transition(
+        {"issue_id": issue_id, "assigned_expert": expert_id},
+        "awaiting_user_confirmation",
+        {"$set": {
+            "resolution_notes": resolution_notes,
+            "resolved_at": datetime.utcnow(),
+            "done_by_user": False,
+            "done_by_expert": False
+        }}
+    )
+    if issue:
+        release_slot(expert_id)
+        region_rollups.on_resolved(issue)
+    return issue
+
+# -------------------------------
+# 🧲 Duplicates linked to a canonical issue
+# -------------------------------
+def attach_duplicate(canonical_id: str):
+    """Count one more duplicate on a still-open canonical issue; None if it is no longer open.
+
+    Call it after inserting the duplicate as linked: a resolve landing in
+    between then already carries it along through resolve_linked.
+    """
+    return issues_collection.find_one_and_update(
+        {"issue_id": canonical_id, "status": {"$in": OPEN_STATUSES}},
+        {"$inc": {"linked_count": 1}},
+        projection={"_id": 0, "issue_id": 1, "title": 1, "region": 1, "assigned_expert": 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+def settled_canonical(canonical_id: str):
+    """A canonical that left the open set with an outcome (resolved or closed); None if deleted."""
+    return issues_collection.find_one(
+        {"issue_id": canonical_id, "status": {"$in": ["awaiting_user_confirmation", "closed"]}},
+        {"_id": 0, "issue_id": 1, "title": 1, "region": 1, "assigned_expert": 1, "resolution_notes": 1, "resolved_at": 1}
+    )
+
+def resolve_linked(canonical: dict) -> list:
+    """linked -> awaiting_user_confirmation for every duplicate of `canonical`.
+
+    They take the canonical's notes and expert, with the expert side already
+    done, so each user's own mark_done closes their copy. Returns the updated
+    duplicates (no slots are involved: duplicates never held one).
+    """
+    query = {"canonical_issue": canonical["issue_id"], "status": "linked"}
+    linked = list(issues_collection.find(query, {"_id": 0, "issue_id": 1, "submitted_by": 1}))
+    if not linked:
+        return []
+    issues_collection.update_many(
+        {**query, "issue_id": {"$in": [i["issue_id"] for i in linked]}},
+        {"$set": {
+            "status": "awaiting_user_confirmation",
+            "assigned_expert": canonical.get("assigned_expert"),
+            "resolution_notes": canonical.get("resolution_notes"),
+            "resolved_at": canonical.get("resolved_at") or datetime.utcnow(),
+            "done_by_expert": True
+        }}
+    )
+    resource_versions.bump(*(issues_key(i["submitted_by"]) for i in linked))
+    return linked
+
+def unlink(issue_id: str, submitted_by: str = None):
+    """linked -> pending: the duplicate goes through normal assignment after all."""
+    filter_ = {"issue_id": issue_id}
+    if submitted_by is not None:
+        filter_["submitted_by"] = submitted_by
+    linked = issues_collection.find_one({**filter_, "status": "linked"}, {"_id": 0, "canonical_issue": 1})
+    if not linked:
+        return None
+    issue = _transition(filter_, "pending", {"$unset": {"canonical_issue": ""}})
+    if issue:
+        issues_collection.update_one(
+            {"issue_id": linked.get("canonical_issue"), "linked_count": {"$gt": 0}}, {"$inc": {"linked_count": -1}}
+        )
+        region_rollups.on_opened(issue)  # enters the open set only now
+    return issue
+
+def promote_linked(canonical_id: str):
+    """The canonical went away unresolved: its oldest duplicate takes over as pending."""
+    first = issues_collection.find_one(
+        {"canonical_issue": canonical_id, "status": "linked"}, {"_id": 0, "issue_id": 1}, sort=[("timestamp", 1)]
+    )
+    if not first:
+        return None
+    issue = unlink(first["issue_id"])
+    if issue:
+        rest = issues_collection.update_many(
+            {"canonical_issue": canonical_id, "status": "linked"},
+            {"$set": {"canonical_issue": issue["issue_id"]}}
+        )
+        if rest.modified_count:
+            issues_collection.update_one({"issue_id": issue["issue_id"]}, {"$set": {"linked_count": rest.modified_count}})
+            issue["linked_count"] = rest.modified_count
+    return issue
+
+def unassign(issue_id: str, expert_id: str, skip_field: str, submitted_by: str = None):
+    """assigned/in_progress -> pending. Records expert_id in rejected_by/skipped_by."""
+    filter_ = {"issue_id": issue_id, "assigned_expert": expert_id}
+    if submitted_by is not None:
+        filter_["submitted_by"] = submitted_by
+    issue = _transition(
+        filter_, "pending",
+        {"$set": {"assigned_expert": None}, "$addToSet": {skip_field: expert_id}}
+    )
+    if issue:
+        release_slot(expert_id)
+        region_rollups.on_unassigned(issue, skip_field)
+    return issue
+
+def mark_done(issue_id: str, user_id: str, role: str):
+    """Set this party's done flag and close the issue when both flags are set.
+
+    Runs as one pipeline update, so exactly one caller observes the close.
+    That caller frees the expert's slot when the close skipped the resolve
+    step (straight from assigned/in_progress; resolve() already freed it).
+    """
+    if role == "user":
+        flag, other, party = "done_by_user", "done_by_expert", "submitted_by"
+    elif role == "expert":
+        flag, other, party = "done_by_expert", "done_by_user", "assigned_expert"
+    else:
+        return None
+
+    both_done = {"$eq": ["$" + other, True]}
+    issue = issues_collection.find_one_and_update(
+        {"issue_id": issue_id, party: user_id, "status": {"$in": sources("closed")}},
+        [{"$set": {
+            flag: True,
+            "status": {"$cond": [both_done, "closed", "$status"]},
+            "closed_at": {"$cond": [both_done, "$$NOW", "$$REMOVE"]}
+        }}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if issue:
+        _changed(issue)
+    if issue and issue["status"] == "closed":
+        if not issue.get("resolved_at") and issue.get("assigned_expert"):
+            release_slot(issue["assigned_expert"])
+        region_rollups.on_closed(issue)
+    return issue
@@ -0,0 +1,154 @@
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a cached token check up to a cold embedding batch
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Fraction of matches whose per-expert scores are logged at DEBUG
+SCORING_LOG_SAMPLE = float(os.getenv("SCORING_LOG_SAMPLE", "0.01"))
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in pairs)
+    return "{" + body + "}"
+
+# -------------------------------
+# 📈 Metric types (Prometheus text format)
+# -------------------------------
+class Counter:
+    def __init__(self, name: str, help_: str):
+        self.name = name
+        self.help = help_
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count], sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels_key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][idx] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', bound),))} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+class Gauge:
+    """Read at scrape time from a callback returning a number, or {label value: number}."""
+
+    def __init__(self, name: str, help_: str, read, label: str = None):
+        self.name = name
+        self.help = help_
+        self.read = read
+        self.label = label
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.read()
+        except Exception:
+            logger.exception("gauge %s failed", self.name)
+            return lines
+        if isinstance(value, dict):
+            for label_value, v in sorted(value.items()):
+                lines.append(f"{self.name}{_format_labels(((self.label, label_value),))} {v}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_: str) -> Counter:
+        return self._register(Counter(name, help_))
+
+    def histogram(self, name: str, help_: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_, buckets))
+
+    def gauge(self, name: str, help_: str, read, label: str = None) -> Gauge:
+        self._metrics[name] = Gauge(name, help_, read, label)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template."
+)
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status."
+)
+span_seconds = registry.histogram(
+    "span_duration_seconds", "Time spent in instrumented hot-path sections."
+)
+
+# -------------------------------
+# ⏱️ Timing spans
+# -------------------------------
+@contextmanager
+def span(name: str):
+    """Time a block into span_duration_seconds{span=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        span_seconds.observe(time.perf_counter() - start, span=name)
+
+def sample_scoring(log: logging.Logger) -> bool:
+    """True for the sampled share of matches when log is at DEBUG."""
+    return log.isEnabledFor(logging.DEBUG) and random.random() < SCORING_LOG_SAMPLE
@@ -0,0 +1,208 @@
+import asyncio
+import hmac
+import time
+
+import httpx
+from fastapi import HTTPException
+from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB, NODE_NAME, PEER_NODES, GOSSIP_INTERVAL, PEER_TIMEOUT, NODE_SECRET
+from app.responses import FastJSONResponse
+from app.services import issue_state
+from app.services.roster import expert_roster
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+issues_collection = db["issues"]
+experts_collection = db["experts"]
+
+FORWARDED_HEADER = "X-Forwarded-From-Node"
+NODE_SECRET_HEADER = "X-Node-Secret"
+GOSSIP_MAX_SKEW = 5  # seconds a peer's clock may run ahead of ours
+
+# -------------------------------
+# 🌐 Regional node layer
+# -------------------------------
+class NodeRegistry:
+    """This node's region plus cached load summaries of its peers.
+
+    Summaries are exchanged push-pull on a gossip interval, so choosing a peer
+    for a cross-region fallback never costs more than the one forwarding hop.
+    Node-to-node calls carry NODE_SECRET; only configured peers are recorded.
+
+    A forwarded issue lives on the peer; the home node keeps a "forwarded"
+    stub. Follow-up requests on the stub are proxied to the peer, and the
+    peer relays that user's events back home, where their socket is.
+    """
+
+    def __init__(self, region: str, peers: dict):
+        self.region = region
+        self.peers = peers
+        self.summaries = {}
+        self.remote_users = {}  # user_id -> home region, for issues forwarded to us
+        self._http = None
+        self._sync_http = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.region and self.peers)
+
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=PEER_TIMEOUT, headers={NODE_SECRET_HEADER: NODE_SECRET})
+        return self._http
+
+    def sync_http(self) -> httpx.Client:
+        if self._sync_http is None:
+            self._sync_http = httpx.Client(timeout=PEER_TIMEOUT, headers={NODE_SECRET_HEADER: NODE_SECRET})
+        return self._sync_http
+
+    @staticmethod
+    def is_peer(headers) -> bool:
+        """The caller holds NODE_SECRET; always False while no secret is configured."""
+        supplied = headers.get(NODE_SECRET_HEADER, "")
+        return bool(NODE_SECRET) and hmac.compare_digest(supplied.encode(), NODE_SECRET.encode())
+
+    def local_summary(self) -> dict:
+        experts = expert_roster.available(self.region or None, with_capacity=False)
+        open_issues = issues_collection.count_documents({
+            **({"region": self.region} if self.region else {}),
+            "status": {"$in": issue_state.OPEN_STATUSES}
+        })
+        return {
+            "region": self.region,
+            "available_experts": len(experts),
+            "free_slots": sum(max(0, e.max_concurrent_issues - e.active_issues) for e in experts),
+            "open_issues": open_issues,
+            "updated_at": time.time(),
+        }
+
+    def record(self, summary: dict) -> bool:
+        """Keep a configured peer's summary; False when it is not one, or is dated in the future."""
+        region = summary.get("region")
+        updated_at = summary.get("updated_at")
+        if region not in self.peers or region == self.region:
+            return False
+        if not isinstance(updated_at, (int, float)) or updated_at > time.time() + GOSSIP_MAX_SKEW:
+            return False
+        self.summaries[region] = summary
+        return True
+
+    def best_peer(self, exclude=()):
+        """Peer with the most free slots according to the last gossip round."""
+        stale_after = GOSSIP_INTERVAL * 3
+        now = time.time()
+        candidates = [
+            s for r, s in self.summaries.items()
+            if r in self.peers and r not in exclude
+            and s.get("free_slots", 0) > 0 and now - s.get("updated_at", 0) <= stale_after
+        ]
+        if not candidates:
+            return None
+        best = max(candidates, key=lambda s: (s["free_slots"], -s.get("open_issues", 0)))
+        return best["region"]
+
+    async def gossip_once(self):
+        summary = await asyncio.to_thread(self.local_summary)
+
+        async def exchange(region, url):
+            try:
+                resp = await self.http().post(f"{url}/node/gossip", json=summary)
+                if resp.status_code == 200:
+                    self.record(resp.json())
+            except httpx.HTTPError:
+                self.summaries.pop(region, None)  # unreachable peers are not routing targets
+
+        await asyncio.gather(*(exchange(r, u) for r, u in self.peers.items()))
+
+    async def gossip_loop(self):
+        while True:
+            await self.gossip_once()
+            await asyncio.sleep(GOSSIP_INTERVAL)
+
+    async def forward(self, region: str, path: str, payload: dict, authorization: str):
+        """Replay a request on a peer node. Returns the peer's JSON body, or None on failure."""
+        url = self.peers.get(region)
+        if not url:
+            return None
+        try:
+            resp = await self.http().post(
+                f"{url}{path}", json=payload,
+                headers={"Authorization": authorization or "", FORWARDED_HEADER: self.region}
+            )
+        except httpx.HTTPError:
+            return None
+        if resp.status_code != 200:
+            return None
+        # Our view of that peer just lost a slot; the next gossip round corrects it
+        if region in self.summaries:
+            self.summaries[region]["free_slots"] = max(0, self.summaries[region].get("free_slots", 0) - 1)
+        return resp.json()
+
+    # ---- forwarded issues: follow-ups go to the peer, events come back ----
+    def forwarded_to(self, issue_id: str, user_id: str):
+        """Peer holding this user's forwarded issue, or None (also in single-node mode)."""
+        if not self.enabled:
+            return None
+        stub = issues_collection.find_one(
+            {"issue_id": issue_id, "submitted_by": user_id, "status": "forwarded"}, {"_id": 0, "forwarded_to": 1}
+        )
+        return stub.get("forwarded_to") if stub else None
+
+    def _request(self, region: str, method: str, path: str, authorization: str, payload=None) -> httpx.Response:
+        url = self.peers.get(region)
+        if not url:
+            raise HTTPException(status_code=502, detail="The node handling this issue is not configured.")
+        try:
+            return self.sync_http().request(method, f"{url}{path}", json=payload,
+                                            headers={"Authorization": authorization or ""})
+        except httpx.HTTPError:
+            raise HTTPException(status_code=502, detail="The node handling this issue is unreachable.")
+
+    def fetch(self, region: str, path: str, authorization: str):
+        """JSON of a GET on the peer as the same user, or None when it fails. Blocking."""
+        try:
+            resp = self._request(region, "GET", path, authorization)
+            return resp.json() if resp.status_code == 200 else None
+        except (HTTPException, ValueError):
+            return None
+
+    def proxy(self, region: str, method: str, path: str, authorization: str, payload=None) -> FastJSONResponse:
+        """Replay a follow-up request on the peer and pass its answer through. Blocking."""
+        resp = self._request(region, method, path, authorization, payload)
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {"detail": resp.text}
+        return FastJSONResponse(body, status_code=resp.status_code)
+
+    def adopt(self, user_id: str, home: str):
+        """Remember where a forwarded issue's user is connected (from the trusted header)."""
+        if home in self.peers:
+            self.remote_users[user_id] = home
+
+    def load_remote_users(self):
+        if not self.enabled:
+            return
+        for issue in issues_collection.find({"forwarded_from": {"$exists": True}}, {"_id": 0, "submitted_by": 1, "forwarded_from": 1}):
+            self.adopt(issue["submitted_by"], issue["forwarded_from"])
+
+    async def relay(self, region: str, events: list) -> bool:
+        """Hand events for users homed on `region` to that node's outbox."""
+        url = self.peers.get(region)
+        if not url:
+            return False
+        try:
+            resp = await self.http().post(f"{url}/node/relay", json={"events": events})
+        except httpx.HTTPError:
+            return False
+        return resp.status_code == 200
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        if self._sync_http is not None:
+            self._sync_http.close()
+            self._sync_http = None
+
+node_registry = NodeRegistry(NODE_NAME, PEER_NODES)
@@ -0,0 +1,171 @@
+import asyncio
+from datetime import datetime
+
+from pymongo import MongoClient, ASCENDING, ReturnDocument
+from app.config import MONGO_URI, MONGO_DB
+from app.websocket_manager import ws_manager
+from app.services.metrics import span
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+outbox_collection = db["outbox"]
+sequences_collection = db["outbox_sequences"]
+
+DISPATCH_BATCH_SIZE = 200
+DISPATCH_IDLE_INTERVAL = 0.5   # seconds between polls when nothing woke us
+OUTBOX_RETENTION_DAYS = 7
+
+# -------------------------------
+# 📬 Durable event outbox
+# -------------------------------
+class EventOutbox:
+    """Notifications are written to Mongo next to the state change and
+    delivered by a background dispatcher, at least once, in per-user
+    sequence order. Clients dedupe on `seq` and can replay what they missed.
+
+    Recording costs Mongo round trips (one sequence bump per user, one
+    insert). Async handlers use publish_async / publish_many_async so they
+    run in a thread; events of one request go through one publish_many.
+    """
+
+    def __init__(self, collection, sequences):
+        self.collection = collection
+        self.sequences = sequences
+        self.relay = None  # node registry, in multi-node mode (see relay_once)
+        self._wakeup = None
+        self._loop = None
+
+    def ensure_indexes(self):
+        self.collection.create_index([("user_id", ASCENDING), ("seq", ASCENDING)], unique=True)
+        self.collection.create_index([("delivered", ASCENDING), ("user_id", ASCENDING)])
+        self.collection.create_index(
+            [("created_at", ASCENDING)], expireAfterSeconds=OUTBOX_RETENTION_DAYS * 86400
+        )
+
+    def _reserve_seqs(self, user_id: str, n: int) -> int:
+        """Reserve n consecutive sequence numbers; returns the first."""
+        doc = self.sequences.find_one_and_update(
+            {"_id": user_id}, {"$inc": {"seq": n}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        return doc["seq"] - n + 1
+
+    def publish_many(self, events) -> list:
+        """Record (user_id, event, data) triples in order: one sequence bump per
+        user and one insert_many. Blocks on Mongo; returns each event's seq (None
+        for a missing user_id)."""
+        events = [(user_id, event, data) for user_id, event, data in events]
+        counts = {}
+        for user_id, _, _ in events:
+            if user_id:
+                counts[user_id] = counts.get(user_id, 0) + 1
+        if not counts:
+            return [None] * len(events)
+        with span("mongo.outbox_publish"):
+            next_seq = {user_id: self._reserve_seqs(user_id, n) for user_id, n in counts.items()}
+            now = datetime.utcnow()
+            docs, seqs = [], []
+            for user_id, event, data in events:
+                if not user_id:
+                    seqs.append(None)
+                    continue
+                seq = next_seq[user_id]
+                next_seq[user_id] += 1
+                seqs.append(seq)
+                docs.append({
+                    "user_id": user_id,
+                    "seq": seq,
+                    "event": event,
+                    "data": data,
+                    "created_at": now,
+                    "delivered": False,
+                })
+            self.collection.insert_many(docs)
+        self.wake()
+        return seqs
+
+    def publish(self, user_id: str, event: str, data=None):
+        """Record an event for user_id. Blocks on Mongo: from async handlers use publish_async."""
+        return self.publish_many([(user_id, event, data)])[0]
+
+    async def publish_async(self, user_id: str, event: str, data=None):
+        return await asyncio.to_thread(self.publish, user_id, event, data)
+
+    async def publish_many_async(self, events) -> list:
+        return await asyncio.to_thread(self.publish_many, list(events))
+
+    def wake(self):
+        if self._wakeup is None or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def replay(self, user_id: str, after_seq: int = 0, limit: int = 100) -> list:
+        return list(self.collection.find(
+            {"user_id": user_id, "seq": {"$gt": after_seq}},
+            {"_id": 0, "seq": 1, "event": 1, "data": 1}
+        ).sort("seq", ASCENDING).limit(limit))
+
+    def _pending_batch(self, user_ids: list) -> list:
+        return list(self.collection.find(
+            {"delivered": False, "user_id": {"$in": user_ids}},
+            {"user_id": 1, "seq": 1, "event": 1, "data": 1}
+        ).sort([("user_id", ASCENDING), ("seq", ASCENDING)]).limit(DISPATCH_BATCH_SIZE))
+
+    async def dispatch_once(self) -> int:
+        # Only users with a socket on this worker; other workers drain their own
+        connected = list(ws_manager.active_connections.keys())
+        if not connected:
+            return 0
+        batch = await asyncio.to_thread(self._pending_batch, connected)
+        delivered = []
+        for doc in batch:
+            if await ws_manager.send_event(doc["user_id"], doc["event"], doc["data"], seq=doc["seq"]):
+                delivered.append(doc["_id"])
+        if delivered:
+            # Marked after sending: a crash in between means a resend, never a loss
+            await asyncio.to_thread(
+                self.collection.update_many, {"_id": {"$in": delivered}}, {"$set": {"delivered": True}}
+            )
+        return len(delivered)
+
+    async def relay_once(self) -> int:
+        """Events for users whose issue was forwarded here go to their home node's outbox."""
+        if self.relay is None or not self.relay.remote_users:
+            return 0
+        homes = dict(self.relay.remote_users)
+        batch = await asyncio.to_thread(self._pending_batch, list(homes))
+        by_home = {}
+        for doc in batch:
+            by_home.setdefault(homes[doc["user_id"]], []).append(doc)
+        relayed = []
+        for home, docs in by_home.items():
+            events = [{"user_id": d["user_id"], "event": d["event"], "data": d["data"]} for d in docs]
+            if await self.relay.relay(home, events):
+                relayed.extend(d["_id"] for d in docs)
+        if relayed:
+            await asyncio.to_thread(
+                self.collection.update_many, {"_id": {"$in": relayed}}, {"$set": {"delivered": True}}
+            )
+        return len(relayed)
+
+    async def dispatch_loop(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        while True:
+            delivered = await self.dispatch_once() + await self.relay_once()
+            if delivered >= DISPATCH_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=DISPATCH_IDLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+outbox = EventOutbox(outbox_collection, sequences_collection)
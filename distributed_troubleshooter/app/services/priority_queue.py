@@ -0,0 +1,122 @@
+import heapq
+import itertools
+
+# One urgency level is worth this many seconds of waiting, so a level-1 issue
+# that has waited 40 minutes ranks level with a fresh level-5 issue.
+# Tuned with scripts/simulate_priority.py: at 1.3x overload this cuts
+# urgency-5 p95 wait by ~40% versus FIFO while aging still bounds urgency-1 waits.
+URGENCY_WEIGHT = 600.0
+AGING_RATE = 1.0  # priority gained per second waited
+
+# -------------------------------
+# 🚦 Urgency + aging priority queue
+# -------------------------------
+class PendingQueue:
+    """Unassigned issues ordered by urgency plus time waited.
+
+    priority(t) = urgency * URGENCY_WEIGHT + (t - enqueued_at) * AGING_RATE.
+    Every entry ages at the same rate, so the order never changes over time
+    and the sort key can be fixed at insert: urgency * w - enqueued_at * a.
+    That makes it a plain binary heap (one global, one per region) with lazy
+    deletion: push/pop are O(log n), outranked is O(1) amortised, and top(n)
+    walks the heap in order without touching entries past the n-th kept one.
+    Pure Python with no Mongo, so simulations can use it directly.
+    """
+
+    def __init__(self, urgency_weight: float = URGENCY_WEIGHT, aging_rate: float = AGING_RATE):
+        self.urgency_weight = urgency_weight
+        self.aging_rate = aging_rate
+        self._entries = {}  # issue_id -> live entry
+        self._heaps = {}    # None (all regions) or region -> heap of entries, live or stale
+        self._stale = 0     # dead entries still sitting in the global heap
+        self._counter = itertools.count()
+
+    def _key(self, urgency: int, enqueued_at: float) -> float:
+        # Smaller sorts first
+        return -(urgency * self.urgency_weight - enqueued_at * self.aging_rate)
+
+    def priority(self, issue_id: str, now: float) -> float:
+        entry = self._entries[issue_id]
+        return entry[3] * self.urgency_weight + (now - entry[4]) * self.aging_rate
+
+    def push(self, issue_id: str, urgency: int, enqueued_at: float, region: str = None):
+        urgency = min(5, max(1, int(urgency or 1)))
+        self.discard(issue_id)
+        # Entry: [key, tiebreak, issue_id, urgency, enqueued_at, region, live]
+        entry = [self._key(urgency, enqueued_at), next(self._counter), issue_id, urgency, enqueued_at, region, True]
+        self._entries[issue_id] = entry
+        heapq.heappush(self._heaps.setdefault(None, []), entry)
+        heapq.heappush(self._heaps.setdefault(region, []), entry)
+
+    def discard(self, issue_id: str):
+        entry = self._entries.pop(issue_id, None)
+        if entry is not None:
+            entry[6] = False
+            self._stale += 1
+            if self._stale > 64 and self._stale > len(self._entries):
+                self._compact()
+
+    def _compact(self):
+        """Drop dead entries once they outnumber live ones."""
+        live = sorted(self._entries.values())  # a sorted list is a valid heap
+        self._heaps = {None: live}
+        for entry in live:
+            self._heaps.setdefault(entry[5], []).append(entry)
+        self._stale = 0
+
+    def _head(self, region=None):
+        heap = self._heaps.get(region)
+        while heap and not heap[0][6]:
+            heapq.heappop(heap)
+            if region is None:
+                self._stale -= 1
+        return heap[0] if heap else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, issue_id):
+        return issue_id in self._entries
+
+    def ordered(self, region: str = None):
+        """Live entries as (issue_id, urgency, region), highest priority first.
+
+        Walks the heap tree with a frontier heap, so taking the first k costs
+        O(k log k) whatever the queue size. Don't push/discard while iterating.
+        """
+        heap = self._heaps.get(region) or []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            if entry[6]:
+                yield entry[2], entry[3], entry[5]
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def top(self, n: int, region: str = None, keep=None) -> list:
+        """Up to n (issue_id, urgency, region) tuples, highest priority first.
+
+        keep(issue_id) filters before the limit, so entries it rejects never
+        hide the ones behind them.
+        """
+        out = []
+        for item in self.ordered(region):
+            if len(out) >= n:
+                break
+            if keep is None or keep(item[0]):
+                out.append(item)
+        return out
+
+    def pop(self):
+        entry = self._head()
+        if entry is None:
+            return None
+        self.discard(entry[2])
+        return entry[2]
+
+    def outranked(self, urgency: int, enqueued_at: float, region: str = None) -> bool:
+        """True if an already-waiting issue (in region) should be served before this one."""
+        key = self._key(min(5, max(1, int(urgency or 1))), enqueued_at)
+        head = self._head(region)
+        return head is not None and head[0] <= key
@@ -0,0 +1,161 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MAX_SECONDS = 60
+PROFILE_INTERVAL = 0.005                 # on-demand: 200 samples/s
+CONTINUOUS_INTERVAL = 0.1                # continuous: 10 samples/s, cheap enough to leave on
+CONTINUOUS_SLOT_SECONDS = 60             # stacks are aggregated per minute...
+CONTINUOUS_SLOTS = 30                    # ...and the last half hour is kept
+PROFILER_CONTINUOUS = os.getenv("PROFILER_CONTINUOUS", "0") == "1"
+
+# -------------------------------
+# 🔬 Stack sampling
+# -------------------------------
+def _thread_names() -> dict:
+    return {t.ident: t.name for t in threading.enumerate()}
+
+def _stack(frame) -> tuple:
+    """Root-first frames as (function, file, first line); one entry per function, not per line."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+def take_sample(counts: Counter, skip: int):
+    """Add one stack per thread (except `skip`, the sampler itself) to counts."""
+    names = _thread_names()
+    for ident, frame in sys._current_frames().items():
+        if ident != skip:
+            counts[(names.get(ident, str(ident)), _stack(frame))] += 1
+
+def sample_for(seconds: float, interval: float = PROFILE_INTERVAL):
+    """Sample every thread of this worker for `seconds`. Blocks; run it off the event loop.
+
+    Returns the counts and the achieved seconds per sample, which under GIL
+    contention is longer than `interval`.
+    """
+    counts = Counter()
+    me = threading.get_ident()
+    start = time.perf_counter()
+    deadline = start + seconds
+    rounds = 0
+    while time.perf_counter() < deadline:
+        take_sample(counts, me)
+        rounds += 1
+        time.sleep(interval)
+    return counts, (time.perf_counter() - start) / max(rounds, 1)
+
+# -------------------------------
+# 📤 Output formats
+# -------------------------------
+def _frame_name(frame: tuple) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+def collapsed(counts: Counter) -> str:
+    """Brendan Gregg's folded format, for flamegraph.pl, speedscope or inferno."""
+    lines = []
+    for (thread, frames), n in counts.most_common():
+        lines.append(";".join([thread] + [_frame_name(f) for f in frames]) + f" {n}")
+    return "\n".join(lines) + "\n"
+
+def speedscope(counts: Counter, interval: float, name: str) -> dict:
+    """One sampled profile per thread, in speedscope's file format."""
+    frames, index = [], {}
+    by_thread = {}
+    for (thread, stack), n in counts.items():
+        ids = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            ids.append(index[frame])
+        samples, weights = by_thread.setdefault(thread, ([], []))
+        samples.append(ids)
+        weights.append(n * interval)
+    profiles = [{
+        "type": "sampled",
+        "name": thread,
+        "unit": "seconds",
+        "startValue": 0,
+        "endValue": sum(weights),
+        "samples": samples,
+        "weights": weights,
+    } for thread, (samples, weights) in sorted(by_thread.items())]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "distributed_troubleshooter",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+    }
+
+# -------------------------------
+# 🔁 Continuous low-rate profiling
+# -------------------------------
+class ContinuousProfiler:
+    """Background sampler at CONTINUOUS_INTERVAL, aggregated per minute in a ring.
+
+    Answers "what was this worker doing around the slowdown" after the fact;
+    on-demand sampling is still the tool for a detailed look.
+    """
+
+    def __init__(self, interval: float = CONTINUOUS_INTERVAL, slots: int = CONTINUOUS_SLOTS):
+        self.interval = interval
+        self.slots = deque(maxlen=slots)   # (slot start, Counter)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running and not self._stop.is_set():
+            return
+        if self._thread is not None:
+            self._thread.join()  # a stop() still winding down, at most one interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.is_set():
+            slot_start = time.time() // CONTINUOUS_SLOT_SECONDS * CONTINUOUS_SLOT_SECONDS
+            with self._lock:
+                if not self.slots or self.slots[-1][0] != slot_start:
+                    self.slots.append((slot_start, Counter()))
+                counts = self.slots[-1][1]
+                try:
+                    take_sample(counts, me)
+                except Exception:
+                    logger.exception("profiler sample failed")
+            self._stop.wait(self.interval)
+
+    def recent(self, minutes: int) -> Counter:
+        cutoff = time.time() - minutes * 60
+        merged = Counter()
+        with self._lock:
+            for slot_start, counts in self.slots:
+                if slot_start + CONTINUOUS_SLOT_SECONDS > cutoff:
+                    merged.update(counts)
+        return merged
+
+continuous_profiler = ContinuousProfiler()
+
+# One on-demand profile at a time per worker: two would sample each other
+profile_lock = threading.Lock()
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from fastapi import Depends, HTTPException, Request
+from app.auth.auth_handler import get_current_user
+from app.services.metrics import registry
+
+# Optional shared backend so all workers/nodes draw from one bucket per key
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+BUCKET_STORE_SIZE = 100_000   # in-memory keys kept; evicting an idle bucket is the same as refilling it
+REDIS_WARNING_INTERVAL = 60   # seconds between "backend unavailable" warnings while it stays down
+
+# Reverse proxies whose X-Forwarded-For is believed, comma separated. Without
+# them every client behind a proxy shares the proxy's address (and its login
+# bucket). Equivalent to uvicorn --proxy-headers --forwarded-allow-ips
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "").split(",") if ip.strip()}
+
+# Event-loop lag is the node's latency signal: sync Mongo calls and slow
+# handlers all show up as the loop waking up late
+LAG_INTERVAL = 0.1
+LAG_SMOOTHING = 0.2                                   # EWMA weight of each sample (~0.5s memory)
+SHED_LAG = float(os.getenv("SHED_LAG", "0.1"))        # seconds of lag where shedding starts
+SHED_RETRY_AFTER = 5
+
+# rate: tokens refilled per second, burst: bucket size,
+# priority: 0 is never shed (only rate-limited), higher is shed first
+RouteClass = namedtuple("RouteClass", "rate burst priority")
+ROUTE_CLASSES = {
+    "login": RouteClass(0.2, 10, 0),           # per client address
+    "login_account": RouteClass(0.1, 5, 0),    # failed logins per email, whichever address they come from
+    "report": RouteClass(0.1, 5, 0),
+    "chat_send": RouteClass(1.0, 10, 1),
+    "chat_poll": RouteClass(2.0, 20, 2),       # the dashboard polls every open chat every 7s
+}
+
+admission_rejected = registry.counter(
+    "admission_rejected_total", "Requests refused by route class and reason (rate_limited, shed)."
+)
+
+# -------------------------------
+# 🪣 Token bucket stores
+# -------------------------------
+class MemoryBuckets:
+    """Per-process buckets, LRU-bounded."""
+
+    def __init__(self, size: int = BUCKET_STORE_SIZE):
+        self.size = size
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        """Spend `cost` tokens (0 only checks); 0.0 when admitted, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(key, None) or [burst, now]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= cost
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = [tokens, now]
+            if len(self._buckets) > self.size:
+                self._buckets.popitem(last=False)
+        return wait
+
+# Same bucket as MemoryBuckets, atomically in Redis, on the Redis clock
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - cost else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+class RedisBuckets:
+    """Shared buckets; falls back to this process's buckets while Redis is unreachable."""
+
+    def __init__(self, url: str, fallback: MemoryBuckets):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.fallback = fallback
+        self._warned_at = 0.0
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        """Blocks on a Redis round trip: call it from a thread, not the event loop."""
+        try:
+            return float(self.script(keys=["ratelimit:" + key], args=[rate, burst, cost]))
+        except redis.RedisError:
+            # Every request would log this while Redis is down
+            now = time.monotonic()
+            if now - self._warned_at >= REDIS_WARNING_INTERVAL:
+                self._warned_at = now
+                logger.warning("rate limit backend unavailable, using local buckets", exc_info=True)
+            return self.fallback.take(key, rate, burst, cost)
+
+def make_store():
+    memory = MemoryBuckets()
+    if RATE_LIMIT_REDIS_URL:
+        if redis is None:
+            logger.warning("RATE_LIMIT_REDIS_URL is set but redis is not installed; using local buckets")
+        else:
+            return RedisBuckets(RATE_LIMIT_REDIS_URL, memory)
+    return memory
+
+# -------------------------------
+# 🚦 Admission control
+# -------------------------------
+class AdmissionController:
+    """Token buckets per (route class, caller), plus priority-aware load shedding.
+
+    While event-loop lag stays under SHED_LAG only the buckets apply. Above
+    it, priority 2 (chat polling) is refused with 503; above twice SHED_LAG,
+    priority 1 (chat sends) too. Priority 0 (report, login) is never shed.
+    Every refusal carries Retry-After.
+
+    admit() may block on the shared store; the route dependencies below are
+    sync so FastAPI runs them in its threadpool.
+    """
+
+    def __init__(self, store, classes: dict = ROUTE_CLASSES, enabled: bool = RATE_LIMIT_ENABLED):
+        self.store = store
+        self.classes = classes
+        self.enabled = enabled
+        self.lag = 0.0
+
+    async def monitor(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_INTERVAL)
+            lag = max(0.0, loop.time() - start - LAG_INTERVAL)
+            self.lag += LAG_SMOOTHING * (lag - self.lag)
+
+    def shed_level(self) -> int:
+        if self.lag < SHED_LAG:
+            return 0
+        return 1 if self.lag < 2 * SHED_LAG else 2
+
+    def admit(self, route_class: str, key: str, cost: int = 1):
+        """Refuse with 503/429 or spend `cost` tokens; cost=0 only checks the bucket."""
+        if not self.enabled:
+            return
+        cls = self.classes[route_class]
+        level = self.shed_level()
+        if level and cls.priority >= 3 - level:
+            admission_rejected.inc(route_class=route_class, reason="shed")
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy, please retry shortly.",
+                headers={"Retry-After": str(SHED_RETRY_AFTER)},
+            )
+        wait = self.store.take(f"{route_class}:{key}", cls.rate, cls.burst, cost)
+        if wait > 0:
+            admission_rejected.inc(route_class=route_class, reason="rate_limited")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def charge(self, route_class: str, key: str):
+        """Spend a token after the fact (a failed login) without refusing anything."""
+        if self.enabled:
+            cls = self.classes[route_class]
+            self.store.take(f"{route_class}:{key}", cls.rate, cls.burst)
+
+admission = AdmissionController(make_store())
+
+# -------------------------------
+# 🔌 Route dependencies
+# -------------------------------
+def client_address(request: Request) -> str:
+    """The caller's address; behind a trusted proxy, the last hop it saw in X-Forwarded-For."""
+    host = request.client.host if request.client else "unknown"
+    if host in TRUSTED_PROXIES:
+        hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        # Rightmost address not added by one of our own proxies; the rest is client-supplied
+        for hop in reversed(hops):
+            if hop not in TRUSTED_PROXIES:
+                return hop
+    return host
+
+def limit(route_class: str):
+    """One bucket per user: dependencies=[Depends(limit("report"))]."""
+    def dependency(current_user=Depends(get_current_user)):
+        admission.admit(route_class, current_user["user_id"])
+    return dependency
+
+def limit_by_client(route_class: str):
+    """One bucket per client address, for routes called before login."""
+    def dependency(request: Request):
+        admission.admit(route_class, client_address(request))
+    return dependency
@@ -0,0 +1,117 @@
+import math
+import random
+import threading
+import time
+
+# Arrival rates forget with this time constant (seconds)
+ARRIVAL_TAU = 300.0
+# Service-time EWMA weight per completed issue, and the prior before any data
+SERVICE_ALPHA = 0.1
+SERVICE_PRIOR = 1800.0
+# Floor on the drain rate as a share of capacity, so overload gives a large finite delay
+MIN_DRAIN_SHARE = 0.05
+# Power-of-d choices. In scripts/simulate_regions.py (4 regions, bursts of ~6,
+# load 0.9-1.1) d=2 cut p99 wait vs the snapshot heuristic in 7 of 8 runs,
+# typically by 20-50%; d=3 did about as well.
+CHOICES = 2
+
+# -------------------------------
+# 📉 Streaming estimators
+# -------------------------------
+class EwmaRate:
+    """Exponentially decayed event rate (events/second), like a load average."""
+
+    def __init__(self, tau: float = ARRIVAL_TAU):
+        self.tau = tau
+        self._value = 0.0
+        self._at = None
+
+    def _decay(self, now: float):
+        if self._at is not None and now > self._at:
+            self._value *= math.exp(-(now - self._at) / self.tau)
+        self._at = now if self._at is None else max(self._at, now)
+
+    def observe(self, now: float, count: int = 1):
+        self._decay(now)
+        self._value += count / self.tau
+
+    def rate(self, now: float) -> float:
+        self._decay(now)
+        return self._value
+
+class EwmaMean:
+    def __init__(self, alpha: float = SERVICE_ALPHA, prior: float = SERVICE_PRIOR):
+        self.alpha = alpha
+        self.value = prior
+
+    def observe(self, sample: float):
+        self.value += self.alpha * (sample - self.value)
+
+# -------------------------------
+# 🧭 Predictive region selection
+# -------------------------------
+class RegionSelector:
+    """Pick the region with the lowest predicted wait, among d random candidates.
+
+    Per region it keeps an EWMA arrival rate (lambda) and an EWMA service time
+    per slot (1/mu). With `slots` expert slots, `free` of them idle and
+    `backlog` issues already waiting, a new issue waits roughly
+
+        max(0, backlog + 1 - free) / max(slots * mu - lambda, MIN_DRAIN_SHARE * slots * mu)
+
+    Comparing only d random candidates (power of two choices) keeps a burst of
+    simultaneous requests from herding onto one region that looked best.
+
+    `state(region) -> (slots, free, backlog)` supplies current capacity, so the
+    same class runs against the live roster or a simulation.
+    """
+
+    def __init__(self, regions, state, clock=time.time, rng=None, choices: int = CHOICES):
+        self.regions = list(regions)
+        self.state = state
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.choices = choices
+        self._arrivals = {r: EwmaRate() for r in self.regions}
+        self._service = {r: EwmaMean() for r in self.regions}
+        self._lock = threading.Lock()
+
+    # ---- lifecycle events ----
+    def on_arrival(self, region: str):
+        if region in self._arrivals:
+            with self._lock:
+                self._arrivals[region].observe(self.clock())
+
+    def on_service(self, region: str, seconds: float):
+        if region in self._service and seconds is not None:
+            with self._lock:
+                self._service[region].observe(seconds)
+
+    # ---- prediction ----
+    def predicted_delay(self, region: str) -> float:
+        slots, free, backlog = self.state(region)
+        if slots <= 0:
+            return math.inf
+        with self._lock:
+            lam = self._arrivals[region].rate(self.clock())
+            mu = 1.0 / max(self._service[region].value, 1e-6)
+        ahead = backlog + 1 - free
+        if ahead <= 0:
+            return 0.0
+        capacity = slots * mu
+        return ahead / max(capacity - lam, MIN_DRAIN_SHARE * capacity)
+
+    def choose(self, exclude=()):
+        """Best of `choices` random regions that have any capacity; None if none do."""
+        candidates = [r for r in self.regions if r not in exclude and self.state(r)[0] > 0]
+        if not candidates:
+            return None
+        if len(candidates) > self.choices:
+            candidates = self.rng.sample(candidates, self.choices)
+
+        def key(region):
+            slots, free, _ = self.state(region)
+            # Equal predicted waits: prefer more idle slots
+            return (self.predicted_delay(region), -free / slots)
+
+        return min(candidates, key=key)
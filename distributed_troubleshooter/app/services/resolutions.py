@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import threading
+
+import torch
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from app.config import MONGO_URI, MONGO_DB
+from app.services.archive import issue_archive
+from app.services.metrics import span
+from app.services.utils import MODEL
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+issues_collection = db["issues"]
+resolutions_collection = db["resolution_index"]
+
+logger = logging.getLogger(__name__)
+
+RESOLUTION_INDEX_SIZE = 50_000   # most recent resolutions kept searchable in memory
+MIN_SIMILARITY = 0.6             # cosine below this is not shown as a possible fix
+SUGGESTION_K = 3
+BACKFILL_BATCH = 256             # issues embedded per model call on backfill
+RESOLUTION_SYNC_INTERVAL = 60    # seconds; picks up what other workers indexed or removed
+
+def issue_text(issue: dict) -> str:
+    return issue.get("title", "") + " " + issue.get("description", "")
+
+def _encode(texts):
+    # Unit vectors, so cosine similarity is a plain dot product
+    with span("embed"):
+        return MODEL.encode(texts, convert_to_tensor=True, normalize_embeddings=True).float().cpu()
+
+# -------------------------------
+# 🔁 Past resolutions, nearest-neighbour search
+# -------------------------------
+class ResolutionIndex:
+    """Embeddings of closed issues that have resolution notes.
+
+    Vectors are stored in `resolution_index` (one small doc per issue, so
+    a restart reloads them without re-encoding) and held in memory as one
+    normalised matrix. A search is one matrix-vector product over at most
+    RESOLUTION_INDEX_SIZE rows: exact, and a few milliseconds at that size.
+    When full, the oldest rows are overwritten.
+
+    Each worker holds its own copy; sync() reconciles it with the stored
+    vectors every RESOLUTION_SYNC_INTERVAL, without re-encoding anything.
+    """
+
+    def __init__(self, collection, size: int = RESOLUTION_INDEX_SIZE):
+        self.collection = collection
+        self.size = size
+        self._matrix = None   # (size, dim) float32, allocated on first vector
+        self._meta = []       # row -> summary dict, or None when removed
+        self._rows = {}       # issue_id -> row
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        self.collection.create_index([("issue_id", ASCENDING)], unique=True)
+        self.collection.create_index([("closed_at", DESCENDING)])
+
+    # ---- in-memory rows ----
+    def _put(self, doc: dict, vector: torch.Tensor):
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = torch.zeros(self.size, vector.shape[-1])
+                self._meta = [None] * self.size
+            row = self._rows.get(doc["issue_id"])
+            if row is None:
+                row = self._next % self.size
+                self._next += 1
+                old = self._meta[row]
+                if old is not None:
+                    self._rows.pop(old["issue_id"], None)
+            self._matrix[row] = vector
+            self._meta[row] = {k: doc.get(k) for k in ("issue_id", "title", "category", "region", "resolution_notes", "closed_at")}
+            self._rows[doc["issue_id"]] = row
+
+    def __len__(self):
+        return len(self._rows)
+
+    # ---- loading ----
+    def load(self):
+        """Newest stored vectors first, oldest ones fill the remaining rows."""
+        docs = list(self.collection.find({}, {"_id": 0}).sort("closed_at", DESCENDING).limit(self.size))
+        for doc in reversed(docs):
+            self._put(doc, torch.tensor(doc["embedding"], dtype=torch.float32))
+
+    def sync(self):
+        """Load stored vectors this worker lacks and drop rows whose doc was removed."""
+        stored = {doc["issue_id"] for doc in self.collection.find(
+            {}, {"_id": 0, "issue_id": 1}
+        ).sort("closed_at", DESCENDING).limit(self.size)}
+        with self._lock:
+            gone = [issue_id for issue_id in self._rows if issue_id not in stored]
+            missing = [issue_id for issue_id in stored if issue_id not in self._rows]
+        for issue_id in gone:
+            self._drop(issue_id)
+        if missing:
+            docs = self.collection.find({"issue_id": {"$in": missing}}, {"_id": 0}).sort("closed_at", ASCENDING)
+            for doc in docs:
+                self._put(doc, torch.tensor(doc["embedding"], dtype=torch.float32))
+
+    async def sync_loop(self):
+        while True:
+            await asyncio.sleep(RESOLUTION_SYNC_INTERVAL)
+            try:
+                await asyncio.to_thread(self.sync)
+            except PyMongoError:
+                logger.exception("resolution index sync failed")
+
+    def backfill(self, limit: int = None) -> int:
+        """Embed closed, resolved issues (both tiers) that have no stored vector yet.
+
+        Only fills free rows by default, so older issues never push out newer ones.
+        """
+        if limit is None:
+            limit = self.size - len(self)
+        query = {"status": "closed", "resolution_notes": {"$nin": [None, ""]}}
+        projection = {"_id": 0, "issue_id": 1, "title": 1, "description": 1, "category": 1,
+                      "region": 1, "resolution_notes": 1, "closed_at": 1}
+        added = 0
+        batch = []
+        if limit <= 0:
+            return 0
+        for collection in (issues_collection, issue_archive.issues):
+            for issue in collection.find(query, projection).sort("closed_at", DESCENDING):
+                if added + len(batch) >= limit:
+                    break
+                if issue["issue_id"] in self._rows:
+                    continue
+                batch.append(issue)
+                if len(batch) >= BACKFILL_BATCH:
+                    added += self._add_many(batch)
+                    batch = []
+        if batch:
+            added += self._add_many(batch)
+        return added
+
+    # ---- writes ----
+    def _add_many(self, issues: list) -> int:
+        vectors = _encode([issue_text(i) for i in issues])
+        for issue, vector in zip(issues, vectors):
+            doc = {k: issue.get(k) for k in ("issue_id", "title", "category", "region", "resolution_notes", "closed_at")}
+            doc["embedding"] = vector.tolist()
+            self.collection.update_one({"issue_id": doc["issue_id"]}, {"$set": doc}, upsert=True)
+            self._put(doc, vector)
+        return len(issues)
+
+    def add(self, issue: dict):
+        """Index one issue as it closes; skipped when there is no resolution to offer."""
+        if issue.get("status") != "closed" or not issue.get("resolution_notes"):
+            return
+        if issue.get("canonical_issue"):
+            return  # a linked duplicate: the canonical issue already carries these notes
+        try:
+            self._add_many([issue])
+        except Exception:
+            # Never fail the close over a suggestion index
+            logger.exception("could not index resolution for issue %s", issue.get("issue_id"))
+
+    def remove(self, issue_id: str):
+        self.collection.delete_one({"issue_id": issue_id})
+        self._drop(issue_id)
+
+    def _drop(self, issue_id: str):
+        with self._lock:
+            row = self._rows.pop(issue_id, None)
+            if row is not None:
+                self._matrix[row].zero_()
+                self._meta[row] = None
+
+    # ---- search ----
+    def search(self, text: str, k: int = SUGGESTION_K, min_score: float = MIN_SIMILARITY) -> list:
+        """Past resolutions closest to `text`, best first, each with its cosine `score`."""
+        if not self._rows or not text.strip():
+            return []
+        query = _encode(text)
+        with span("resolution.search"), self._lock:
+            filled = min(self._next, self.size)
+            scores = self._matrix[:filled] @ query
+            top = torch.topk(scores, min(k, filled))
+            hits = [(float(s), self._meta[int(r)]) for s, r in zip(top.values, top.indices)]
+        return [{**meta, "score": round(score, 3)} for score, meta in hits if meta is not None and score >= min_score]
+
+resolution_index = ResolutionIndex(resolutions_collection)
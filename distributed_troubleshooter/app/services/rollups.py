@@ -0,0 +1,225 @@
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from app.config import MONGO_URI, MONGO_DB, REGIONS
+from app.services.roster import expert_roster
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+rollups_collection = db["region_rollups"]
+issues_collection = db["issues"]
+
+ROLLUP_CACHE_HOURS = 7 * 24   # hours of rollups kept in memory
+ROLLUP_FLUSH_INTERVAL = 5     # seconds between batched $inc flushes
+ROLLUP_REFRESH_INTERVAL = 60  # seconds between cache reloads (other workers' events, open-count drift)
+
+OPEN_STATUSES = ["pending", "assigned", "in_progress"]
+
+# Counters kept per region and hour
+FIELDS = (
+    "opened", "assigned", "rejected", "escalated", "resolved", "closed",
+    "time_to_assign_sum", "time_to_assign_count",
+    "time_to_resolve_sum", "time_to_resolve_count",
+    "utilization_sum", "utilization_samples",
+)
+
+def hour_of(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+# -------------------------------
+# 📊 Per-region, per-hour rollups
+# -------------------------------
+class RegionRollups:
+    """Lifecycle events folded into hourly counters per region.
+
+    Writers call the on_* hooks; increments land in the in-memory cache at
+    once and reach `region_rollups` as one batched $inc per (region, hour)
+    every few seconds. Readers only touch the cache, so dashboard cost does
+    not grow with issue history.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._hours = {}    # (region, hour) -> Counter
+        self._pending = {}  # (region, hour) -> Counter not yet flushed
+        self._open = Counter()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.version = 0  # bumped on every change to the cache (for ETags)
+
+    def subscribe(self, listener):
+        """listener(event, region, seconds) for "arrival" and "service" events."""
+        self._listeners.append(listener)
+
+    def _notify(self, event: str, region: str, seconds: float = None):
+        for listener in self._listeners:
+            listener(event, region, seconds)
+
+    def ensure_indexes(self):
+        self.collection.create_index([("hour", ASCENDING), ("region", ASCENDING)])
+
+    # ---- recording ----
+    def _utilization(self, region: str) -> float:
+        experts = expert_roster.available(region, with_capacity=False)
+        capacity = sum(e.max_concurrent_issues for e in experts)
+        return sum(e.active_issues for e in experts) / capacity if capacity else 0.0
+
+    def _record(self, region: str, open_delta: int = 0, **counts):
+        if not region:
+            return
+        key = (region, hour_of(datetime.utcnow()))
+        counts["utilization_sum"] = self._utilization(region)
+        counts["utilization_samples"] = 1
+        with self._lock:
+            self._hours.setdefault(key, Counter()).update(counts)
+            self._pending.setdefault(key, Counter()).update(counts)
+            self._open[region] += open_delta
+            self.version += 1
+
+    @staticmethod
+    def _seconds(start, end):
+        if not start or not end:
+            return None
+        return max(0.0, (end - start).total_seconds())
+
+    def on_opened(self, issue: dict):
+        self._record(issue.get("region"), open_delta=1, opened=1)
+        self._notify("arrival", issue.get("region"))
+
+    def on_assigned(self, issue: dict):
+        counts = {"assigned": 1}
+        # Time-to-assign counts the first assignment only
+        if not issue.get("rejected_by") and not issue.get("skipped_by"):
+            waited = self._seconds(issue.get("timestamp"), datetime.utcnow())
+            if waited is not None:
+                counts.update(time_to_assign_sum=waited, time_to_assign_count=1)
+        self._record(issue.get("region"), **counts)
+
+    def on_unassigned(self, issue: dict, skip_field: str):
+        self._record(issue.get("region"), **{"rejected" if skip_field == "rejected_by" else "escalated": 1})
+
+    def on_resolved(self, issue: dict):
+        counts = {"resolved": 1}
+        took = self._seconds(issue.get("timestamp"), issue.get("resolved_at"))
+        if took is not None:
+            counts.update(time_to_resolve_sum=took, time_to_resolve_count=1)
+        self._record(issue.get("region"), open_delta=-1, **counts)
+        self._notify("service", issue.get("region"), self._seconds(issue.get("assigned_at"), issue.get("resolved_at")))
+
+    def on_closed(self, issue: dict):
+        if issue.get("canonical_issue"):
+            return  # a linked duplicate was never counted as opened
+        if issue.get("resolved_at"):
+            self._record(issue.get("region"), closed=1)
+            return
+        # Closed straight from assigned/in_progress: it leaves the open set here
+        counts = {"closed": 1}
+        took = self._seconds(issue.get("timestamp"), issue.get("closed_at"))
+        if took is not None:
+            counts.update(time_to_resolve_sum=took, time_to_resolve_count=1)
+        self._record(issue.get("region"), open_delta=-1, **counts)
+        self._notify("service", issue.get("region"), self._seconds(issue.get("assigned_at"), issue.get("closed_at")))
+
+    def on_deleted(self, issue: dict):
+        if issue.get("status") in OPEN_STATUSES:
+            with self._lock:
+                self._open[issue.get("region")] -= 1
+                self.version += 1
+
+    # ---- persistence ----
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self.collection.bulk_write([
+            UpdateOne(
+                {"_id": f"{region}:{hour.isoformat()}"},
+                {"$inc": dict(counts), "$setOnInsert": {"region": region, "hour": hour}},
+                upsert=True,
+            )
+            for (region, hour), counts in pending.items()
+        ], ordered=False)
+
+    def refresh(self):
+        """Reload the cached window and recount open issues (bounded by open work, not history)."""
+        since = hour_of(datetime.utcnow()) - timedelta(hours=ROLLUP_CACHE_HOURS)
+        hours = {}
+        for doc in self.collection.find({"hour": {"$gte": since}}):
+            hours[(doc["region"], doc["hour"])] = Counter({f: doc.get(f, 0) for f in FIELDS})
+        open_counts = Counter({
+            row["_id"]: row["n"] for row in issues_collection.aggregate([
+                {"$match": {"status": {"$in": OPEN_STATUSES}}},
+                {"$group": {"_id": "$region", "n": {"$sum": 1}}},
+            ])
+        })
+        with self._lock:
+            # Keep local increments that have not been flushed yet
+            for key, counts in self._pending.items():
+                hours.setdefault(key, Counter()).update(counts)
+            self._hours, self._open = hours, open_counts
+            self.version += 1
+
+    def backfill(self):
+        """One-off rebuild of opened/closed counts from raw issues for an empty collection."""
+        if self.collection.estimated_document_count():
+            return
+        increments = {}
+        for field, ts_field in (("opened", "timestamp"), ("closed", "closed_at")):
+            for row in issues_collection.aggregate([
+                # Linked duplicates never enter the live counts either
+                {"$match": {ts_field: {"$type": "date"}, "region": {"$in": REGIONS}, "canonical_issue": {"$exists": False}}},
+                {"$group": {
+                    "_id": {"region": "$region", "hour": {"$dateTrunc": {"date": "$" + ts_field, "unit": "hour"}}},
+                    "n": {"$sum": 1},
+                }},
+            ]):
+                key = (row["_id"]["region"], row["_id"]["hour"])
+                increments.setdefault(key, Counter())[field] += row["n"]
+        with self._lock:
+            for key, counts in increments.items():
+                self._pending.setdefault(key, Counter()).update(counts)
+        self.flush()
+
+    async def run(self):
+        while True:
+            for _ in range(max(1, ROLLUP_REFRESH_INTERVAL // ROLLUP_FLUSH_INTERVAL)):
+                await asyncio.sleep(ROLLUP_FLUSH_INTERVAL)
+                await asyncio.to_thread(self.flush)
+            await asyncio.to_thread(self.refresh)
+
+    # ---- reads (cache only) ----
+    def open_count(self, region: str) -> int:
+        return max(0, self._open.get(region, 0))
+
+    def summary(self, region: str, hours: int = 24) -> dict:
+        since = hour_of(datetime.utcnow()) - timedelta(hours=hours - 1)
+        total = Counter()
+        with self._lock:
+            for (r, hour), counts in self._hours.items():
+                if r == region and hour >= since:
+                    total.update(counts)
+        return self._derive(total)
+
+    def series(self, region: str, hours: int = 24) -> list:
+        since = hour_of(datetime.utcnow()) - timedelta(hours=hours - 1)
+        with self._lock:
+            rows = sorted((hour, Counter(counts)) for (r, hour), counts in self._hours.items()
+                          if r == region and hour >= since)
+        return [{"hour": hour, **self._derive(counts)} for hour, counts in rows]
+
+    @staticmethod
+    def _derive(counts: Counter) -> dict:
+        def avg(total, n):
+            return round(counts[total] / counts[n], 2) if counts[n] else None
+        return {
+            **{f: counts[f] for f in ("opened", "assigned", "rejected", "escalated", "resolved", "closed")},
+            "avg_time_to_assign": avg("time_to_assign_sum", "time_to_assign_count"),
+            "avg_time_to_resolve": avg("time_to_resolve_sum", "time_to_resolve_count"),
+            "avg_utilization": avg("utilization_sum", "utilization_samples"),
+        }
+
+region_rollups = RegionRollups(rollups_collection)
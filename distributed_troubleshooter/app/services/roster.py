@@ -0,0 +1,215 @@
+import asyncio
+import re
+import threading
+
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import PyMongoError
+from app.config import MONGO_URI, MONGO_DB, DEFAULT_MAX_CONCURRENT
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+experts_collection = db["experts"]
+roster_meta_collection = db["roster_meta"]
+
+ROSTER_REFRESH_INTERVAL = 30  # seconds; safety net when change streams are unavailable
+PROFILE_VERSION_ID = "profile_version"  # roster_meta doc shared by every worker and node restart
+
+ROSTER_PROJECTION = {
+    "_id": 0,
+    "expert_id": 1,
+    "email": 1,
+    "region": 1,
+    "expert_tags": 1,
+    "availability": 1,
+    "trust_score": 1,
+    "active_issues": 1,
+    "max_concurrent_issues": 1,
+    "is_available": 1,
+    "is_verified": 1,
+}
+
+# -------------------------------
+# 🧑‍🔧 Compact expert record
+# -------------------------------
+class ExpertRecord:
+    """Just the fields matching reads. Supports .get()/[] so the scorer can treat it like a doc."""
+
+    __slots__ = (
+        "expert_id", "email", "region", "expert_tags", "availability",
+        "trust_score", "active_issues", "max_concurrent_issues", "is_available", "tag_words",
+    )
+
+    def __init__(self, doc: dict):
+        tags = doc.get("expert_tags") or []
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.split(",")]
+        self.expert_id = doc["expert_id"]
+        self.email = doc.get("email")
+        self.region = doc.get("region")
+        self.expert_tags = tuple(t.lower() for t in tags if t)
+        # Words of the tags, cleaned like issue text (utils.clean_text), for cheap relevance checks
+        self.tag_words = frozenset(re.sub(r"[^a-z0-9 ]", "", " ".join(self.expert_tags)).split())
+        self.availability = doc.get("availability")
+        self.trust_score = doc.get("trust_score", 0.5)
+        self.active_issues = max(0, int(doc.get("active_issues", 0)))
+        self.max_concurrent_issues = doc.get("max_concurrent_issues", DEFAULT_MAX_CONCURRENT)
+        self.is_available = bool(doc.get("is_available", False))
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.active_issues < self.max_concurrent_issues
+
+# -------------------------------
+# 📋 In-process roster of verified experts
+# -------------------------------
+class ExpertRoster:
+    """Verified experts indexed by region and availability.
+
+    Kept current by the write paths (refresh_expert / set_load) and, when the
+    deployment supports it, a change stream. `version` increases on every
+    applied change so callers can tell whether a cached result is stale.
+
+    `profile_version` changes only when something that changes a match score
+    other than load does (tags, trust, region, availability, membership). It
+    is a counter in `roster_meta`, bumped by the worker whose write changed a
+    profile, so rankings stored on issues can be compared across workers and
+    restarts. Other workers read it when they load or see the change; until
+    then they only rescore more than needed.
+    """
+
+    def __init__(self, collection, meta_collection):
+        self.collection = collection
+        self.meta_collection = meta_collection
+        self.version = 0
+        self.profile_version = 0
+        self.loaded = False
+        self._by_id = {}
+        self._available = {}  # region -> set(expert_id)
+        self._lock = threading.RLock()
+
+    # ---- loading / invalidation ----
+    def stored_profile_version(self) -> int:
+        doc = self.meta_collection.find_one({"_id": PROFILE_VERSION_ID})
+        return doc["version"] if doc else 0
+
+    def _bump_profile_version(self):
+        doc = self.meta_collection.find_one_and_update(
+            {"_id": PROFILE_VERSION_ID}, {"$inc": {"version": 1}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        self._see_profile_version(doc["version"])
+
+    def _see_profile_version(self, version: int):
+        with self._lock:
+            self.profile_version = max(self.profile_version, version)
+
+    def load(self):
+        # Read the counter before the docs: a version never claims newer profiles than were loaded
+        profile_version = self.stored_profile_version()
+        docs = list(self.collection.find({"is_verified": True}, ROSTER_PROJECTION))
+        with self._lock:
+            self._by_id = {}
+            self._available = {}
+            for doc in docs:
+                self._put(ExpertRecord(doc))
+            self.version += 1
+            self.loaded = True
+        self._see_profile_version(profile_version)
+
+    def _put(self, record: ExpertRecord):
+        self._drop(record.expert_id)
+        self._by_id[record.expert_id] = record
+        if record.is_available:
+            self._available.setdefault(record.region, set()).add(record.expert_id)
+
+    def _drop(self, expert_id: str):
+        old = self._by_id.pop(expert_id, None)
+        if old is not None:
+            self._available.get(old.region, set()).discard(expert_id)
+
+    @staticmethod
+    def _profile(record):
+        if record is None:
+            return None
+        return (record.region, record.expert_tags, record.trust_score, record.availability, record.is_available)
+
+    def apply(self, doc: dict = None, expert_id: str = None) -> bool:
+        """Apply one expert document (or its removal when doc is None); True if its profile changed."""
+        with self._lock:
+            expert_id = expert_id or (doc or {}).get("expert_id")
+            before = self._profile(self._by_id.get(expert_id))
+            if doc and doc.get("is_verified"):
+                self._put(ExpertRecord(doc))
+            else:
+                self._drop(expert_id)
+            self.version += 1
+            return self._profile(self._by_id.get(expert_id)) != before
+
+    def refresh_expert(self, expert_id: str):
+        """Re-read one expert after a write that touched matching fields."""
+        if self.apply(self.collection.find_one({"expert_id": expert_id}, ROSTER_PROJECTION), expert_id):
+            self._bump_profile_version()
+
+    def set_load(self, expert_id: str, active_issues: int):
+        with self._lock:
+            record = self._by_id.get(expert_id)
+            if record is not None:
+                record.active_issues = max(0, int(active_issues))
+                self.version += 1
+
+    # ---- queries (no Mongo reads) ----
+    def get(self, expert_id: str):
+        return self._by_id.get(expert_id)
+
+    def available(self, region: str = None, exclude=(), with_capacity: bool = True) -> list:
+        with self._lock:
+            if region is None:
+                ids = set().union(*self._available.values()) if self._available else set()
+            else:
+                ids = self._available.get(region, set())
+            records = [self._by_id[i] for i in ids if i not in exclude]
+        if with_capacity:
+            records = [r for r in records if r.has_capacity]
+        # Deterministic order (insertion order of the set is not)
+        records.sort(key=lambda r: r.expert_id)
+        return records
+
+    def available_count(self, region: str) -> int:
+        return len(self._available.get(region, ()))
+
+    def top_k(self, region: str, k: int, exclude=(), words=frozenset()) -> list:
+        """Best k available experts with capacity: most tag words shared with `words`
+        (the issue's), then trust, then load. A cheap pre-filter before full scoring."""
+        records = self.available(region, exclude)
+        records.sort(key=lambda r: (-len(r.tag_words & words), -r.trust_score, r.active_issues))
+        return records[:k]
+
+    # ---- background sync ----
+    def _watch(self):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        with self.collection.watch(pipeline, full_document="updateLookup") as stream:
+            for change in stream:
+                doc = change.get("fullDocument")
+                if doc is not None:
+                    if self.apply(doc):
+                        self._see_profile_version(self.stored_profile_version())
+                else:
+                    self.load()  # deletes only carry _id; rare enough to reload
+
+    async def sync_loop(self):
+        try:
+            await asyncio.to_thread(self._watch)
+        except PyMongoError:
+            pass  # standalone Mongo: no change streams, fall back to periodic reloads
+        while True:
+            await asyncio.sleep(ROSTER_REFRESH_INTERVAL)
+            await asyncio.to_thread(self.load)
+
+expert_roster = ExpertRoster(experts_collection, roster_meta_collection)
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import threading
+import time
+
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from app.config import MONGO_URI, MONGO_DB
+from app.services import issue_state
+from app.services.outbox import outbox
+from app.services.priority_queue import PendingQueue
+from app.services.roster import expert_roster
+from app.services.utils import assign_pending_issue, score_issues
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+issues_collection = db["issues"]
+
+logger = logging.getLogger(__name__)
+
+DRAIN_BATCH = 20     # waiting issues tried per drain
+DRAIN_INTERVAL = 30  # seconds; safety net that also picks up other workers' queued issues
+FILL_CANDIDATES = 20  # most urgent waiting issues scored when one expert frees up
+
+# Just what matching and notifications need from a waiting issue
+WAITING_FIELDS = ("issue_id", "title", "description", "region", "urgency",
+                  "timestamp", "submitted_by", "rejected_by", "skipped_by")
+
+# -------------------------------
+# 🗓️ Assignment scheduler for unassigned issues
+# -------------------------------
+class AssignmentScheduler:
+    """Hands free expert capacity to waiting issues by urgency plus aging.
+
+    Issues land here when no expert could take them (report, reject,
+    escalate) and stay in memory. Matching is event driven: when an expert
+    frees a slot (resolution, availability, verification, reject/escalate)
+    `capacity_freed` pulls the best-matching of the most urgent waiting
+    issues for that expert. Every DRAIN_INTERVAL `run` resyncs the index
+    with pending issues in Mongo (the queue is per worker, so this is how an
+    issue queued on one worker meets capacity freed on another) and drains.
+    """
+
+    def __init__(self):
+        self.queue = PendingQueue()
+        self._waiting = {}  # issue_id -> compact issue doc
+        self._lock = threading.Lock()
+        self._loop = None
+        self._draining = None
+        self._filling = set()  # expert_ids with a fill in flight
+        self._refill = set()   # ...and another event arrived meanwhile
+
+    @staticmethod
+    def _enqueued_at(issue: dict) -> float:
+        ts = issue.get("timestamp")
+        return ts.timestamp() if hasattr(ts, "timestamp") else time.time()
+
+    # ---- pending-issue index ----
+    def enqueue(self, issue: dict):
+        doc = {field: issue.get(field) for field in WAITING_FIELDS}
+        doc["rejected_by"] = list(doc["rejected_by"] or [])
+        doc["skipped_by"] = list(doc["skipped_by"] or [])
+        with self._lock:
+            self._waiting[issue["issue_id"]] = doc
+            self.queue.push(issue["issue_id"], issue.get("urgency", 1), self._enqueued_at(issue), issue.get("region"))
+
+    def discard(self, issue_id: str):
+        with self._lock:
+            self._waiting.pop(issue_id, None)
+            self.queue.discard(issue_id)
+
+    def outranked(self, issue: dict) -> bool:
+        with self._lock:
+            return self.queue.outranked(issue.get("urgency", 1), self._enqueued_at(issue), issue.get("region"))
+
+    def _top(self, n: int, region: str = None, exclude_expert: str = None, keep=None) -> list:
+        """Most urgent waiting docs that pass the filters; filtered before the limit."""
+        def wanted(issue_id):
+            doc = self._waiting[issue_id]
+            if exclude_expert and (exclude_expert in doc["rejected_by"] or exclude_expert in doc["skipped_by"]):
+                return False
+            return keep is None or keep(doc)
+
+        with self._lock:
+            return [self._waiting[issue_id] for issue_id, _, _ in self.queue.top(n, region, wanted)]
+
+    def _still_waiting(self, issue_id: str) -> bool:
+        # Only read on a failed assignment: taken by another worker or deleted
+        return issues_collection.count_documents(
+            {"issue_id": issue_id, "status": "pending", "assigned_expert": None}, limit=1
+        ) > 0
+
+    def load_pending(self):
+        """Make the index match pending issues in Mongo: after a restart, and periodically."""
+        projection = {"_id": 0, **{field: 1 for field in WAITING_FIELDS}}
+        seen = set()
+        for issue in issues_collection.find({"status": "pending", "assigned_expert": None}, projection):
+            self.enqueue(issue)
+            seen.add(issue["issue_id"])
+        with self._lock:
+            gone = [issue_id for issue_id in self._waiting if issue_id not in seen]
+        for issue_id in gone:
+            # Assigned or deleted through another worker (or just now through this one)
+            if not self._still_waiting(issue_id):
+                self.discard(issue_id)
+
+    def start(self):
+        """Call from the startup hook; events may then come from any thread."""
+        self._loop = asyncio.get_running_loop()
+        self.load_pending()
+
+    # ---- capacity freed on one expert ----
+    def _notify(self, issue: dict, expert_id: str):
+        outbox.publish_many([
+            (issue["submitted_by"], "issue_assigned", {"issue_id": issue["issue_id"]}),
+            (expert_id, "issue_assigned", {"issue_id": issue["issue_id"]}),
+        ])
+
+    def _fill_expert_sync(self, expert_id: str) -> int:
+        record = expert_roster.get(expert_id)
+        if record is None or not record.is_available or not record.has_capacity:
+            return 0
+
+        # Own region first; other regions only when nothing local is waiting
+        candidates = self._top(FILL_CANDIDATES, record.region, expert_id)
+        if not candidates:
+            candidates = self._top(FILL_CANDIDATES, exclude_expert=expert_id)
+        by_id = {doc["issue_id"]: doc for doc in candidates}
+
+        assigned = 0
+        for _, issue_id in score_issues(record, candidates):
+            if not record.has_capacity:
+                break
+            if issue_state.assign(issue_id, expert_id):
+                self.discard(issue_id)
+                self._notify(by_id[issue_id], expert_id)
+                assigned += 1
+            elif not self._still_waiting(issue_id):
+                self.discard(issue_id)
+        return assigned
+
+    async def _fill_expert(self, expert_id: str):
+        try:
+            while True:
+                # Scoring embeds text, keep it off the event loop
+                await asyncio.to_thread(self._fill_expert_sync, expert_id)
+                if expert_id not in self._refill:
+                    break
+                self._refill.discard(expert_id)
+        finally:
+            self._filling.discard(expert_id)
+
+    def _spawn_fill(self, expert_id: str):
+        if not len(self.queue):
+            return
+        if expert_id in self._filling:
+            self._refill.add(expert_id)
+            return
+        self._filling.add(expert_id)
+        self._loop.create_task(self._fill_expert(expert_id))
+
+    def capacity_freed(self, expert_id: str):
+        """An expert may have a free slot. Safe to call from sync or async handlers."""
+        if self._loop is None or not expert_id:
+            return
+        self._loop.call_soon_threadsafe(self._spawn_fill, expert_id)
+
+    # ---- priority drain for outranked new issues ----
+    def _drain_sync(self, limit: int) -> int:
+        # One roster read per drain, outside the queue lock; the walk below only tests set membership
+        free = {record.expert_id for record in expert_roster.available()}
+        if not free:
+            return 0
+
+        def has_candidate(doc: dict) -> bool:
+            # Someone with a free slot hasn't already turned this issue down
+            return bool(free.difference(doc["rejected_by"], doc["skipped_by"]))
+
+        assigned = 0
+        # Issues nobody free can take are walked past, so they never block the ones behind
+        for issue in self._top(limit, keep=has_candidate):
+            if not expert_roster.available():
+                break  # no free slot anywhere; stop scoring
+            if assign_pending_issue(issue):
+                self.discard(issue["issue_id"])
+                assigned += 1
+            elif not self._still_waiting(issue["issue_id"]):
+                self.discard(issue["issue_id"])
+        return assigned
+
+    async def drain(self, limit: int = DRAIN_BATCH) -> int:
+        if not len(self.queue):
+            return 0
+        return await asyncio.to_thread(self._drain_sync, limit)
+
+    def _spawn_drain(self):
+        if self._draining is None or self._draining.done():
+            self._draining = self._loop.create_task(self.drain())
+
+    def kick(self):
+        """Serve waiting issues by priority soon, coalescing bursts into one run."""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._spawn_drain)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(DRAIN_INTERVAL)
+            try:
+                await asyncio.to_thread(self.load_pending)
+                await self.drain()
+            except PyMongoError:
+                logger.exception("periodic drain failed")
+
+assignment_scheduler = AssignmentScheduler()
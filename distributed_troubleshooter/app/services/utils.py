@@ -1,33 +1,36 @@
-import asyncio
+import heapq
+import logging
 import re
+from datetime import datetime
 from difflib import SequenceMatcher
 from sentence_transformers import SentenceTransformer, util
 from pymongo import MongoClient
+from app.config import MONGO_URI, MONGO_DB, REGIONS
 
-from app.websocket_manager import ws_manager
+from app.services.outbox import outbox
+from app.services import issue_state
+from app.services.roster import expert_roster
+from app.services.metrics import span, sample_scoring
+from app.services.rollups import region_rollups
+from app.services.region_selector import RegionSelector
+from app.services.weights import weight_store, DEFAULT_WEIGHTS, REGION_WEIGHTS  # noqa: F401 (re-exported)
+
+logger = logging.getLogger(__name__)
 
 # Load the sentence embedding model once (cache)
 MODEL = SentenceTransformer('all-MiniLM-L6-v2')
 
 # MongoDB connection for region scoring
-client = MongoClient("mongodb://localhost:27017")
-db = client["distributed_system"]
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
 issues_collection = db["issues"]
 experts_collection = db["experts"]
 
-# Default weights
-DEFAULT_WEIGHTS = {
-    "skill_match": 0.3,
-    "availability": 0.2,
-    "trust_score": 0.2,
-    "inverse_load": 0.1,
-    "nlp_similarity": 0.2   # 🧠 NLP component
-}
+# Fallback matching scores at most this many candidates per region
+CROSS_REGION_TOP_K = 10
 
-REGION_WEIGHTS = {
-    "expert_weight": 2.0,
-    "issue_penalty": 1.0
-}
+# Candidates (with score breakdowns) persisted on the issue as `match_ranking`
+MATCH_TOP_K = 10
 
 def clean_text(text):
     return re.sub(r"[^a-zA-Z0-9 ]", "", text.lower())
@@ -45,92 +48,273 @@ def compute_skill_match(issue_text, expert_tags):
 def compute_nlp_similarity(issue_text, expert_tags):
     if not expert_tags:
         return 0.0
-    issue_embedding = MODEL.encode(issue_text, convert_to_tensor=True)
-    tags_text = " ".join(expert_tags)
-    tags_embedding = MODEL.encode(tags_text, convert_to_tensor=True)
+    with span("embed"):
+        issue_embedding = MODEL.encode(issue_text, convert_to_tensor=True)
+        tags_text = " ".join(expert_tags)
+        tags_embedding = MODEL.encode(tags_text, convert_to_tensor=True)
     return float(util.pytorch_cos_sim(issue_embedding, tags_embedding).item())
 
-def match_best_expert(issue: dict, experts: list, weights: dict = None, allow_cross_region=True):
+def has_capacity(expert: dict) -> bool:
+    max_issues = expert.get("max_concurrent_issues", issue_state.DEFAULT_MAX_CONCURRENT)
+    return int(expert.get("active_issues", 0)) < max_issues
+
+def weighted_score(weights, skill_score, availability_score, trust_score, inverse_load_score, nlp_score):
+    return (
+        weights["skill_match"] * skill_score +
+        weights["availability"] * availability_score +
+        weights["trust_score"] * trust_score +
+        weights["inverse_load"] * inverse_load_score +
+        weights["nlp_similarity"] * nlp_score
+    )
+
+def score_experts(issue_text: str, expert_list: list, weights: dict, label="REGION"):
+    """Return (score, expert_id) pairs, best first."""
+    return [(b["score"], b["expert_id"]) for b in score_breakdowns(issue_text, expert_list, weights, label)]
+
+def score_breakdowns(issue_text: str, expert_list: list, weights: dict, label="REGION"):
+    """Per-expert scores with their components, best first.
+
+    Each entry: {"expert_id", "region", "score", "components": {weight name: raw value}}.
+    """
+    with span("score"):
+        return _score_breakdowns(issue_text, expert_list, weights, label)
+
+def _score_breakdowns(issue_text: str, expert_list: list, weights: dict, label: str):
+    # Per-expert breakdowns are logged for a sample of matches, at DEBUG only
+    verbose = sample_scoring(logger)
+    scored = []
+    for expert in expert_list:
+        trust_score = expert.get("trust_score", 0.5)
+        active_issues = max(0, int(expert.get("active_issues", 0)))
+        inverse_load_score = 1 / (active_issues + 1)
+
+        tags = expert.get("expert_tags", [])
+        if isinstance(tags, str):
+            tags = [t.strip().lower() for t in tags.split(",")]
+        else:
+            tags = [t.lower() for t in tags]
+
+        availability_score = 1 if expert.get("availability") == "available" else 0
+        skill_score = compute_skill_match(issue_text, tags)
+        nlp_score = compute_nlp_similarity(issue_text, tags)
+
+        final_score = weighted_score(
+            weights, skill_score, availability_score, trust_score, inverse_load_score, nlp_score
+        )
+
+        # ✅ Log expert scoring
+        if verbose:
+            logger.debug(
+                "score expert=%s label=%s tags=%s availability=%s trust=%s load=%s skill=%.3f nlp=%.3f final=%.3f",
+                expert.get("email", expert["expert_id"]), label, tags, availability_score,
+                trust_score, active_issues, skill_score, nlp_score, final_score
+            )
+
+        scored.append({
+            "expert_id": expert["expert_id"],
+            "region": expert.get("region"),
+            "score": final_score,
+            "components": {
+                "skill_match": skill_score,
+                "availability": availability_score,
+                "trust_score": trust_score,
+                "inverse_load": inverse_load_score,
+                "nlp_similarity": nlp_score,
+            },
+        })
+
+    # Stable sort keeps the first-seen expert on ties, as before
+    scored.sort(key=lambda s: s["score"], reverse=True)
+    return scored
+
+def score_issues(expert, issues: list, weights: dict = None):
+    """Score waiting issues for one expert; returns (score, issue_id) pairs, best first.
+
+    The inverse of score_experts: the expert's tags are embedded once and the
+    issue texts in a single batch.
+    """
     if weights is None:
-        weights = DEFAULT_WEIGHTS
+        weights = weight_store.weights  # hot-reloaded; DEFAULT_WEIGHTS until a tuned set exists
+    if not issues:
+        return []
+
+    tags = list(expert.get("expert_tags", []))
+    trust_score = expert.get("trust_score", 0.5)
+    inverse_load_score = 1 / (max(0, int(expert.get("active_issues", 0))) + 1)
+    availability_score = 1 if expert.get("availability") == "available" else 0
+
+    texts = [issue.get("title", "") + " " + issue.get("description", "") for issue in issues]
+    if tags:
+        with span("embed"):
+            tags_embedding = MODEL.encode(" ".join(tags), convert_to_tensor=True)
+            issue_embeddings = MODEL.encode(texts, convert_to_tensor=True)
+        nlp_scores = util.pytorch_cos_sim(issue_embeddings, tags_embedding).flatten().tolist()
+    else:
+        nlp_scores = [0.0] * len(texts)
+
+    scored = []
+    for issue, text, nlp_score in zip(issues, texts, nlp_scores):
+        skill_score = compute_skill_match(text, tags)
+        final_score = weighted_score(
+            weights, skill_score, availability_score, trust_score, inverse_load_score, nlp_score
+        )
+        scored.append((final_score, issue["issue_id"]))
+
+    # Stable sort: on ties the caller's (priority) order wins
+    scored.sort(key=lambda s: s[0], reverse=True)
+    return scored
 
-    best_expert_id = None
-    highest_score = -1
+def rank_experts(issue: dict, experts: list, weights: dict = None, allow_cross_region=True):
+    """Return expert_ids ordered best-first; experts already at capacity are skipped."""
+    return [b["expert_id"] for b in explain_experts(issue, experts, weights, allow_cross_region)]
+
+def explain_experts(issue: dict, experts: list, weights: dict = None, allow_cross_region=True):
+    """rank_experts with score breakdowns."""
+    if weights is None:
+        weights = weight_store.weights
 
     issue_text = issue.get("title", "") + " " + issue.get("description", "")
     issue_region = issue.get("region")
 
+    experts = [e for e in experts if has_capacity(e)]
     regional_experts = [e for e in experts if e.get("region") == issue_region]
 
-    def score_experts(expert_list, label="REGION"):
-        nonlocal best_expert_id, highest_score
-        for expert in expert_list:
-            trust_score = expert.get("trust_score", 0.5)
-            active_issues = max(0, int(expert.get("active_issues", 0)))
-            inverse_load_score = 1 / (active_issues + 1)
-
-            tags = expert.get("expert_tags", [])
-            if isinstance(tags, str):
-                tags = [t.strip().lower() for t in tags.split(",")]
-            else:
-                tags = [t.lower() for t in tags]
-
-            availability_score = 1 if expert.get("availability") == "available" else 0
-            skill_score = compute_skill_match(issue_text, tags)
-            nlp_score = compute_nlp_similarity(issue_text, tags)
-
-            final_score = (
-                weights["skill_match"] * skill_score +
-                weights["availability"] * availability_score +
-                weights["trust_score"] * trust_score +
-                weights["inverse_load"] * inverse_load_score +
-                weights["nlp_similarity"] * nlp_score
-            )
+    # Step 1: Score regional experts
+    ranked = score_breakdowns(issue_text, regional_experts, weights, label="REGIONAL")
 
-            # ✅ Log expert scoring
-            print(f"\n--- Scoring Expert: {expert.get('email', expert['expert_id'])} ({label}) ---")
-            print(f"Tags: {tags}")
-            print(f"Availability: {availability_score}, Trust: {trust_score}, Load: {active_issues}")
-            print(f"Skill Match: {skill_score:.3f}, NLP Similarity: {nlp_score:.3f}")
-            print(f"➡️ Final Score: {final_score:.3f}")
+    # Step 2: Try cross-region if needed
+    if allow_cross_region and not ranked:
+        logger.info("no regional expert for region=%s, trying cross-region", issue_region)
+        ranked = score_breakdowns(issue_text, experts, weights, label="CROSS-REGION")
 
-            if final_score > highest_score:
-                highest_score = final_score
-                best_expert_id = expert["expert_id"]
+    return ranked
 
-    # Step 1: Score regional experts
-    score_experts(regional_experts, label="REGIONAL")
+def rank_fallback(issue: dict, exclude_ids=(), k: int = CROSS_REGION_TOP_K, weights: dict = None):
+    """Ranking for reassignment fallbacks without loading every expert.
 
-    # Step 2: Try cross-region if needed
-    if allow_cross_region and best_expert_id is None:
-        print(f"⚠️ No suitable regional expert, trying cross-region matching...")
-        score_experts(experts, label="CROSS-REGION")
+    Each region contributes at most k candidates with free capacity, pre-ordered
+    from the in-memory roster by tag words shared with the issue, then trust
+    and load; only those are scored. Ordering by trust alone would drop the
+    experts the issue is actually about. The issue's own region goes first,
+    the other regions are merged with a heap.
+    """
+    return [b["expert_id"] for b in explain_fallback(issue, exclude_ids, k, weights)]
 
-    return best_expert_id
+def explain_fallback(issue: dict, exclude_ids=(), k: int = CROSS_REGION_TOP_K, weights: dict = None):
+    """rank_fallback with score breakdowns."""
+    if weights is None:
+        weights = weight_store.weights
+
+    issue_text = issue.get("title", "") + " " + issue.get("description", "")
+    issue_region = issue.get("region")
+    words = frozenset(clean_text(issue_text).split())
+
+    regional = []
+    others = []
+    for region in REGIONS:
+        candidates = expert_roster.top_k(region, k, exclude=exclude_ids, words=words)
+        scored = score_breakdowns(issue_text, candidates, weights, label=region.upper())
+        if region == issue_region:
+            regional = scored
+        else:
+            others.append(scored)
+
+    return regional + list(heapq.merge(*others, key=lambda s: -s["score"]))
+
+# -------------------------------
+# 🧾 Persisted rankings
+# -------------------------------
+def ranking_record(breakdowns: list, k: int = MATCH_TOP_K) -> dict:
+    """What gets stored on the issue as `match_ranking`."""
+    return {
+        "computed_at": datetime.utcnow(),
+        "profile_version": expert_roster.profile_version,
+        "weights_version": weight_store.version,
+        "candidates": breakdowns[:k],
+    }
+
+def ranking_is_fresh(ranking: dict) -> bool:
+    # Load and availability are checked live; only tag/trust/region/membership
+    # changes (profile_version) or new weights invalidate the stored order
+    return (
+        bool(ranking)
+        and ranking.get("profile_version") == expert_roster.profile_version
+        and ranking.get("weights_version", 0) == weight_store.version
+    )
+
+def stored_candidates(issue: dict, exclude_ids=()):
+    """Eligible expert_ids from the issue's stored ranking, best first.
+
+    None when the ranking is missing, stale or has nobody left with a free
+    slot; the caller then rescores.
+    """
+    ranking = issue.get("match_ranking")
+    if not ranking_is_fresh(ranking):
+        return None
+    ids = []
+    for candidate in ranking.get("candidates", []):
+        expert_id = candidate["expert_id"]
+        record = expert_roster.get(expert_id)
+        if expert_id in exclude_ids or record is None or not record.is_available or not record.has_capacity:
+            continue
+        ids.append(expert_id)
+    return ids or None
+
+def reassignment_candidates(issue: dict, exclude_ids=()):
+    """(expert_ids, ranking to persist or None): the stored ranking when fresh, else a new one."""
+    ids = stored_candidates(issue, exclude_ids)
+    if ids is not None:
+        return ids, None
+    breakdowns = explain_fallback(issue, exclude_ids=exclude_ids)
+    return [b["expert_id"] for b in breakdowns], ranking_record(breakdowns)
+
+def match_best_expert(issue: dict, experts: list, weights: dict = None, allow_cross_region=True):
+    ranked = rank_experts(issue, experts, weights, allow_cross_region)
+    return ranked[0] if ranked else None
+
+def match_top_k(issue: dict, experts: list, k: int = 5, weights: dict = None, allow_cross_region=True):
+    """Best k candidates with per-component scores (see score_breakdowns)."""
+    return explain_experts(issue, experts, weights, allow_cross_region)[:k]
 
 # -------------------------------
 # 🔄 Get the least Loaded Region
 # -------------------------------
+def _region_state(region: str):
+    """(slots, free slots, waiting issues) from the roster and the rollup open counts."""
+    experts = expert_roster.available(region, with_capacity=False)
+    slots = sum(e.max_concurrent_issues for e in experts)
+    busy = sum(min(e.active_issues, e.max_concurrent_issues) for e in experts)
+    return slots, slots - busy, max(0, region_rollups.open_count(region) - busy)
+
+def _on_lifecycle(event: str, region: str, seconds: float = None):
+    if event == "arrival":
+        region_selector.on_arrival(region)
+    elif event == "service":
+        region_selector.on_service(region, seconds)
+
+# EWMA arrival/service rates per region, fed by the rollup lifecycle hooks
+region_selector = RegionSelector(REGIONS, _region_state)
+region_rollups.subscribe(_on_lifecycle)
+
 def get_best_region():
-    regions = ["north", "south", "east", "west"]
+    """Lowest predicted wait among two random regions with capacity (see RegionSelector)."""
+    with span("region.select"):
+        region = region_selector.choose()
+    return region or snapshot_best_region()
+
+def snapshot_best_region():
+    """The old instantaneous heuristic; used when no region has any expert capacity."""
     best_region = None
     best_score = float("-inf")
 
-    for region in regions:
-        expert_count = experts_collection.count_documents({
-            "region": region,
-            "is_verified": True,
-            "availability": "available"
-        })
-
-        issue_count = issues_collection.count_documents({
-            "region": region,
-            "status": {"$in": ["pending", "assigned", "in_progress"]}
-        })
+    for region in REGIONS:
+        expert_count = expert_roster.available_count(region)
+        issue_count = region_rollups.open_count(region)
 
-        score = REGION_WEIGHTS["expert_weight"] * expert_count - REGION_WEIGHTS["issue_penalty"] * issue_count
+        region_weights = weight_store.region_weights
+        score = region_weights["expert_weight"] * expert_count - region_weights["issue_penalty"] * issue_count
 
-        print(f"[REGION SCORE] {region}: experts={expert_count}, issues={issue_count}, score={score}")
+        logger.debug("region score region=%s experts=%s issues=%s score=%s", region, expert_count, issue_count, score)
 
         if score > best_score:
             best_score = score
@@ -138,28 +322,19 @@ def get_best_region():
 
     return best_region
 
-async def retry_assignment(issue_id: str):
-    await asyncio.sleep(30)  # Wait 30 seconds
-
-    issue = issues_collection.find_one({"issue_id": issue_id})
-    if not issue or issue.get("assigned_expert"):
-        return  # Already assigned or doesn't exist
-
-    rejected_ids = issue.get("rejected_by", [])
-    available_experts = list(experts_collection.find({
-        "is_available": True,
-        "is_verified": True,
-        "expert_id": {"$nin": rejected_ids}
-    }))
-
-    new_expert_id = match_best_expert(issue, available_experts)
-    if new_expert_id:
-        issues_collection.update_one(
-            {"issue_id": issue_id},
-            {"$set": {"assigned_expert": new_expert_id, "status": "assigned"}}
-        )
-        experts_collection.update_one({"expert_id": new_expert_id}, {"$inc": {"active_issues": 1}})
+def assign_pending_issue(issue: dict):
+    """Try to place a waiting issue; returns the updated issue or None."""
+    skip_ids = set(issue.get("rejected_by", []) + issue.get("skipped_by", []))
+    breakdowns = explain_fallback(issue, exclude_ids=skip_ids)
+    assigned = issue_state.assign_first(
+        issue["issue_id"], [b["expert_id"] for b in breakdowns], ranking=ranking_record(breakdowns)
+    )
+    if assigned:
+        new_expert_id = assigned["assigned_expert"]
 
         # Notify both user and expert
-        await ws_manager.send_event(issue["submitted_by"], "issue_assigned", {"issue_id": issue_id})
-        await ws_manager.send_event(new_expert_id, "issue_assigned", {"issue_id": issue_id})
+        outbox.publish_many([
+            (issue["submitted_by"], "issue_assigned", {"issue_id": issue["issue_id"]}),
+            (new_expert_id, "issue_assigned", {"issue_id": issue["issue_id"]}),
+        ])
+    return assigned
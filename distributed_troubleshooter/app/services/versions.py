@@ -0,0 +1,64 @@
+import hashlib
+import os
+import threading
+import time
+
+# ETags also roll over this often (seconds), so writes this process never saw
+# (another worker, a script, a manual fix) reach clients within the window.
+# Until then such a write can stay hidden behind 304s: this is the staleness bound
+ETAG_MAX_AGE = 60
+
+# -------------------------------
+# 🏷️ Per-resource versions for ETags
+# -------------------------------
+class ResourceVersions:
+    """Change counters keyed by (resource, owner id), e.g. ("issues", user_id).
+
+    Lifecycle write paths bump the keys they touch; GET handlers build an ETag
+    from the current counters and answer If-None-Match with a 304 before
+    reading Mongo. Counters live in process memory: a restart changes the
+    epoch, which invalidates every ETag handed out before. They only see this
+    worker's writes; a write through another worker shows up once the tag
+    rolls over, at most ETAG_MAX_AGE seconds later.
+
+    The tag carries a hash of the owner ids, so two users whose counters
+    happen to match (say, both 0 on one shared browser) never share a tag.
+    """
+
+    def __init__(self, max_age: int = ETAG_MAX_AGE):
+        self.max_age = max_age
+        self.epoch = os.urandom(4).hex()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def bump(self, *keys):
+        """Keys with a missing owner (None) are ignored."""
+        with self._lock:
+            for key in keys:
+                if key and all(part is not None for part in key):
+                    self._counts[key] = self._counts.get(key, 0) + 1
+
+    def get(self, key) -> int:
+        return self._counts.get(key, 0)
+
+    def etag(self, keys=(), extra=()) -> str:
+        """Weak ETag over the keys' counters plus any extra version values."""
+        parts = [self.epoch, str(int(time.time() // self.max_age))]
+        owners = "|".join(str(key[1:]) for key in keys)
+        if owners:
+            parts.append(hashlib.blake2b(owners.encode(), digest_size=6).hexdigest())
+        parts += [str(self.get(key)) for key in keys]
+        parts += [str(value) for value in extra]
+        return 'W/"' + ".".join(parts) + '"'
+
+resource_versions = ResourceVersions()
+
+# Keys used by the write paths and the GET handlers
+def issues_key(user_id: str):
+    return ("issues", user_id)
+
+def assignments_key(expert_id: str):
+    return ("assignments", expert_id)
+
+def profile_key(user_id: str):
+    return ("profile", user_id)
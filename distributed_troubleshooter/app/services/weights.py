@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import MongoClient, DESCENDING
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.config import MONGO_URI, MONGO_DB
+
+client = MongoClient(MONGO_URI)
+db = client[MONGO_DB]
+weights_collection = db["match_weights"]
+
+logger = logging.getLogger(__name__)
+
+# Hand-set defaults; used until a tuned set is published (scripts/tune_weights.py)
+DEFAULT_WEIGHTS = {
+    "skill_match": 0.3,
+    "availability": 0.2,
+    "trust_score": 0.2,
+    "inverse_load": 0.1,
+    "nlp_similarity": 0.2   # 🧠 NLP component
+}
+
+REGION_WEIGHTS = {
+    "expert_weight": 2.0,
+    "issue_penalty": 1.0
+}
+
+WEIGHTS_POLL_INTERVAL = 30  # seconds between checks for a newer published version
+
+# -------------------------------
+# ⚖️ Versioned matching weights
+# -------------------------------
+class WeightStore:
+    """The active weight set, hot-reloaded from `match_weights`.
+
+    Each published set is an immutable document with an increasing `version`;
+    the newest one wins. Version 0 means the built-in defaults.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.version = 0
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.region_weights = dict(REGION_WEIGHTS)
+
+    def ensure_indexes(self):
+        self.collection.create_index([("version", DESCENDING)], unique=True)
+
+    def latest(self):
+        return self.collection.find_one({}, {"_id": 0}, sort=[("version", DESCENDING)])
+
+    def reload(self) -> bool:
+        """Swap in the newest published set; True if the version changed."""
+        doc = self.latest()
+        if not doc or doc["version"] == self.version:
+            return False
+        # Keys missing from a published set keep their default
+        weights = {**DEFAULT_WEIGHTS, **doc.get("weights", {})}
+        region_weights = {**REGION_WEIGHTS, **doc.get("region_weights", {})}
+        self.weights, self.region_weights, self.version = weights, region_weights, doc["version"]
+        logger.info("match weights v%s loaded: %s", self.version, self.weights)
+        return True
+
+    def publish(self, weights: dict, region_weights: dict = None, metrics: dict = None, source: str = "") -> int:
+        """Store a new version; running workers pick it up on their next poll."""
+        while True:
+            latest = self.latest()
+            version = (latest["version"] if latest else 0) + 1
+            try:
+                self.collection.insert_one({
+                    "version": version,
+                    "weights": weights,
+                    "region_weights": region_weights or (latest or {}).get("region_weights") or REGION_WEIGHTS,
+                    "metrics": metrics or {},
+                    "source": source,
+                    "created_at": datetime.utcnow(),
+                })
+                return version
+            except DuplicateKeyError:
+                continue  # another publisher took this version
+
+    async def poll_loop(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.reload)
+            except PyMongoError:
+                logger.exception("match weights reload failed")
+            await asyncio.sleep(WEIGHTS_POLL_INTERVAL)
+
+weight_store = WeightStore(weights_collection)
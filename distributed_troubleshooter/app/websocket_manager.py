@@ -2,6 +2,10 @@
 from typing import Dict, Any
 from fastapi import WebSocket
 import json
+import logging
+from app.services.metrics import span
+
+logger = logging.getLogger(__name__)
 
 class WebSocketManager:
     def __init__(self):
@@ -10,19 +14,28 @@ class WebSocketManager:
     async def connect(self, user_id: str, websocket: WebSocket):
         await websocket.accept()
         self.active_connections[user_id] = websocket
-        print(f"✅ WebSocket connected: {user_id}")
+        logger.info("websocket connected user_id=%s", user_id)
 
     def disconnect(self, user_id: str):
         self.active_connections.pop(user_id, None)
 
-    async def send_event(self, user_id: str, event: str, data: Any = None):
+    async def send_event(self, user_id: str, event: str, data: Any = None, seq: int = None) -> bool:
         ws = self.active_connections.get(user_id)
-        if ws:
-            message = {
-                "event": event,
-                "data": data
-            }
-            await ws.send_text(json.dumps(message))
+        if not ws:
+            return False
+        message = {
+            "event": event,
+            "data": data
+        }
+        if seq is not None:
+            message["seq"] = seq  # per-user outbox sequence; clients dedupe on it
+        try:
+            with span("ws.send"):
+                await ws.send_text(json.dumps(message, default=str))
+        except Exception:
+            self.disconnect(user_id)
+            return False
+        return True
 
 # ✅ Don't create in main.py — create globally here!
 ws_manager = WebSocketManager()
@@ -16,6 +16,7 @@ function login() {
     .then(data => {
       if (data.access_token && data.user_id && data.role) {
         localStorage.setItem("token", data.access_token);
+        localStorage.setItem("refresh_token", data.refresh_token);
         localStorage.setItem("role", data.role);
         localStorage.setItem("user_id", data.user_id);  // ✅ Store user_id for WebSocket
         redirectToDashboard(data.role);
@@ -76,6 +77,7 @@ function signup() {
           .then(loginData => {
             if (loginData.access_token) {
               localStorage.setItem("token", loginData.access_token);
+              localStorage.setItem("refresh_token", loginData.refresh_token);
               localStorage.setItem("role", loginData.role);
               //alert("Signup complete. Redirecting to quiz...");
               window.location.href = "quiz.html";
@@ -0,0 +1,69 @@
+// ----------------------
+// 🔁 ACCESS TOKEN RENEWAL
+// ----------------------
+// Access tokens are short-lived. On a 401 we exchange the refresh token
+// from /login for a new access token and retry once, instead of logging in again.
+(function () {
+  const SESSION_BASE_URL = "http://localhost:8000";  // Update if deployed
+  const nativeFetch = window.fetch.bind(window);
+  let refreshing = null;
+
+  function withCurrentToken(init) {
+    const token = localStorage.getItem("token");
+    if (!init || !init.headers || !token) return init;
+    const headers = new Headers(init.headers);
+    if (headers.has("Authorization")) {
+      headers.set("Authorization", `Bearer ${token}`);
+    }
+    return { ...init, headers };
+  }
+
+  function refreshAccessToken() {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (!refreshToken) return Promise.resolve(false);
+
+    // ✅ Concurrent 401s share one /refresh call
+    if (!refreshing) {
+      refreshing = nativeFetch(`${SESSION_BASE_URL}/refresh`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ refresh_token: refreshToken })
+      })
+        .then(res => (res.ok ? res.json() : null))
+        .then(data => {
+          if (data && data.access_token) {
+            localStorage.setItem("token", data.access_token);
+            localStorage.setItem("refresh_token", data.refresh_token);
+            return true;
+          }
+          return false;
+        })
+        .catch(() => false)
+        .finally(() => { refreshing = null; });
+    }
+    return refreshing;
+  }
+
+  window.fetch = function (input, init) {
+    return nativeFetch(input, withCurrentToken(init)).then(res => {
+      if (res.status !== 401 || !init || !init.headers) return res;
+      return refreshAccessToken().then(ok => (ok ? nativeFetch(input, withCurrentToken(init)) : res));
+    });
+  };
+})();
+
+// ----------------------
+// 🚪 END SESSION
+// ----------------------
+function endSession() {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (refreshToken) {
+    fetch("http://localhost:8000/logout", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+      keepalive: true
+    }).catch(() => {});
+  }
+  localStorage.removeItem("refresh_token");
+}
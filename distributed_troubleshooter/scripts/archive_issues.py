@@ -0,0 +1,35 @@
+"""Move long-closed issues and their messages to the cold tier now.
+
+The server does this hourly (ARCHIVE_AFTER_DAYS, default 30); use this for
+the first big backlog or a different cutoff. Safe to interrupt and rerun.
+
+    python -m scripts.archive_issues --dry-run
+    python -m scripts.archive_issues --days 90 --batch 1000
+"""
+import argparse
+import time
+
+from app.services.archive import issue_archive, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive issues closed this many days ago")
+    parser.add_argument("--batch", type=int, default=ARCHIVE_BATCH, help="issues per bulk batch")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many issues")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would move")
+    args = parser.parse_args()
+
+    issue_archive.ensure_collections()
+    pending = issue_archive.pending(args.days)
+    print(f"{pending} closed issues older than {args.days} days in the hot tier")
+    if args.dry_run or not pending:
+        return
+
+    started = time.perf_counter()
+    moved = issue_archive.archive(args.days, args.batch, args.limit)
+    print(f"moved {moved} issues with their messages in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
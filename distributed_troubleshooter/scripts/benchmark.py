@@ -0,0 +1,449 @@
+"""Reproducible benchmarks for the matching and API paths.
+
+Three commands, all seeded so runs are comparable:
+
+    # Seed a bench database (experts, users, issues, messages per region)
+    python -m scripts.benchmark seed --db distributed_system_bench --experts 50 --issues 500 --messages 20
+
+    # Micro-benchmarks of the matching functions, in process
+    python -m scripts.benchmark micro --db distributed_system_bench
+    python -m scripts.benchmark micro --mongomock        # no Mongo needed
+
+    # Concurrent clients against a running server started with the same MONGO_DB/SECRET_KEY
+    # (admission control off, or the per-user buckets answer most requests with 429)
+    MONGO_DB=distributed_system_bench RATE_LIMIT_ENABLED=0 uvicorn app.main:app --port 8000
+    python -m scripts.benchmark load --db distributed_system_bench --target report --clients 32 --requests 2000
+    python -m scripts.benchmark load --db distributed_system_bench --target messages
+    python -m scripts.benchmark load --db distributed_system_bench --target ws
+
+Every command prints throughput and p50/p95/p99. `--out results.json` saves
+them and `--baseline results.json` prints the change against an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+REGIONS = ["north", "south", "east", "west"]
+
+TAGS = [
+    "network", "wifi", "router", "printer", "email", "outlook", "vpn", "password",
+    "laptop", "battery", "windows", "linux", "macos", "database", "python", "excel",
+    "backup", "disk", "monitor", "audio", "bluetooth", "phone", "browser", "security",
+]
+
+WORDS = [
+    "cannot", "connect", "slow", "error", "crash", "after", "update", "login", "screen",
+    "keeps", "dropping", "failed", "install", "missing", "driver", "sync", "timeout",
+]
+
+BENCH_TAG = "bench"
+
+# -------------------------------
+# 📏 Stats
+# -------------------------------
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[idx]
+
+def summarize(name, latencies, wall, errors=0):
+    ms = [v * 1000 for v in latencies]
+    return {
+        "name": name,
+        "n": len(ms),
+        "errors": errors,
+        "throughput": len(ms) / wall if wall > 0 else float("nan"),
+        "mean_ms": statistics.fmean(ms) if ms else float("nan"),
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+    }
+
+def report(results, out=None, baseline=None):
+    base = {}
+    if baseline:
+        with open(baseline) as f:
+            base = {r["name"]: r for r in json.load(f)}
+
+    print(f"{'benchmark':<32}{'n':>7}{'err':>6}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['name']:<32}{r['n']:>7}{r['errors']:>6}{r['throughput']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+        if r["name"] in base:
+            b = base[r["name"]]
+            deltas = [f"{k} {(r[k] - b[k]) / b[k] * 100:+.1f}%" for k in ("p50_ms", "p95_ms", "p99_ms") if b[k]]
+            print(f"{'  vs baseline':<32}" + "  ".join(deltas))
+
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved {out}")
+
+def use_mongomock():
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("--mongomock needs `pip install mongomock`")
+    import functools
+    import pymongo
+
+    # mongomock finds the AFTER document by re-running the filter unless _id is
+    # projected, so transitions that change a filtered field (status,
+    # active_issues) came back as None. Fetch _id and drop it afterwards.
+    find_one_and_update = mongomock.collection.Collection.find_one_and_update
+
+    def with_id(self, filter, update, projection=None, **kwargs):
+        if not projection or projection.get("_id", 1):
+            return find_one_and_update(self, filter, update, projection=projection, **kwargs)
+        doc = find_one_and_update(
+            self, filter, update, projection={k: v for k, v in projection.items() if k != "_id"} or None, **kwargs
+        )
+        if doc is not None:
+            doc.pop("_id", None)
+        return doc
+
+    mongomock.collection.Collection.find_one_and_update = with_id
+    # Every module opens its own client; they must share one store like one server
+    pymongo.MongoClient = functools.partial(mongomock.MongoClient, _store=mongomock.store.ServerStore())
+
+def configure_env(args):
+    # app.config reads these at import, so set them before any app import
+    os.environ["MONGO_DB"] = args.db
+    if args.mongo:
+        os.environ["MONGO_URI"] = args.mongo
+    if getattr(args, "mongomock", False):
+        use_mongomock()
+
+# -------------------------------
+# 🌱 Seeding
+# -------------------------------
+def issue_text(rng):
+    tags = rng.sample(TAGS, 2)
+    words = rng.sample(WORDS, 4)
+    return f"{tags[0]} {words[0]} {words[1]}", f"{words[2]} {tags[1]} {words[3]} since yesterday {tags[0]}"
+
+def seed(db, experts_per_region, issues_per_region, messages_per_issue, capacity, seed_value):
+    """Replace all bench documents with a deterministic data set; returns counts."""
+    rng = random.Random(seed_value)
+    for name in ("experts", "users", "issues", "messages"):
+        db[name].delete_many({"bench_tag": BENCH_TAG})
+
+    now = datetime.utcnow()
+    experts, users, issues, messages = [], [], [], []
+    for region in REGIONS:
+        region_docs = []
+        for i in range(experts_per_region):
+            expert_id = f"bench-expert-{region}-{i}"
+            region_docs.append({
+                "expert_id": expert_id,
+                "email": f"{expert_id}@bench.local",
+                "region": region,
+                "expert_tags": rng.sample(TAGS, rng.randint(2, 5)),
+                "availability": "available",
+                "trust_score": round(rng.uniform(0.3, 1.0), 3),
+                "active_issues": 0,
+                "max_concurrent_issues": capacity,
+                "is_available": True,
+                "is_verified": True,
+                "bench_tag": BENCH_TAG,
+            })
+        region_experts = [e["expert_id"] for e in region_docs]
+        region_users = [f"bench-user-{region}-{i}" for i in range(max(1, issues_per_region // 5))]
+        users.extend({
+            "user_id": user_id,
+            "email": f"{user_id}@bench.local",
+            "name": user_id,
+            "trust_score": 0.5,
+            "region": region,
+            "bench_tag": BENCH_TAG,
+        } for user_id in region_users)
+
+        load = {expert_id: 0 for expert_id in region_experts}
+        for i in range(issues_per_region):
+            title, description = issue_text(rng)
+            status = rng.choices(["pending", "assigned", "in_progress", "closed"], [1, 2, 2, 5])[0]
+            expert_id = rng.choice(region_experts) if region_experts and status != "pending" else None
+            if status in ("assigned", "in_progress") and expert_id:
+                if load[expert_id] >= capacity:
+                    status = "closed"
+                else:
+                    load[expert_id] += 1
+            issue_id = f"bench-issue-{region}-{i}"
+            submitted_by = rng.choice(region_users)
+            created = now - timedelta(minutes=rng.randint(1, 60 * 24 * 30))
+            issues.append({
+                "issue_id": issue_id,
+                "title": title,
+                "description": description,
+                "category": "general",
+                "urgency": rng.randint(1, 5),
+                "status": status,
+                "timestamp": created,
+                "assigned_expert": expert_id if status != "pending" else None,
+                "submitted_by": submitted_by,
+                "reassignment_log": [],
+                "region": region,
+                "done_by_user": status == "closed",
+                "done_by_expert": status == "closed",
+                "bench_tag": BENCH_TAG,
+            })
+            if status != "pending":
+                for m in range(messages_per_issue):
+                    from_user = m % 2 == 0
+                    messages.append({
+                        "issue_id": issue_id,
+                        "sender_id": submitted_by if from_user else expert_id,
+                        "sender_role": "user" if from_user else "expert",
+                        "content": " ".join(rng.sample(WORDS, 6)),
+                        "timestamp": created + timedelta(seconds=30 * (m + 1)),
+                        "bench_tag": BENCH_TAG,
+                    })
+        for doc in region_docs:
+            doc["active_issues"] = load[doc["expert_id"]]
+        experts.extend(region_docs)
+
+    for name, docs in (("experts", experts), ("users", users), ("issues", issues), ("messages", messages)):
+        if docs:
+            db[name].insert_many(docs)
+    return {"experts": len(experts), "users": len(users), "issues": len(issues), "messages": len(messages)}
+
+def cmd_seed(args):
+    configure_env(args)
+    from pymongo import MongoClient
+    from app.config import MONGO_URI, MONGO_DB
+    db = MongoClient(MONGO_URI)[MONGO_DB]
+    counts = seed(db, args.experts, args.issues, args.messages, args.capacity, args.seed)
+    print(f"seeded {MONGO_DB}: " + ", ".join(f"{v} {k}" for k, v in counts.items()))
+
+# -------------------------------
+# 🔬 Micro-benchmarks
+# -------------------------------
+def time_calls(name, fn, inputs, repeat):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            t0 = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - t0)
+    return summarize(name, latencies, time.perf_counter() - start)
+
+def cmd_micro(args):
+    configure_env(args)
+    from pymongo import MongoClient
+    from app.config import MONGO_URI, MONGO_DB
+    db = MongoClient(MONGO_URI)[MONGO_DB]
+    if args.mongomock or not db["experts"].count_documents({"bench_tag": BENCH_TAG}, limit=1):
+        seed(db, args.experts, args.issues, args.messages, args.capacity, args.seed)
+
+    # Imported late: loads the embedding model and binds to MONGO_DB
+    from app.services.roster import expert_roster
+    from app.services import utils
+
+    expert_roster.load()
+    rng = random.Random(args.seed)
+    sample = list(db["issues"].find({"bench_tag": BENCH_TAG}, {"_id": 0}).limit(args.samples))
+    rng.shuffle(sample)
+    texts = [i["title"] + " " + i["description"] for i in sample]
+    tag_sets = [rng.sample(TAGS, 4) for _ in sample]
+    pairs = list(zip(texts, tag_sets))
+
+    # One warm-up call so model load and first-batch overhead don't skew p99
+    utils.compute_nlp_similarity(texts[0], tag_sets[0])
+
+    results = [
+        time_calls("compute_skill_match", lambda p: utils.compute_skill_match(*p), pairs, args.repeat),
+        time_calls("compute_nlp_similarity", lambda p: utils.compute_nlp_similarity(*p), pairs, args.repeat),
+        time_calls(
+            "match_best_expert",
+            lambda issue: utils.match_best_expert(issue, expert_roster.available(issue["region"])),
+            sample, args.repeat,
+        ),
+        time_calls("get_best_region", lambda _: utils.get_best_region(), sample[:max(1, len(sample) // 4)], args.repeat),
+    ]
+    report(results, args.out, args.baseline)
+
+# -------------------------------
+# 🚚 Concurrent API drivers
+# -------------------------------
+async def run_clients(name, clients, total, one_request):
+    """`clients` workers share `total` requests; one_request(i) returns True on success."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                ok = await one_request(i)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return summarize(name, latencies, time.perf_counter() - start, errors)
+
+def bench_identities(db):
+    users = list(db["users"].find({"bench_tag": BENCH_TAG}, {"_id": 0, "user_id": 1, "region": 1}))
+    issues = list(db["issues"].find(
+        {"bench_tag": BENCH_TAG, "status": {"$in": ["assigned", "in_progress"]}},
+        {"_id": 0, "issue_id": 1, "submitted_by": 1, "assigned_expert": 1}
+    ))
+    if not users or not issues:
+        sys.exit("no bench data; run `python -m scripts.benchmark seed` first")
+    return users, issues
+
+async def load_report(args, http, token_for, users, _issues, rng):
+    async def one(i):
+        user = users[i % len(users)]
+        title, description = issue_text(rng)
+        r = await http.post("/report_issue", headers=token_for(user["user_id"], "user", user["region"]), json={
+            "title": title, "description": description, "category": "general", "urgency": rng.randint(1, 5),
+        })
+        return r.status_code == 200
+    return await run_clients("POST /report_issue", args.clients, args.requests, one)
+
+async def load_messages(args, http, token_for, _users, issues, _rng):
+    async def one(i):
+        issue = issues[i % len(issues)]
+        r = await http.get(f"/messages/{issue['issue_id']}", headers=token_for(issue["submitted_by"], "user"))
+        return r.status_code == 200
+    return await run_clients("GET /messages/{issue_id}", args.clients, args.requests, one)
+
+async def load_ws(args, http, token_for, _users, issues, _rng):
+    """Connect latency for /ws/{user_id}, then message-to-socket delivery latency.
+
+    Each client holds the expert's socket of one assigned issue; the issue's
+    user posts a message and we time until `new_message` arrives on it.
+    """
+    import websockets
+
+    ws_url = args.url.replace("http", "ws", 1)
+    pairs = issues[:args.clients]
+    connect_latencies, delivery_latencies, errors = [], [], 0
+
+    async def client(issue):
+        nonlocal errors
+        t0 = time.perf_counter()
+        async with websockets.connect(f"{ws_url}/ws/{issue['assigned_expert']}") as ws:
+            connect_latencies.append(time.perf_counter() - t0)
+            # Drain anything the outbox had queued for this expert
+            try:
+                while True:
+                    await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+            for _ in range(max(1, args.requests // len(pairs))):
+                t0 = time.perf_counter()
+                r = await http.post(
+                    f"/messages/{issue['issue_id']}", headers=token_for(issue["submitted_by"], "user"),
+                    json={"message": "bench ping"},
+                )
+                if r.status_code != 200:
+                    errors += 1
+                    continue
+                try:
+                    while json.loads(await asyncio.wait_for(ws.recv(), timeout=10)).get("event") != "new_message":
+                        pass
+                    delivery_latencies.append(time.perf_counter() - t0)
+                except asyncio.TimeoutError:
+                    errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(issue) for issue in pairs))
+    wall = time.perf_counter() - start
+    return [
+        summarize("WS /ws/{user_id} connect", connect_latencies, wall),
+        summarize("POST /messages -> WS delivery", delivery_latencies, wall, errors),
+    ]
+
+LOAD_TARGETS = {"report": load_report, "messages": load_messages, "ws": load_ws}
+
+def cmd_load(args):
+    configure_env(args)
+    import httpx
+    from pymongo import MongoClient
+    from app.config import MONGO_URI, MONGO_DB
+    from app.auth.auth_handler import create_access_token
+
+    db = MongoClient(MONGO_URI)[MONGO_DB]
+    users, issues = bench_identities(db)
+    rng = random.Random(args.seed)
+    tokens = {}
+
+    def token_for(user_id, role, region=None):
+        # Minted locally with the server's SECRET_KEY: login cost stays out of the numbers
+        if user_id not in tokens:
+            tokens[user_id] = {"Authorization": "Bearer " + create_access_token(
+                {"sub": user_id, "role": role, "region": region}, expires_delta=timedelta(hours=1)
+            )}
+        return tokens[user_id]
+
+    async def main():
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as http:
+            result = await LOAD_TARGETS[args.target](args, http, token_for, users, issues, rng)
+        return result if isinstance(result, list) else [result]
+
+    report(asyncio.run(main()), args.out, args.baseline)
+
+# -------------------------------
+# 🧰 CLI
+# -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--db", default="distributed_system_bench")
+        p.add_argument("--mongo", default=None, help="MONGO_URI (default: from env)")
+        p.add_argument("--seed", type=int, default=7)
+        p.add_argument("--out", default=None, help="save results as JSON")
+        p.add_argument("--baseline", default=None, help="compare against a saved JSON run")
+
+    def sizes(p):
+        p.add_argument("--experts", type=int, default=50, help="experts per region")
+        p.add_argument("--issues", type=int, default=500, help="issues per region")
+        p.add_argument("--messages", type=int, default=20, help="messages per non-pending issue")
+        p.add_argument("--capacity", type=int, default=3, help="max_concurrent_issues per expert")
+
+    p = sub.add_parser("seed", help="seed the bench database")
+    common(p)
+    sizes(p)
+    p.set_defaults(func=cmd_seed)
+
+    p = sub.add_parser("micro", help="in-process matching micro-benchmarks")
+    common(p)
+    sizes(p)
+    p.add_argument("--mongomock", action="store_true", help="use an in-memory mongomock store")
+    p.add_argument("--samples", type=int, default=50, help="distinct issues per benchmark")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=cmd_micro)
+
+    p = sub.add_parser("load", help="concurrent clients against a running server")
+    common(p)
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--target", choices=sorted(LOAD_TARGETS), default="report")
+    p.add_argument("--clients", type=int, default=32)
+    p.add_argument("--requests", type=int, default=1000)
+    p.set_defaults(func=cmd_load)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Run the four regional nodes locally as stand-ins for docker-compose.
+
+Each node gets its own NODE_NAME, its own database on one local Mongo
+(distributed_system_<region>) and the other three as PEER_NODES.
+
+    python -m scripts.local_nodes            # north:8001 south:8002 east:8003 west:8004
+    python -m scripts.local_nodes --mongo mongodb://localhost:27017 --base-port 9001
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+from app.config import REGIONS
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--base-port", type=int, default=8001)
+    parser.add_argument("--gossip-interval", default="2")
+    args = parser.parse_args()
+
+    ports = {region: args.base_port + i for i, region in enumerate(REGIONS)}
+    peers = ",".join(f"{r}=http://127.0.0.1:{p}" for r, p in ports.items())
+
+    procs = []
+    for region, port in ports.items():
+        env = {
+            **os.environ,
+            "NODE_NAME": region,
+            "MONGO_URI": args.mongo,
+            "MONGO_DB": f"distributed_system_{region}",
+            "PEER_NODES": peers,
+            "GOSSIP_INTERVAL": args.gossip_interval,
+        }
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)], env=env
+        ))
+        print(f"{region}: http://127.0.0.1:{port}")
+
+    try:
+        for proc in procs:
+            proc.wait()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.send_signal(signal.SIGINT)
+        for proc in procs:
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,456 @@
+"""Discrete-event capacity simulation of the real assignment path.
+
+Unlike simulate_regions/simulate_priority, which model the policies in
+isolation, this drives the app's own code against an in-memory mongomock
+store on a virtual clock:
+
+- report_issue's placement: home region, else get_best_region, then the
+  PendingQueue urgency check, explain_experts and assign_first
+- reject_issue's reassignment from the stored ranking (reassignment_candidates)
+- the AssignmentScheduler fill (capacity_freed) and drain (kick) bodies
+- availability changes through the roster, as update_availability does
+
+Experts accept, reject and resolve with probabilities and service times that
+depend on how well their tags fit the issue, so weight settings change the
+outcome. Each scenario (every --weights x --experts combination) reports
+time-to-assignment percentiles, queue length and utilization per region.
+
+    pip install mongomock
+    python -m scripts.simulate_capacity --hours 8 --load 0.9
+    python -m scripts.simulate_capacity --embeddings hash \\
+        --experts north=6,south=4,east=4,west=2 --experts north=4,south=4,east=4,west=4 \\
+        --weights '{}' --weights '{"skill_match": 0.5, "trust_score": 0.1}'
+
+`--embeddings hash` swaps the sentence model for bag-of-words vectors:
+much faster for sweeps, but NLP similarity then only counts shared words.
+"""
+import argparse
+import heapq
+import json
+import math
+import random
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from scripts.benchmark import TAGS, WORDS, configure_env, percentile
+from scripts.simulate_regions import parse_map
+
+EPOCH = datetime(2024, 1, 1)
+
+# -------------------------------
+# ⏱️ Virtual time
+# -------------------------------
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def utcnow(self) -> datetime:
+        return EPOCH + timedelta(seconds=self.now)
+
+def use_clock(clock, modules):
+    """Point the modules' datetime.utcnow (timestamps, rollups, rankings) at the clock."""
+    class SimDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return clock.utcnow()
+
+    for module in modules:
+        module.datetime = SimDatetime
+
+# -------------------------------
+# 🧠 Embedding stand-ins
+# -------------------------------
+class CachedEncoder:
+    """Wraps the sentence model and memoizes by text; issue and tag texts repeat a lot."""
+
+    def __init__(self, model):
+        self.model = model
+        self._cache = {}
+
+    def encode(self, text, convert_to_tensor=True, **kwargs):
+        import torch
+        if isinstance(text, str):
+            if text not in self._cache:
+                self._cache[text] = self.model.encode(text, convert_to_tensor=True)
+            return self._cache[text]
+        missing = [t for t in dict.fromkeys(text) if t not in self._cache]
+        if missing:
+            for t, embedding in zip(missing, self.model.encode(missing, convert_to_tensor=True)):
+                self._cache[t] = embedding
+        return torch.stack([self._cache[t] for t in text])
+
+class HashedEncoder:
+    """Bag-of-words vectors; cosine similarity is word overlap. No model calls."""
+
+    DIM = 256
+
+    def _one(self, text):
+        import torch
+        vector = torch.zeros(self.DIM)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.DIM] += 1
+        return vector
+
+    def encode(self, text, convert_to_tensor=True, **kwargs):
+        import torch
+        if isinstance(text, str):
+            return self._one(text)
+        return torch.stack([self._one(t) for t in text])
+
+# -------------------------------
+# 🌱 Scenario inputs
+# -------------------------------
+def expert_docs(experts, capacity, rng):
+    docs = []
+    for region, n in experts.items():
+        for i in range(n):
+            expert_id = f"sim-expert-{region}-{i}"
+            docs.append({
+                "expert_id": expert_id,
+                "email": f"{expert_id}@sim.local",
+                "region": region,
+                "expert_tags": rng.sample(TAGS, rng.randint(2, 5)),
+                "availability": "available",
+                "trust_score": round(rng.uniform(0.3, 1.0), 3),
+                "active_issues": 0,
+                "max_concurrent_issues": capacity,
+                "is_available": True,
+                "is_verified": True,
+            })
+    return docs
+
+def arrivals(rate, duration, homes, rng):
+    """Poisson stream of (time, home region, urgency, topic tags)."""
+    regions, shares = zip(*homes.items())
+    t, out = 0.0, []
+    while True:
+        t += rng.expovariate(rate)
+        if t > duration:
+            return out
+        out.append((t, rng.choices(regions, shares)[0], rng.randint(1, 5), tuple(rng.sample(TAGS, 2))))
+
+def issue_text(topics, rng):
+    words = rng.sample(WORDS, 4)
+    return f"{topics[0]} {words[0]} {words[1]}", f"{words[2]} {topics[1]} {words[3]} since yesterday"
+
+# -------------------------------
+# 🎬 One scenario
+# -------------------------------
+class CapacitySim:
+    """Event loop over arrivals, expert responses, resolutions and availability flips."""
+
+    def __init__(self, app, clock, args, experts, seed):
+        self.app = app
+        self.clock = clock
+        self.args = args
+        self.rng = random.Random(seed)
+        self.scheduler = app.scheduler.AssignmentScheduler()
+        self.events = []
+        self._seq = 0
+        self.regions = list(experts)
+
+        self.tags = {}        # expert_id -> set(tags)
+        self.topics = {}      # issue_id -> topic tags
+        self.arrived = {}     # issue_id -> arrival time
+        self.assigned = {}    # issue_id -> first assignment time
+        self.responding = set()  # (issue_id, expert_id) with a response scheduled
+        self._roster_version = None
+        self.waits = []
+        self.counts = {"issues": 0, "rejected": 0, "resolved": 0}
+
+        self._last = 0.0
+        self.queue_area = 0.0
+        self.queue_max = 0
+        self.busy_area = {r: 0.0 for r in self.regions}
+        self.slot_area = {r: 0.0 for r in self.regions}
+
+    def at(self, t, kind, *data):
+        self._seq += 1
+        heapq.heappush(self.events, (t, self._seq, kind, data))
+
+    # ---- sim-side bookkeeping ----
+    def fit(self, issue_id, expert_id) -> float:
+        topics = self.topics.get(issue_id, ())
+        return len(self.tags.get(expert_id, set()) & set(topics)) / len(topics) if topics else 0.0
+
+    def accumulate(self, t):
+        dt = t - self._last
+        if dt > 0:
+            self.queue_area += dt * len(self.scheduler.queue)
+            for region in self.regions:
+                experts = self.app.roster.available(region, with_capacity=False)
+                self.busy_area[region] += dt * sum(min(e.active_issues, e.max_concurrent_issues) for e in experts)
+                self.slot_area[region] += dt * sum(e.max_concurrent_issues for e in experts)
+        self._last = t
+
+    def observe_assignments(self):
+        """Schedule a response for every assignment made since the last event, by any path."""
+        self.queue_max = max(self.queue_max, len(self.scheduler.queue))
+        # Every assignment reserves a slot, which bumps the roster version
+        if self.app.roster.version == self._roster_version:
+            return
+        self._roster_version = self.app.roster.version
+        issues = self.app.issue_state.issues_collection
+        for doc in issues.find({"status": "assigned"}, {"_id": 0, "issue_id": 1, "assigned_expert": 1}):
+            key = (doc["issue_id"], doc["assigned_expert"])
+            if key in self.responding:
+                continue
+            self.responding.add(key)
+            if doc["issue_id"] not in self.assigned:
+                self.assigned[doc["issue_id"]] = self.clock.now
+                self.waits.append(self.clock.now - self.arrived[doc["issue_id"]])
+            self.at(self.clock.now + self.rng.expovariate(1 / self.args.respond), "respond", *key)
+
+    def fill(self, expert_id):
+        # Synchronous body of capacity_freed; the simulation has no event loop
+        self.scheduler._fill_expert_sync(expert_id)
+
+    # ---- handlers (mirroring the routes) ----
+    def on_arrive(self, home, urgency, topics):
+        app, scheduler = self.app, self.scheduler
+        issue_id = f"sim-issue-{self.counts['issues']}"
+        self.counts["issues"] += 1
+
+        experts = app.roster.available(home)
+        region = home if experts else app.utils.get_best_region()
+        if not experts:
+            experts = app.roster.available(region)
+
+        title, description = issue_text(topics, self.rng)
+        issue = {
+            "issue_id": issue_id,
+            "title": title,
+            "description": description,
+            "category": "general",
+            "urgency": urgency,
+            "status": "pending",
+            "timestamp": self.clock.utcnow(),
+            "assigned_expert": None,
+            "submitted_by": f"sim-user-{home}",
+            "reassignment_log": [],
+            "region": region,
+            "done_by_user": False,
+            "done_by_expert": False,
+        }
+        app.issue_state.issues_collection.insert_one(dict(issue))
+        app.rollups.region_rollups.on_opened(issue)
+        self.topics[issue_id] = topics
+        self.arrived[issue_id] = self.clock.now
+
+        if not experts:
+            scheduler.enqueue(issue)
+            return
+        if scheduler.outranked(issue):
+            scheduler.enqueue(issue)
+            scheduler._drain_sync(app.scheduler.DRAIN_BATCH)  # kick()
+            return
+        breakdowns = app.utils.explain_experts(issue, experts)
+        assigned = app.issue_state.assign_first(
+            issue_id, [b["expert_id"] for b in breakdowns], ranking=app.utils.ranking_record(breakdowns)
+        )
+        if not assigned:
+            scheduler.enqueue(issue)
+
+    def on_respond(self, issue_id, expert_id):
+        self.responding.discard((issue_id, expert_id))
+        fit = self.fit(issue_id, expert_id)
+        if self.rng.random() < min(1.0, 2 * self.args.reject * (1 - fit)):
+            self.reject(issue_id, expert_id)
+            return
+        if self.app.issue_state.accept(issue_id, expert_id):
+            # A good tag fit resolves faster: mean service from 1.5x (no fit) down to 0.5x
+            mean = self.args.service * (1.5 - fit)
+            sigma = 0.5
+            took = self.rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            self.at(self.clock.now + took, "resolve", issue_id, expert_id)
+
+    def reject(self, issue_id, expert_id):
+        app = self.app
+        issue = app.issue_state.unassign(issue_id, expert_id, "rejected_by")
+        if not issue:
+            return
+        self.counts["rejected"] += 1
+        skip_ids = set(issue.get("rejected_by", []) + issue.get("skipped_by", []))
+        ranked, ranking = app.utils.reassignment_candidates(issue, exclude_ids=skip_ids)
+        if not app.issue_state.assign_first(issue_id, ranked, log=True, ranking=ranking):
+            self.scheduler.enqueue(issue)
+            self.fill(expert_id)
+
+    def on_resolve(self, issue_id, expert_id):
+        if self.app.issue_state.resolve(issue_id, expert_id, "simulated"):
+            self.counts["resolved"] += 1
+            self.fill(expert_id)
+
+    def set_available(self, expert_id, is_available):
+        self.app.issue_state.experts_collection.update_one(
+            {"expert_id": expert_id}, {"$set": {"is_available": is_available}}
+        )
+        self.app.roster.refresh_expert(expert_id)
+        if is_available:
+            self.fill(expert_id)
+
+    def on_offline(self, expert_id):
+        self.set_available(expert_id, False)
+        self.at(self.clock.now + self.rng.expovariate(1 / self.args.offline), "online", expert_id)
+
+    def on_online(self, expert_id):
+        self.set_available(expert_id, True)
+        self.at(self.clock.now + self.rng.expovariate(1 / self.args.online), "offline", expert_id)
+
+    # ---- driver ----
+    def run(self, docs, stream, duration):
+        for doc in docs:
+            self.tags[doc["expert_id"]] = set(doc["expert_tags"])
+            if self.args.offline > 0:
+                self.at(self.rng.expovariate(1 / self.args.online), "offline", doc["expert_id"])
+        for t, home, urgency, topics in stream:
+            self.at(t, "arrive", home, urgency, topics)
+
+        handlers = {
+            "arrive": self.on_arrive, "respond": self.on_respond, "resolve": self.on_resolve,
+            "offline": self.on_offline, "online": self.on_online,
+        }
+        while self.events and self.events[0][0] <= duration:
+            t, _, kind, data = heapq.heappop(self.events)
+            self.accumulate(t)
+            self.clock.now = t
+            handlers[kind](*data)
+            self.observe_assignments()
+        self.accumulate(duration)
+
+    def summary(self, duration) -> dict:
+        return {
+            "issues": self.counts["issues"],
+            "assigned": len(self.assigned),
+            "rejected": self.counts["rejected"],
+            "resolved": self.counts["resolved"],
+            "waiting_at_end": len(self.scheduler.queue),
+            "wait_p50": percentile(self.waits, 50),
+            "wait_p95": percentile(self.waits, 95),
+            "wait_p99": percentile(self.waits, 99),
+            "queue_mean": self.queue_area / duration,
+            "queue_max": self.queue_max,
+            "utilization": {
+                r: self.busy_area[r] / self.slot_area[r] if self.slot_area[r] else float("nan")
+                for r in self.regions
+            },
+        }
+
+# -------------------------------
+# 🧪 Scenario setup
+# -------------------------------
+def load_app(args):
+    """Import the services against mongomock, on the virtual clock."""
+    configure_env(args)
+    from app.services import issue_state, outbox, rollups, scheduler, utils
+    from app.services.roster import expert_roster
+    from app.services.weights import weight_store
+
+    clock = SimClock()
+    use_clock(clock, [issue_state, outbox, rollups, utils])
+    if args.embeddings == "hash":
+        utils.MODEL = HashedEncoder()
+    else:
+        utils.MODEL = CachedEncoder(utils.MODEL)
+
+    app = SimpleNamespace(
+        issue_state=issue_state, rollups=rollups, scheduler=scheduler, utils=utils,
+        roster=expert_roster, weight_store=weight_store, db=issue_state.db,
+    )
+    return app, clock
+
+def reset(app, clock, docs, weights, seed):
+    """Empty the store and put every in-memory service back to a clean start."""
+    clock.now = 0.0
+    for name in app.db.list_collection_names():
+        app.db[name].delete_many({})
+    app.issue_state.experts_collection.insert_many([dict(doc) for doc in docs])
+    app.roster.load()
+
+    # Fresh hourly counters and open counts; never flushed, the store is throwaway
+    rollups = app.rollups.RegionRollups(app.rollups.rollups_collection)
+    rollups.subscribe(app.utils._on_lifecycle)
+    for module in (app.rollups, app.issue_state, app.utils):
+        module.region_rollups = rollups
+
+    store = app.weight_store
+    store.weights = {**app.utils.DEFAULT_WEIGHTS, **weights}
+    store.version += 1  # stored rankings from earlier scenarios are stale
+
+    # Fresh EWMA rates per scenario; the rollup listener reads this module global
+    app.utils.region_selector = app.utils.RegionSelector(
+        app.utils.REGIONS, app.utils._region_state, clock=lambda: clock.now, rng=random.Random(seed)
+    )
+
+def print_result(label, result, regions):
+    print(label)
+    print(f"{'':<4}{result['issues']:>7}{result['assigned']:>7}{result['rejected']:>6}"
+          f"{result['waiting_at_end']:>6}{result['wait_p50']:>9.0f}{result['wait_p95']:>9.0f}{result['wait_p99']:>9.0f}"
+          f"{result['queue_mean']:>8.1f}{result['queue_max']:>6}")
+    print(" " * 4 + "utilization " + "  ".join(f"{r} {result['utilization'][r]:.0%}" for r in regions))
+
+# -------------------------------
+# 🚀 Main
+# -------------------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--experts", action="append", help="experts per region, e.g. north=6,south=4 (repeatable)")
+    parser.add_argument("--weights", action="append", help="JSON overrides of the match weights (repeatable)")
+    parser.add_argument("--homes", default="north=0.4,south=0.3,east=0.2,west=0.1", help="arrival share per home region")
+    parser.add_argument("--capacity", type=int, default=3, help="max_concurrent_issues per expert")
+    parser.add_argument("--load", type=float, default=0.9, help="arrival rate / total service capacity")
+    parser.add_argument("--service", type=float, default=1800.0, help="mean seconds to resolve at a 50%% tag fit")
+    parser.add_argument("--respond", type=float, default=120.0, help="mean seconds before an expert accepts or rejects")
+    parser.add_argument("--reject", type=float, default=0.15, help="reject probability at a 50%% tag fit")
+    parser.add_argument("--online", type=float, default=4 * 3600.0, help="mean seconds an expert stays available")
+    parser.add_argument("--offline", type=float, default=1800.0, help="mean seconds away; 0 keeps everyone available")
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--embeddings", choices=["model", "hash"], default="model")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--out", default=None, help="save results as JSON")
+    args = parser.parse_args()
+    args.db, args.mongo, args.mongomock = "distributed_system_sim", None, True
+
+    try:
+        weight_sets = [json.loads(w) for w in (args.weights or ["{}"])]
+    except json.JSONDecodeError as e:
+        sys.exit(f"--weights must be JSON: {e}")
+    expert_sets = [parse_map(e, int) for e in (args.experts or ["north=6,south=4,east=4,west=2"])]
+    homes = parse_map(args.homes, float)
+    duration = args.hours * 3600
+
+    app, clock = load_app(args)
+    print(f"{'':<4}{'issues':>7}{'placed':>7}{'rej':>6}{'wait':>6}"
+          f"{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'queue':>8}{'max':>6}")
+
+    results = []
+    for experts in expert_sets:
+        rng = random.Random(args.seed)
+        docs = expert_docs(experts, args.capacity, rng)
+        rate = args.load * len(docs) * args.capacity / args.service
+        stream = arrivals(rate, duration, homes, rng)
+        for weights in weight_sets:
+            reset(app, clock, docs, weights, args.seed + 2)
+            sim = CapacitySim(app, clock, args, experts, args.seed + 1)
+            started = time.perf_counter()
+            sim.run(docs, stream, duration)
+            wall = time.perf_counter() - started
+
+            label = ",".join(f"{r}={n}" for r, n in experts.items()) + (f" {json.dumps(weights)}" if weights else "")
+            result = {"experts": experts, "weights": app.weight_store.weights, **sim.summary(duration),
+                      "wall_seconds": wall}
+            results.append(result)
+            print_result(label, result, list(experts))
+            print(" " * 4 + f"{duration / 3600:.1f}h simulated in {wall:.1f}s ({duration / max(wall, 1e-9):,.0f}x real time)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
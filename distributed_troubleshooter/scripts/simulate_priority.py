@@ -0,0 +1,106 @@
+"""Load simulation for the urgency-aware assignment queue.
+
+Replays the same overloaded arrival stream against FIFO retries and the
+PendingQueue used by app.services.scheduler, and prints p50/p95
+time-to-assignment per urgency class. No Mongo or model needed.
+
+    python -m scripts.simulate_priority --experts 8 --capacity 3 --load 1.3
+"""
+import argparse
+import heapq
+import random
+from collections import deque
+
+from app.services.priority_queue import PendingQueue, URGENCY_WEIGHT
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[idx]
+
+
+def arrivals(rate, duration, seed):
+    rng = random.Random(seed)
+    t, out = 0.0, []
+    while True:
+        t += rng.expovariate(rate)
+        if t > duration:
+            return out
+        out.append((t, f"i{len(out)}", rng.randint(1, 5)))
+
+
+def simulate(policy, stream, slots, mean_service, seed, urgency_weight=URGENCY_WEIGHT):
+    """Event loop over arrivals and slot releases; returns {urgency: [waits]}."""
+    rng = random.Random(seed)
+    free = slots
+    waits = {u: [] for u in range(1, 6)}
+    fifo = deque()
+    pq = PendingQueue(urgency_weight=urgency_weight)
+    urgency_of, arrived_at = {}, {}
+    releases = []  # heap of release times
+
+    def start(issue_id, now):
+        nonlocal free
+        free -= 1
+        waits[urgency_of[issue_id]].append(now - arrived_at[issue_id])
+        heapq.heappush(releases, now + rng.expovariate(1 / mean_service))
+
+    def waiting():
+        return len(fifo) if policy == "fifo" else len(pq)
+
+    for t, issue_id, urgency in stream:
+        # Release every slot that frees up before this arrival, serving the queue
+        while releases and releases[0] <= t:
+            now = heapq.heappop(releases)
+            free += 1
+            if waiting():
+                start(fifo.popleft() if policy == "fifo" else pq.pop(), now)
+
+        urgency_of[issue_id], arrived_at[issue_id] = urgency, t
+        if free and not waiting():
+            start(issue_id, t)
+        elif policy == "fifo":
+            fifo.append(issue_id)
+        else:
+            pq.push(issue_id, urgency, t)
+            if free:
+                start(pq.pop(), t)
+
+    # Drain what is left after arrivals stop
+    while releases and waiting():
+        now = heapq.heappop(releases)
+        free += 1
+        start(fifo.popleft() if policy == "fifo" else pq.pop(), now)
+    return waits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--experts", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=3, help="max_concurrent_issues per expert")
+    parser.add_argument("--service", type=float, default=600.0, help="mean seconds to resolve")
+    parser.add_argument("--load", type=float, default=1.3, help="arrival rate / service capacity")
+    parser.add_argument("--duration", type=float, default=4 * 3600.0)
+    parser.add_argument("--urgency-weight", type=float, default=URGENCY_WEIGHT,
+                        help="seconds of waiting one urgency level is worth")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    slots = args.experts * args.capacity
+    rate = args.load * slots / args.service
+    stream = arrivals(rate, args.duration, args.seed)
+    print(f"{len(stream)} issues, {slots} slots, offered load {args.load:.2f}")
+    print(f"{'policy':<9}{'urgency':>8}{'n':>7}{'p50 wait (s)':>15}{'p95 wait (s)':>15}")
+
+    for policy in ("fifo", "priority"):
+        waits = simulate(policy, stream, slots, args.service, args.seed + 1, args.urgency_weight)
+        for urgency in range(5, 0, -1):
+            w = waits[urgency]
+            print(f"{policy:<9}{urgency:>8}{len(w):>7}{percentile(w, 50):>15.1f}{percentile(w, 95):>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Region-selection simulation: snapshot heuristic vs predictive selector.
+
+Issues arrive at a home region, in bursts of simultaneous requests. Like
+report_issue, an issue stays home if a slot is free there and otherwise asks
+the selector for a region. The selector sees region state through a snapshot
+refreshed every --staleness seconds, because concurrent requests in a burst
+read the same counts. Prints the distribution of time-to-assignment per policy.
+
+    python -m scripts.simulate_regions --load 0.9 --burst 6
+"""
+import argparse
+import heapq
+import random
+from collections import deque
+
+from app.config import REGIONS
+from app.services.region_selector import RegionSelector
+from app.services.weights import REGION_WEIGHTS
+
+
+def parse_map(text, cast):
+    return {k: cast(v) for k, v in (pair.split("=") for pair in text.split(","))}
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q / 100 * (len(values) - 1)))))
+    return values[idx]
+
+
+def arrivals(rate, duration, burst, homes, seed):
+    """Batch-Poisson stream of (time, home region); bursts share one instant."""
+    rng = random.Random(seed)
+    regions, weights = zip(*homes.items())
+    t, out = 0.0, []
+    while True:
+        t += rng.expovariate(rate / burst)
+        if t > duration:
+            return out
+        size = 1 + int(rng.expovariate(1 / max(burst - 1, 1e-9))) if burst > 1 else 1
+        out.extend((t, rng.choices(regions, weights)[0]) for _ in range(size))
+
+
+def simulate(policy, stream, experts, capacity, mean_service, staleness, seed):
+    rng = random.Random(seed)
+    slots = {r: experts.get(r, 0) * capacity for r in REGIONS}
+    busy = {r: 0 for r in REGIONS}
+    queues = {r: deque() for r in REGIONS}
+    releases = []  # heap of (time, region, service_seconds)
+    waits = []
+    now = 0.0
+    snapshot = {"at": -1e18}
+
+    def refresh(t):
+        if t - snapshot["at"] >= staleness:
+            snapshot.update(at=t, busy=dict(busy), queued={r: len(q) for r, q in queues.items()})
+
+    def stale_state(region):
+        b, q = snapshot["busy"][region], snapshot["queued"][region]
+        return slots[region], slots[region] - b, q
+
+    selector = RegionSelector(REGIONS, stale_state, clock=lambda: now, rng=random.Random(seed + 1))
+
+    def snapshot_choice():
+        # get_best_region before: 2 * available experts - open issues
+        def score(region):
+            open_issues = snapshot["busy"][region] + snapshot["queued"][region]
+            return REGION_WEIGHTS["expert_weight"] * experts.get(region, 0) - REGION_WEIGHTS["issue_penalty"] * open_issues
+        return max(REGIONS, key=score)
+
+    def start(region, arrived, t):
+        busy[region] += 1
+        waits.append(t - arrived)
+        service = rng.expovariate(1 / mean_service)
+        heapq.heappush(releases, (t + service, region, service))
+
+    def release_until(t):
+        nonlocal now
+        while releases and releases[0][0] <= t:
+            now, region, service = heapq.heappop(releases)
+            busy[region] -= 1
+            selector.on_service(region, service)
+            if queues[region]:
+                start(region, queues[region].popleft(), now)
+
+    for t, home in stream:
+        release_until(t)
+        now = t
+        refresh(t)
+        if busy[home] < slots[home]:
+            region = home
+        elif policy == "snapshot":
+            region = snapshot_choice()
+        else:
+            region = selector.choose() or snapshot_choice()
+        selector.on_arrival(region)
+        if busy[region] < slots[region]:
+            start(region, t, t)
+        else:
+            queues[region].append(t)
+
+    release_until(float("inf"))
+    return waits
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--experts", default="north=6,south=4,east=4,west=2", help="experts per region")
+    parser.add_argument("--homes", default="north=0.4,south=0.3,east=0.2,west=0.1", help="arrival share per home region")
+    parser.add_argument("--capacity", type=int, default=3)
+    parser.add_argument("--service", type=float, default=600.0, help="mean seconds to resolve")
+    parser.add_argument("--load", type=float, default=0.9, help="arrival rate / total service capacity")
+    parser.add_argument("--burst", type=float, default=6.0, help="mean simultaneous requests per burst")
+    parser.add_argument("--staleness", type=float, default=2.0, help="seconds between state snapshots")
+    parser.add_argument("--duration", type=float, default=8 * 3600.0)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    experts = parse_map(args.experts, int)
+    homes = parse_map(args.homes, float)
+    total_slots = sum(experts.values()) * args.capacity
+    rate = args.load * total_slots / args.service
+    stream = arrivals(rate, args.duration, args.burst, homes, args.seed)
+    print(f"{len(stream)} issues, {total_slots} slots, load {args.load:.2f}, mean burst {args.burst}")
+    print(f"{'policy':<12}{'p50 wait (s)':>14}{'p95 wait (s)':>14}{'p99 wait (s)':>14}{'max (s)':>12}")
+
+    for policy in ("snapshot", "predictive"):
+        waits = simulate(policy, stream, experts, args.capacity, args.service, args.staleness, args.seed + 2)
+        print(f"{policy:<12}{percentile(waits, 50):>14.1f}{percentile(waits, 95):>14.1f}"
+              f"{percentile(waits, 99):>14.1f}{max(waits):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
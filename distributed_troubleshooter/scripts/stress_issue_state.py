@@ -0,0 +1,112 @@
+"""Concurrency stress check for app.services.issue_state.
+
+Hammers the lifecycle transitions from many threads against a local Mongo and
+verifies that every issue is closed exactly once and that expert
+active_issues counters end where they should.
+
+    python -m scripts.stress_issue_state --issues 200 --threads 16
+"""
+import argparse
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import issue_state
+
+issues_collection = issue_state.issues_collection
+experts_collection = issue_state.experts_collection
+
+
+def seed(n_issues, n_experts, tag, max_concurrent):
+    experts = [f"{tag}-expert-{i}" for i in range(n_experts)]
+    experts_collection.insert_many([
+        {"expert_id": e, "active_issues": 0, "max_concurrent_issues": max_concurrent, "stress_tag": tag}
+        for e in experts
+    ])
+    issues = [{
+        "issue_id": str(uuid.uuid4()),
+        "submitted_by": f"{tag}-user-{i}",
+        "assigned_expert": None,
+        "status": "pending",
+        "done_by_user": False,
+        "done_by_expert": False,
+        "reassignment_log": [],
+        "stress_tag": tag,
+    } for i in range(n_issues)]
+    issues_collection.insert_many(issues)
+    return [i["issue_id"] for i in issues], experts
+
+
+def run_issue(issue_id, experts, closes):
+    doc = issues_collection.find_one({"issue_id": issue_id})
+    user_id = doc["submitted_by"]
+
+    # Several experts race for the same pending issue; only one may win
+    contenders = random.sample(experts, k=min(3, len(experts)))
+    with ThreadPoolExecutor(max_workers=len(contenders)) as pool:
+        winners = [r for r in pool.map(lambda e: issue_state.assign(issue_id, e), contenders) if r]
+    assert len(winners) == 1, f"{issue_id}: {len(winners)} concurrent assigns succeeded"
+    expert_id = winners[0]["assigned_expert"]
+
+    # Reject / reassign once on some issues
+    if random.random() < 0.3:
+        assert issue_state.unassign(issue_id, expert_id, "rejected_by")
+        assert not issue_state.unassign(issue_id, expert_id, "rejected_by")
+        expert_id = random.choice(experts)
+        assert issue_state.assign(issue_id, expert_id, log=True)
+
+    issue_state.accept(issue_id, expert_id)
+    # Some issues skip resolve and close straight from in_progress: the slot must still be freed
+    if random.random() >= 0.3:
+        assert issue_state.resolve(issue_id, expert_id, "notes")
+        assert not issue_state.resolve(issue_id, expert_id, "notes")
+
+    # Both parties close concurrently, repeatedly
+    calls = [(user_id, "user"), (expert_id, "expert")] * 3
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        results = list(pool.map(lambda c: issue_state.mark_done(issue_id, *c), calls))
+    closes.append(sum(1 for r in results if r and r["status"] == "closed"))
+
+
+def capacity_burst(tag, n_issues=60, n_experts=5, max_concurrent=2, threads=16):
+    """Every issue ranks the same experts in the same order; slots must never overflow."""
+    issue_ids, experts = seed(n_issues, n_experts, tag, max_concurrent)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda i: issue_state.assign_first(i, experts), issue_ids))
+
+    assigned = [r for r in results if r]
+    assert len(assigned) == min(n_issues, n_experts * max_concurrent), f"{len(assigned)} assigned"
+    over = list(experts_collection.find({"stress_tag": tag, "active_issues": {"$gt": max_concurrent}}))
+    assert not over, f"capacity exceeded for {[e['expert_id'] for e in over]}"
+    spread = {e: sum(1 for r in assigned if r["assigned_expert"] == e) for e in experts}
+    print(f"OK: burst of {n_issues} spread across experts {spread}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--issues", type=int, default=200)
+    parser.add_argument("--experts", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    tag = f"stress-{uuid.uuid4().hex[:8]}"
+    issue_ids, experts = seed(args.issues, args.experts, tag, max_concurrent=args.issues)
+    closes = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            list(pool.map(lambda i: run_issue(i, experts, closes), issue_ids))
+
+        assert all(c == 1 for c in closes), "an issue was closed more than once (or never)"
+        assert issues_collection.count_documents({"stress_tag": tag, "status": {"$ne": "closed"}}) == 0
+        drift = list(experts_collection.find({"stress_tag": tag, "active_issues": {"$ne": 0}}))
+        assert not drift, f"active_issues drifted for {[e['expert_id'] for e in drift]}"
+        print(f"OK: {len(issue_ids)} issues, each closed exactly once, no counter drift")
+
+        capacity_burst(tag + "-burst", threads=args.threads)
+    finally:
+        issues_collection.delete_many({"stress_tag": {"$regex": f"^{tag}"}})
+        experts_collection.delete_many({"stress_tag": {"$regex": f"^{tag}"}})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Offline tuning of the matching weights from historical outcomes.
+
+Streams closed issues from Mongo in chunks, with their reassignment history,
+expert ratings and resolution times. It builds a feature matrix of the five
+score components for every (issue, expert) assignment and fits non-negative
+weights. The fit rewards assignments that were kept and resolved quickly
+with a good rating, and penalizes assignments that ended in a reject or an
+escalation. The result is published as a new version in `match_weights`, and
+running servers hot-reload it within WEIGHTS_POLL_INTERVAL.
+
+    python -m scripts.tune_weights --dry-run
+    python -m scripts.tune_weights --since-days 90
+
+Components come from the issue's stored `match_ranking` (captured at
+assignment time). Older issues without one are rescored against the
+expert's current profile, which is an approximation.
+"""
+import argparse
+import hashlib
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.utils import score_breakdowns, issues_collection, experts_collection
+from app.services.weights import weight_store, DEFAULT_WEIGHTS
+from app.routes.ratings import ratings_collection
+from app.services.archive import issue_archive
+
+COMPONENTS = list(DEFAULT_WEIGHTS)  # column order of the feature matrix
+PRIOR_STRENGTH = 200   # samples at which the fit and the current weights count equally
+HOLDOUT_SHARE = 0.2
+
+ISSUE_PROJECTION = {
+    "_id": 0, "issue_id": 1, "title": 1, "description": 1, "region": 1, "timestamp": 1,
+    "assigned_expert": 1, "rejected_by": 1, "skipped_by": 1, "reassignment_log": 1,
+    "match_ranking": 1, "resolved_at": 1, "closed_at": 1,
+}
+
+# -------------------------------
+# 📥 Streaming the history
+# -------------------------------
+def stream_chunks(query, chunk):
+    # Most history sits in the cold tier once issues are archived
+    batch = []
+    for collection in (issues_collection, issue_archive.issues):
+        for issue in collection.find(query, ISSUE_PROJECTION, batch_size=chunk):
+            batch.append(issue)
+            if len(batch) >= chunk:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def expert_ratings(issue_ids):
+    stars = {}
+    for r in ratings_collection.find(
+        {"issue_id": {"$in": issue_ids}, "recipient_role": "expert"},
+        {"_id": 0, "issue_id": 1, "recipient_id": 1, "stars": 1}
+    ):
+        stars[(r["issue_id"], r["recipient_id"])] = r["stars"]
+    return stars
+
+class ExpertProfiles:
+    """Expert docs for rescoring issues that predate stored rankings."""
+
+    def __init__(self):
+        self._docs = {}
+
+    def get_many(self, expert_ids):
+        missing = [e for e in expert_ids if e not in self._docs]
+        if missing:
+            for doc in experts_collection.find(
+                {"expert_id": {"$in": missing}},
+                {"_id": 0, "expert_id": 1, "region": 1, "expert_tags": 1, "availability": 1,
+                 "trust_score": 1, "active_issues": 1}
+            ):
+                self._docs[doc["expert_id"]] = doc
+        return [self._docs[e] for e in expert_ids if e in self._docs]
+
+def assignment_start(issue, expert_id):
+    # The last time this expert was (re)assigned, else the report time
+    for entry in reversed(issue.get("reassignment_log") or []):
+        if entry.get("expert_id") == expert_id and entry.get("timestamp"):
+            return entry["timestamp"]
+    return issue.get("timestamp")
+
+def examples_for(issue, stars, profiles):
+    """(expert_id, components dict, outcome fields) for every assignment on one issue."""
+    final_expert = issue.get("assigned_expert")
+    passed = set(issue.get("rejected_by") or []) | set(issue.get("skipped_by") or [])
+    experts = list(passed) + ([final_expert] if final_expert and final_expert not in passed else [])
+    if not experts:
+        return []
+
+    stored = {c["expert_id"]: c["components"] for c in (issue.get("match_ranking") or {}).get("candidates", [])}
+    missing = [e for e in experts if e not in stored]
+    if missing:
+        text = issue.get("title", "") + " " + issue.get("description", "")
+        for b in score_breakdowns(text, profiles.get_many(missing), weight_store.weights, label="TUNING"):
+            stored[b["expert_id"]] = b["components"]
+
+    rows = []
+    for expert_id in experts:
+        if expert_id not in stored:
+            continue  # expert since deleted
+        kept = expert_id == final_expert and expert_id not in passed
+        ttr = None
+        if kept:
+            start, end = assignment_start(issue, expert_id), issue.get("resolved_at") or issue.get("closed_at")
+            if start and end:
+                ttr = max(0.0, (end - start).total_seconds())
+        rows.append((issue["issue_id"], expert_id, stored[expert_id], kept, ttr, stars.get((issue["issue_id"], expert_id))))
+    return rows
+
+def build_dataset(query, chunk):
+    """Vectorised features X (n x components), per-row outcomes and issue ids."""
+    profiles = ExpertProfiles()
+    features, kept, ttrs, ratings, issue_ids = [], [], [], [], []
+    n_issues = 0
+    for batch in stream_chunks(query, chunk):
+        n_issues += len(batch)
+        stars = expert_ratings([i["issue_id"] for i in batch])
+        for issue in batch:
+            for issue_id, _, components, was_kept, ttr, rating in examples_for(issue, stars, profiles):
+                features.append([float(components.get(c, 0.0)) for c in COMPONENTS])
+                kept.append(was_kept)
+                ttrs.append(np.nan if ttr is None else ttr)
+                ratings.append(np.nan if rating is None else rating)
+                issue_ids.append(issue_id)
+        print(f"  streamed {n_issues} issues, {len(features)} assignments")
+    return (np.asarray(features, dtype=float).reshape(-1, len(COMPONENTS)), np.asarray(kept, dtype=bool),
+            np.asarray(ttrs, dtype=float), np.asarray(ratings, dtype=float), issue_ids)
+
+def targets(kept, ttrs, ratings):
+    """Soft label in [0, 1]: 0 for reassigned, else speed x rating."""
+    finite = ttrs[np.isfinite(ttrs)]
+    scale = float(np.median(finite)) if finite.size else 3600.0
+    speed = np.where(np.isfinite(ttrs), np.exp(-np.nan_to_num(ttrs) / max(scale, 1.0)), 0.5)
+    rating = np.where(np.isfinite(ratings), np.nan_to_num(ratings) / 5.0, 0.8)
+    # Keeping the issue at all is worth half; speed and rating share the rest
+    return np.where(kept, 0.5 + 0.5 * speed * rating, 0.0)
+
+# -------------------------------
+# 📐 Fitting
+# -------------------------------
+def fit_weights(X, y, l2=1e-3, steps=3000, lr=0.5):
+    """Logistic fit with non-negative coefficients (projected gradient descent).
+
+    Only relative size matters for ranking, so the coefficients are normalised
+    to sum to 1 like DEFAULT_WEIGHTS.
+    """
+    mu, sigma = X.mean(axis=0), X.std(axis=0)
+    sigma[sigma == 0] = 1.0
+    Z = (X - mu) / sigma
+    beta, bias = np.full(X.shape[1], 0.1), 0.0
+    for _ in range(steps):
+        p = 1 / (1 + np.exp(-(Z @ beta + bias)))
+        grad = Z.T @ (p - y) / len(y) + l2 * beta
+        beta = np.maximum(0.0, beta - lr * grad)
+        bias -= lr * float(np.mean(p - y))
+    coef = beta / sigma  # back to raw component scale
+    if coef.sum() <= 0:
+        return None
+    return coef / coef.sum()
+
+def pairwise_accuracy(X, y, issue_ids, w):
+    """Share of (kept, reassigned) pairs on the same issue where the kept expert scores higher."""
+    scores = X @ w
+    by_issue = {}
+    for idx, issue_id in enumerate(issue_ids):
+        by_issue.setdefault(issue_id, []).append(idx)
+    wins = total = 0
+    for rows in by_issue.values():
+        good = [i for i in rows if y[i] > 0]
+        bad = [i for i in rows if y[i] == 0]
+        for g in good:
+            for b in bad:
+                total += 1
+                wins += scores[g] > scores[b]
+    return (wins / total if total else float("nan")), total
+
+def holdout_mask(issue_ids):
+    # Stable split by issue so reruns compare like with like
+    return np.array([int(hashlib.sha1(i.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF < HOLDOUT_SHARE for i in issue_ids])
+
+# -------------------------------
+# 🚀 Main
+# -------------------------------
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--since-days", type=int, default=None, help="only issues closed in the last N days")
+    parser.add_argument("--chunk", type=int, default=500, help="issues per streamed chunk")
+    parser.add_argument("--l2", type=float, default=1e-3)
+    parser.add_argument("--min-samples", type=int, default=50)
+    parser.add_argument("--dry-run", action="store_true", help="fit and report, don't publish")
+    parser.add_argument("--force", action="store_true", help="publish even if the holdout got worse")
+    args = parser.parse_args()
+
+    weight_store.reload()
+    current = np.array([weight_store.weights[c] for c in COMPONENTS])
+    query = {"status": "closed"}
+    if args.since_days:
+        query["closed_at"] = {"$gte": datetime.utcnow() - timedelta(days=args.since_days)}
+
+    print(f"current weights v{weight_store.version}: {dict(zip(COMPONENTS, current.round(3)))}")
+    X, kept, ttrs, ratings, issue_ids = build_dataset(query, args.chunk)
+    if len(X) < args.min_samples:
+        print(f"only {len(X)} assignments (need {args.min_samples}); nothing published")
+        return
+
+    y = targets(kept, ttrs, ratings)
+    test = holdout_mask(issue_ids)
+    fitted = fit_weights(X[~test], y[~test], l2=args.l2)
+    if fitted is None:
+        print("fit collapsed to zero weights; nothing published")
+        return
+
+    # Shrink towards the current set when data is thin
+    n = int((~test).sum())
+    lam = n / (n + PRIOR_STRENGTH)
+    proposed = lam * fitted + (1 - lam) * current
+    proposed = proposed / proposed.sum()
+
+    test_ids = [i for i, t in zip(issue_ids, test) if t]
+    acc_current, pairs = pairwise_accuracy(X[test], y[test], test_ids, current)
+    acc_proposed, _ = pairwise_accuracy(X[test], y[test], test_ids, proposed)
+    print(f"train rows {n}, holdout pairs {pairs}, shrinkage {lam:.2f}")
+    print(f"proposed: {dict(zip(COMPONENTS, proposed.round(3)))}")
+    print(f"holdout pairwise accuracy: current {acc_current:.3f} -> proposed {acc_proposed:.3f}")
+
+    if args.dry_run:
+        return
+    if pairs and not math.isnan(acc_current) and acc_proposed < acc_current and not args.force:
+        print("holdout got worse; not published (use --force to override)")
+        return
+
+    version = weight_store.publish(
+        {c: round(float(w), 4) for c, w in zip(COMPONENTS, proposed)},
+        metrics={"train_rows": n, "holdout_pairs": pairs,
+                 "holdout_accuracy_before": None if math.isnan(acc_current) else acc_current,
+                 "holdout_accuracy_after": None if math.isnan(acc_proposed) else acc_proposed},
+        source="scripts.tune_weights",
+    )
+    print(f"published match weights v{version}")
+
+
+if __name__ == "__main__":
+    main()